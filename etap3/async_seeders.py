@@ -0,0 +1,588 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import asyncpg
+
+import generators as gen
+from db import session_settings, settings
+from loaders import RESERVE_IDS_SQL
+from metrics import record_db, record_rows
+from seeders import (ALLERGEN_NAMES, CATEGORY_NAMES, CERTIFICATION_NAMES, COMPLAINT_SOURCES_SQL, COURIER_TYPE_NAMES,
+                     DELIVERY_STATUS_NAMES, FULFILLMENT_STATUS_NAMES, SPECIALTY_NAMES, Seeder)
+from shards import slice_parts
+
+# (table, columns, rows) written together in one transaction on one connection
+Batch = List[Tuple[str, Sequence[str], List[Tuple]]]
+
+
+def _numbered(sql: str) -> str:
+    # psycopg2 %s placeholders -> asyncpg $1, $2, ...
+    parts = sql.split("%s")
+    return "".join(part + (f"${i}" if i < len(parts) else "") for i, part in enumerate(parts, start=1))
+
+
+async def create_pool(min_size: Optional[int] = None, max_size: Optional[int] = None) -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        min_size=int(settings.DB_POOL_MIN if min_size is None else min_size),
+        max_size=int(settings.DB_POOL_MAX if max_size is None else max_size),
+        server_settings=session_settings(),
+    )
+
+
+class AsyncCopyLoader:
+    """Binary COPY through asyncpg's copy_records_to_table.
+
+    asyncpg takes naive datetimes as UTC and refuses dates in timestamp
+    columns, so values are coerced to the column types first, the same way
+    the psycopg2 binary loader encodes them.
+    """
+
+    name = "async-copy"
+
+    def __init__(self):
+        self._types: Dict[str, Dict[str, str]] = {}
+        self._identities: Dict[str, Optional[str]] = {}
+
+    async def reserve_ids(self, pool: asyncpg.Pool, table: str, column: str, count: int) -> List[int]:
+        # own short transaction, so the advisory lock is released right away
+        if count <= 0:
+            return []
+        started = time.perf_counter()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                last = await conn.fetchval(_numbered(RESERVE_IDS_SQL), table, column, count)
+        record_db(time.perf_counter() - started)
+        return list(range(last - count + 1, last + 1))
+
+    async def identity_column(self, pool: asyncpg.Pool, table: str) -> Optional[str]:
+        if table not in self._identities:
+            async with pool.acquire() as conn:
+                self._identities[table] = await conn.fetchval("""
+                    SELECT attname FROM pg_attribute
+                    WHERE attrelid = quote_ident($1)::regclass AND attidentity <> '' AND NOT attisdropped;
+                """, table)
+        return self._identities[table]
+
+    async def _column_types(self, conn: asyncpg.Connection, table: str) -> Dict[str, str]:
+        if table not in self._types:
+            rows = await conn.fetch("""
+                SELECT a.attname, t.typname
+                FROM pg_attribute a
+                JOIN pg_type t ON t.oid = a.atttypid
+                WHERE a.attrelid = quote_ident($1)::regclass AND a.attnum > 0 AND NOT a.attisdropped;
+            """, table)
+            self._types[table] = {row["attname"]: row["typname"] for row in rows}
+        return self._types[table]
+
+    async def insert(self, conn: asyncpg.Connection, table: str, columns: Sequence[str], rows: Sequence[Tuple]) -> int:
+        if not rows:
+            return 0
+        types = await self._column_types(conn, table)
+        coerce = [_COERCE.get(types[c]) for c in columns]
+        if any(coerce):
+            rows = [tuple(v if f is None or v is None else f(v) for f, v in zip(coerce, row)) for row in rows]
+        started = time.perf_counter()
+        await conn.copy_records_to_table(table, records=rows, columns=list(columns))
+        record_db(time.perf_counter() - started)
+        record_rows(len(rows))
+        return len(rows)
+
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime(value.year, value.month, value.day)
+
+
+def _as_local(value) -> datetime:
+    value = _as_datetime(value)
+    return value if value.tzinfo else value.astimezone()
+
+
+_COERCE = {
+    "timestamptz": _as_local,
+    "timestamp": lambda v: _as_datetime(v).replace(tzinfo=None),
+    "date": lambda v: v.date() if isinstance(v, datetime) else v,
+}
+
+
+class AsyncSeeder(Seeder):
+    """The seed_* methods of Seeder as coroutines, on an asyncpg pool.
+
+    Chunks are generated in a thread while up to `in_flight` batches of the
+    same step are written, each on its own pooled connection and in its own
+    transaction. Ids are reserved before a batch is written, so children go
+    in the same batch as their parents and the foreign keys hold without
+    waiting for earlier batches. The generated data is the same as with the
+    sync Seeder for a given seed.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, loader: Optional[AsyncCopyLoader] = None, in_flight: int = 4, **kwargs):
+        super().__init__(None, **kwargs)
+        self.pool = pool
+        self.loader = loader or AsyncCopyLoader()
+        self.in_flight = max(1, in_flight)
+
+    async def _next(self, chunks: Iterator):
+        # generation runs off the event loop, so the batches in flight keep going meanwhile
+        return await asyncio.to_thread(next, chunks, None)
+
+    async def _write(self, batch: Batch) -> None:
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                for table, columns, rows in batch:
+                    await self.loader.insert(conn, table, columns, rows)
+
+    async def _pipeline(self, batches: AsyncIterator[Batch]) -> None:
+        slots = asyncio.Semaphore(self.in_flight)
+        tasks: List[asyncio.Task] = []
+
+        async def write(batch: Batch):
+            try:
+                await self._write(batch)
+            finally:
+                slots.release()
+
+        try:
+            async for batch in batches:
+                await slots.acquire()
+                tasks.append(asyncio.create_task(write(batch)))
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _with_ids(self, table: str, columns: Sequence[str], rows: List[Tuple],
+                        column: Optional[str] = None) -> Tuple[Sequence[str], List[Tuple], List[int]]:
+        # same as Loader.insert: ids already in the rows are kept, otherwise a block is reserved.
+        # Tables loaded without `returning` get ids reserved too: batches commit in
+        # any order, so leaving them to the column default would shuffle the ids
+        column = column or await self.loader.identity_column(self.pool, table)
+        if column is None:
+            return columns, rows, []
+        if column in columns:
+            idx = list(columns).index(column)
+            return columns, rows, [row[idx] for row in rows]
+        ids = await self.loader.reserve_ids(self.pool, table, column, len(rows))
+        return (column,) + tuple(columns), [(i,) + tuple(row) for i, row in zip(ids, rows)], ids
+
+    async def _load(self, table: str, columns: Sequence[str], chunks: Iterator[List[Tuple]],
+                    returning: Optional[str] = None):
+        ids: List[int] = []
+        count = 0
+
+        async def batches() -> AsyncIterator[Batch]:
+            nonlocal count
+            while (rows := await self._next(chunks)) is not None:
+                if not rows:
+                    continue
+                cols, rows, chunk_ids = await self._with_ids(table, columns, rows, returning)
+                ids.extend(chunk_ids)
+                count += len(rows)
+                yield [(table, cols, rows)]
+
+        try:
+            await self._pipeline(batches())
+        except Exception as e:
+            logging.error(f"Failed to load {table}: {e}")
+            raise
+        return ids if returning else count
+
+    async def _items(self, table: str, columns: Sequence[str], chunks: Iterator[List[Tuple]]) -> Batch:
+        # all item chunks of one parent chunk, for the parent's batch
+        batch = []
+        for rows in await asyncio.to_thread(list, chunks):
+            if rows:
+                item_columns, rows, _ = await self._with_ids(table, columns, rows)
+                batch.append((table, item_columns, rows))
+        return batch
+
+    # ==== TOMEK ====
+
+    async def seed_courses(self, num: int = 100) -> List[int]:
+        ids = await self._load("course", gen.COURSE_COLUMNS, self._rows("course", gen.courses, num), returning="course_id")
+        logging.info(f"Added {str(num)} courses")
+        return ids
+
+    async def seed_ingredients(self, num: int = 150) -> List[int]:
+        ids = await self._load("ingredient", gen.INGREDIENT_COLUMNS, self._rows("ingredient", gen.ingredients, num),
+                               returning="ingredient_id")
+        logging.info(f"Added {str(num)} ingredients")
+        return ids
+
+    async def seed_course_ingredient_relations(self, course_ids: Sequence[int], ingredient_ids: Sequence[int],
+                                               min_per_course: int = 3, max_per_course: int = 8) -> int:
+        if not course_ids or not ingredient_ids:
+            return 0
+        relations = self._rows_per_parent("course_ingredient", gen.children, course_ids, max_per_course,
+                                          ingredient_ids, min_per_course, max_per_course)
+        inserted = await self._load("course_ingredient", ("course_id", "ingredient_id"), relations)
+        logging.info(f"Added {str(inserted)} coures ingredient relations")
+        return inserted
+
+    async def seed_allergens(self, allergen_names: Optional[Sequence[str]] = None) -> List[int]:
+        data = gen.described(self._context("allergen"), ALLERGEN_NAMES if allergen_names is None else allergen_names)
+        ids = await self._load("allergen", ("name", "description"), iter([data]), returning="allergen_id")
+        logging.info(f"Added {str(len(data))} allergens")
+        return ids
+
+    async def seed_allergen_ingredient_relations(self, ingredient_ids: Sequence[int],
+                                                 allergen_ids: Sequence[int], probability: float = 0.20) -> int:
+        if not ingredient_ids or not allergen_ids:
+            return 0
+        relations = self._rows_per_parent("allergen_ingredient", gen.allergen_ingredients, ingredient_ids, 1,
+                                          allergen_ids, probability)
+        inserted = await self._load("allergen_ingredient", ("allergen_id", "ingredient_id"), relations)
+        logging.info(f"Added {str(inserted)} allergen ingredient relations")
+        return inserted
+
+    async def seed_preferences(self, customer_ids: Sequence[int], ingredient_ids: Sequence[int]) -> int:
+        if not customer_ids or not ingredient_ids:
+            return 0
+        preferences_data = self._rows_per_parent("preference", gen.preferences, customer_ids, 100, ingredient_ids)
+        inserted_count = await self._load("preference", gen.PREFERENCE_COLUMNS, preferences_data)
+        logging.info(f"Added {inserted_count} preferences")
+        return inserted_count
+
+    async def seed_opinions(self, customer_ids: Sequence[int], course_ids: Sequence[int], num: int = 1500) -> int:
+        if not customer_ids or not course_ids:
+            return 0
+        opinions_data = self._generate("opinion", gen.opinions,
+                                       slice_parts(self._opinion_pairs(customer_ids, course_ids, num), self.chunk_size),
+                                       customer_ids, course_ids)
+        inserted_count = await self._load("opinion", gen.OPINION_COLUMNS, opinions_data)
+        logging.info(f"Added {inserted_count} opinions")
+        return inserted_count
+
+    # ===== BARTOSH =====
+
+    async def seed_customers_with_addresses(self, num = 1000):
+        users_ids = await self._seed_users(num)
+        addresses_ids = await self._load("address", gen.ADDRESS_COLUMNS, self._rows("address", gen.addresses, int(num * 3)),
+                                         returning="address_id")
+        logging.info(f"Added {len(addresses_ids)} addresses")
+
+        users_addresses_ids, default_addresses_ids = self._pick_addresses(len(users_ids), addresses_ids)
+        customers_ids = await self._load("customer", ("user_id", "default_address_id"),
+                                         self._rechunk(zip(users_ids, default_addresses_ids)), returning="customer_id")
+        logging.info(f"Added {len(customers_ids)} customers")
+        customers_with_addresses_ids = self._keep_addresses(customers_ids, users_addresses_ids)
+
+        inserted = await self._load("customer_address", ("customer_id", "address_id"), self._rechunk(
+            (customer_id, address_id)
+            for customer_id in customers_with_addresses_ids
+            for address_id in self.customer_addresses[customer_id]
+        ))
+        logging.info(f"Added {inserted} customer addresses")
+        return customers_with_addresses_ids
+
+    async def _seed_users(self, num = 1000, role: str = "customer"):
+        ids = await self._load("user", gen.USER_COLUMNS, self._rows(f"user:{role}", gen.users, num, role),
+                               returning="user_id")
+        logging.info(f"Added {num} users")
+        return ids
+
+    async def _customer_addresses(self, customers_ids: Sequence[int]) -> Dict[int, List[int]]:
+        missing = [cid for cid in set(customers_ids) if cid not in self.customer_addresses]
+        if missing:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT customer_id, address_id
+                    FROM "customer_address"
+                    WHERE customer_id = ANY($1::int[])
+                    ORDER BY customer_address_id;
+                """, missing)
+            for customer_id, address_id in rows:
+                self.customer_addresses.setdefault(customer_id, []).append(address_id)
+        return self.customer_addresses
+
+    async def seed_orders(self, customers_with_addresses_ids, how_much_with_order = 0.8, min_items = 1, max_items = 15, chunk_size = None):
+        # every batch commits on its own here, so chunk_size only exists for the same signature
+        if not customers_with_addresses_ids:
+            return [], []
+
+        customers_with_orders_ids = self._ordering_customers(customers_with_addresses_ids, how_much_with_order)
+        customer_addresses = await self._customer_addresses(customers_with_orders_ids)
+        addresses = {cid: customer_addresses[cid] for cid in set(customers_with_orders_ids) if cid in customer_addresses}
+        orders = self._rows("order", gen.orders, len(customers_with_orders_ids), customers_with_orders_ids)
+        orders_ids: List[int] = []
+        order_items_ids: List[int] = []
+
+        async def batches() -> AsyncIterator[Batch]:
+            index = 0
+            while (rows := await self._next(orders)) is not None:
+                columns, rows, ids = await self._with_ids("order", gen.ORDER_COLUMNS, rows, "order_id")
+                items = self._rows_per_parent(f"order_item:{index}", gen.order_items,
+                                              [(oid, row[7]) for oid, row in zip(ids, rows)], max_items,
+                                              addresses, min_items, max_items)
+                batch = [("order", columns, rows)]
+                batch += await self._items("order_item", gen.ORDER_ITEM_COLUMNS, items)
+                order_items_ids.extend(row[0] for _, _, item_rows in batch[1:] for row in item_rows)
+                orders_ids.extend(ids)
+                index += 1
+                yield batch
+
+        try:
+            await self._pipeline(batches())
+        except Exception as e:
+            logging.error(f"Failed to add orders: {e}")
+            raise
+        logging.info(f"Added {len(orders_ids)} orders and {len(order_items_ids)} order items")
+        return orders_ids, order_items_ids
+
+    async def seed_invoices(self, orders_ids, invoice_rate = 0.5):
+        if not orders_ids:
+            return []
+        orders_with_invoices_ids = self._context("invoice:orders").random.sample(orders_ids, int(len(orders_ids) * invoice_rate))
+        invoices_data = self._generate("invoice", gen.invoices, slice_parts(orders_with_invoices_ids, self.chunk_size))
+        inserted = await self._load("invoice", gen.INVOICE_COLUMNS, invoices_data)
+        logging.info(f"Added {inserted} invoices")
+
+    # ===== OLA =====
+
+    async def seed_category(self, category_names: Optional[Sequence[str]] = None) -> List[int]:
+        category_data = gen.described(self._context("category"), CATEGORY_NAMES if category_names is None else category_names)
+        ids = await self._load("category", ("name", "description"), iter([category_data]), returning="id")
+        logging.info(f"Added {str(len(category_data))} categories")
+        return ids
+
+    async def seed_course_category_relations(self, course_ids: Sequence[int], category_ids: Sequence[int], min_per_course: int = 0, max_per_course: int = 8) -> int:
+        if not course_ids or not category_ids:
+            return 0
+        relations = self._rows_per_parent("course_category", gen.children, course_ids, max_per_course,
+                                          category_ids, min_per_course, max_per_course)
+        inserted = await self._load("course_category", ("course_id", "category_id"), relations)
+        logging.info(f"Added {str(inserted)} course-category relations")
+        return inserted
+
+    async def seed_dieticians(self, num: int = 20, certification_names: Optional[Sequence[str]] = None) -> List[int]:
+        user_ids = await self._seed_users(num, role="dietician")
+        if not user_ids:
+            return []
+        data = self._generate("dietician", gen.dieticians, slice_parts(user_ids, self.chunk_size),
+                              certification_names or CERTIFICATION_NAMES)
+        ids = await self._load("dietician", gen.DIETICIAN_COLUMNS, data, returning="id")
+        logging.info(f"Added {len(ids)} dieticians")
+        return ids
+
+    async def seed_meal_plans(self, num: int = 50, dietician_ids: Optional[Sequence[int]] = None, probability: float = 0.2) -> List[int]:
+        ids = await self._load("meal_plan", gen.MEAL_PLAN_COLUMNS,
+                               self._rows("meal_plan", gen.meal_plans, num, dietician_ids, probability), returning="id")
+        logging.info(f"Added {len(ids)} meal plans")
+        return ids
+
+    async def seed_meal_plan_days_and_items(self, meal_plan_ids: Sequence[int], course_ids: Sequence[int], min_days: int = 3, max_days: int = 31,
+                                            min_items: int = 1, max_items: int = 6) -> int:
+        if not meal_plan_ids or not course_ids:
+            return 0
+        days_chunks = self._rows_per_parent("meal_plan_day", gen.meal_plan_days, meal_plan_ids, max_days,
+                                            min_days, max_days)
+        total_days = 0
+        total_items = 0
+
+        async def batches() -> AsyncIterator[Batch]:
+            nonlocal total_days, total_items
+            index = 0
+            while (days := await self._next(days_chunks)) is not None:
+                columns, days, day_ids = await self._with_ids("meal_plan_day", gen.MEAL_PLAN_DAY_COLUMNS, days,
+                                                              "meal_plan_day_id")
+                items = self._rows_per_parent(f"meal_plan_item:{index}", gen.sequenced_items, day_ids, max_items,
+                                              course_ids, min_items, max_items, False)
+                batch = [("meal_plan_day", columns, days)]
+                batch += await self._items("meal_plan_item", ("course_id", "meal_plan_day_id", "sequence"), items)
+                total_days += len(days)
+                total_items += sum(len(rows) for _, _, rows in batch[1:])
+                index += 1
+                yield batch
+
+        try:
+            await self._pipeline(batches())
+        except Exception as e:
+            logging.error(f"Failed to add meal plan days/items: {e}")
+            raise
+        logging.info(f"Added {total_days} meal plan days and {total_items} items")
+        return total_items
+
+    async def seed_daily_menus_and_items(self,  course_ids: Sequence[int], dietician_ids: Sequence[int], min_items: int = 3, max_items: int = 6, num_menus: int = 1000) -> List[int]:
+        if not course_ids or not dietician_ids:
+            return []
+        first_day, day_offsets = self._menu_days(num_menus)
+        menus_chunks = self._generate("daily_menu", gen.daily_menus, slice_parts(day_offsets, self.chunk_size),
+                                      first_day, dietician_ids)
+        menu_ids: List[int] = []
+        items_count = 0
+
+        async def batches() -> AsyncIterator[Batch]:
+            nonlocal items_count
+            index = 0
+            while (menus := await self._next(menus_chunks)) is not None:
+                columns, menus, chunk_ids = await self._with_ids("daily_menu", gen.DAILY_MENU_COLUMNS, menus,
+                                                                 "daily_menu_id")
+                items = self._rows_per_parent(f"daily_menu_item:{index}", gen.sequenced_items, chunk_ids, max_items,
+                                              course_ids, min_items, max_items)
+                batch = [("daily_menu", columns, menus)]
+                batch += await self._items("daily_menu_item", ("menu_id", "course_id", "sequence"), items)
+                menu_ids.extend(chunk_ids)
+                items_count += sum(len(rows) for _, _, rows in batch[1:])
+                index += 1
+                yield batch
+
+        try:
+            await self._pipeline(batches())
+        except Exception as e:
+            logging.error(f"Failed to add daily menus/items: {e}")
+            raise
+        logging.info(f"Added {len(menu_ids)} daily menus and {items_count} items")
+        return menu_ids
+
+    async def seed_course_in_order_item(self, order_item_ids: Sequence[int], course_item_ids: Sequence[int], min_per_item: int = 1, max_per_item: int = 8) -> List[int]:
+        if not order_item_ids or not course_item_ids:
+            return []
+        relations = self._rows_per_parent("course_in_order_item", gen.children, order_item_ids, max_per_item,
+                                          course_item_ids, min_per_item, max_per_item, True)
+        course_in_order_ids = await self._load("course_in_order_item", ("course_id", "order_item_id"), relations,
+                                               returning="id")
+        logging.info(f"Added {str(len(course_in_order_ids))} course in order relations")
+        return course_in_order_ids
+
+    async def seed_complaints(self, course_in_order_items_ids: Sequence[int], probability: float = 0.01) -> int:
+        if not course_in_order_items_ids:
+            return 0
+        selected_ids = self._complained_items(course_in_order_items_ids, probability)
+        if not selected_ids:
+            logging.info("No complaints were generated based on the probability.")
+            return 0
+
+        loop = asyncio.get_running_loop()
+
+        async def sources(ids: Sequence[int]) -> Dict[int, Tuple]:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(_numbered(COMPLAINT_SOURCES_SQL), list(ids))
+            return {row[0]: (row[1], row[2]) for row in rows}
+
+        # the source rows of a chunk are fetched when the chunk is generated, so only the chunks
+        # in flight are held; that happens in the generation thread, which waits on the loop
+        def parts() -> Iterator[Tuple[int, List[Tuple]]]:
+            for start, ids in slice_parts(selected_ids, self.chunk_size):
+                mapping = asyncio.run_coroutine_threadsafe(sources(ids), loop).result()
+                yield start, [(cio_id,) + mapping[cio_id] for cio_id in ids if cio_id in mapping]
+
+        def chunks() -> Iterator[List[Tuple]]:
+            # ShardPool.map consumes its first window of parts right away, so it has to start there too
+            yield from self._generate("complaint", gen.complaints, parts())
+
+        complaints_inserted = await self._load("complaint", gen.COMPLAINT_COLUMNS, chunks())
+        logging.info(f"Added {complaints_inserted} complaints")
+        return complaints_inserted
+
+    # ===== MARIUSZ =====
+
+    async def _seed_role(self, table: str, column: str, num: int, role: str) -> List[int]:
+        user_ids = await self._seed_users(num, role=role)
+        if not user_ids:
+            return []
+        return await self._load(table, (column,), self._rechunk((uid,) for uid in user_ids), returning=column)
+
+    async def seed_cooks(self, num: int = 50) -> List[int]:
+        ids = await self._seed_role("cook", "cook_id", num, "cook")
+        logging.info(f"Added {len(ids)} cooks")
+        return ids
+
+    async def seed_couriers(self, num: int = 50) -> List[int]:
+        ids = await self._seed_role("courier", "courier_id", num, "courier")
+        logging.info(f"Added {len(ids)} couriers")
+        return ids
+
+    async def _seed_names(self, table: str, names: Sequence[str], returning: str) -> List[int]:
+        return await self._load(table, ("name",), iter([[(name,) for name in names]]), returning=returning)
+
+    async def seed_courier_types(self, type_names: Optional[Sequence[str]] = None) -> List[int]:
+        ids = await self._seed_names("courier_type", COURIER_TYPE_NAMES if type_names is None else type_names, "courier_type_id")
+        logging.info(f"Added {len(ids)} courier types")
+        return ids
+
+    async def seed_specialties(self, specialty_names: Optional[Sequence[str]] = None) -> List[int]:
+        ids = await self._seed_names("specialty", SPECIALTY_NAMES if specialty_names is None else specialty_names, "id")
+        logging.info(f"Added {len(ids)} specialties")
+        return ids
+
+    async def seed_courier_types_relations(self, courier_ids: Sequence[int], type_ids: Sequence[int], min_types: int = 1, max_types: int = 3) -> int:
+        if not courier_ids or not type_ids:
+            return 0
+        relations = self._rows_per_parent("courier_types", gen.children, courier_ids, max_types,
+                                          type_ids, min_types, max_types)
+        inserted_count = await self._load("courier_types", ("courier_id", "courier_type_id"), relations)
+        logging.info(f"Added {inserted_count} courier-type relations")
+        return inserted_count
+
+    async def seed_cook_specialty_relations(self, cook_ids: Sequence[int], specialty_ids: Sequence[int], min_specialties: int = 1, max_specialties: int = 4) -> int:
+        if not cook_ids or not specialty_ids:
+            return 0
+        relations = self._rows_per_parent("cook_speciality", gen.children, cook_ids, max_specialties,
+                                          specialty_ids, min_specialties, max_specialties, True)
+        inserted_count = await self._load("cook_speciality", ("specialty_id", "cook_id"), relations)
+        logging.info(f"Added {inserted_count} cook-specialty relations")
+        return inserted_count
+
+    async def seed_administrators(self, num: int = 5) -> List[int]:
+        user_ids = await self._seed_users(num, role="admin")
+        if not user_ids:
+            return []
+        admin_data = self._generate("administrator", gen.administrators, slice_parts(user_ids, self.chunk_size))
+        ids = await self._load("administrator", gen.ADMINISTRATOR_COLUMNS, admin_data, returning="user_id")
+        logging.info(f"Added {len(ids)} administrators")
+        return ids
+
+    async def seed_fulfillment_statuses(self) -> List[int]:
+        ids = await self._seed_names("order_item_fulfillment_status", FULFILLMENT_STATUS_NAMES, "id")
+        logging.info(f"Added {len(ids)} fulfillment statuses")
+        return ids
+
+    async def seed_delivery_statuses(self) -> List[int]:
+        ids = await self._seed_names("order_item_delivery_status", DELIVERY_STATUS_NAMES, "id")
+        logging.info(f"Added {len(ids)} delivery statuses")
+        return ids
+
+    async def seed_order_item_fulfillment_and_delivery(self, order_item_ids: Sequence[int], cook_ids: Sequence[int], courier_ids: Sequence[int], fulfillment_status_ids: Sequence[int], delivery_status_ids: Sequence[int]) -> Tuple[int, int]:
+        if not order_item_ids:
+            return 0, 0
+        chunks = self._generate("order_item_fulfillment", gen.fulfillment_and_delivery,
+                                slice_parts(order_item_ids, self.chunk_size), cook_ids, courier_ids)
+        f_count = 0
+        d_count = 0
+
+        async def batches() -> AsyncIterator[Batch]:
+            nonlocal f_count, d_count
+            while (chunk := await self._next(chunks)) is not None:
+                fulfillment_data, delivery_data = chunk
+                f_count += len(fulfillment_data)
+                d_count += len(delivery_data)
+                f_columns, fulfillment_data, _ = await self._with_ids("order_item_fulfillment", gen.FULFILLMENT_COLUMNS,
+                                                                      fulfillment_data)
+                d_columns, delivery_data, _ = await self._with_ids("order_item_delivery", gen.DELIVERY_COLUMNS,
+                                                                   delivery_data)
+                yield [("order_item_fulfillment", f_columns, fulfillment_data),
+                       ("order_item_delivery", d_columns, delivery_data)]
+
+        try:
+            await self._pipeline(batches())
+        except Exception as e:
+            logging.error(f"Failed to seed fulfillment/delivery: {e}")
+            raise
+        logging.info(f"Added {f_count} fulfillment records and {d_count} delivery records")
+        return f_count, d_count
+
+    async def get_order_item_ids(self) -> List[int]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch('SELECT order_item_id FROM "order_item";')
+        ids = [row[0] for row in rows]
+        logging.info(f"Fetched {len(ids)} order item IDs")
+        return ids
@@ -0,0 +1,309 @@
+import argparse
+import json
+import logging
+import re
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import psycopg2
+
+from db import get_db_connection
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='   %(levelname)s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+QUERY_GLOBS = ("etap5 (SELECT)/*/*.sql", "etap6 (Optimalizations)/*/*/*.sql")
+_VARIANT_RE = re.compile(r"^(?P<stem>.+)_(?P<variant>with|without)$")
+
+# statements starting with one of these are measured, everything else (PREPARE,
+# CREATE INDEX, SET, DEALLOCATE ...) is run as setup in file order
+_QUERY_KEYWORDS = ("select", "with", "values", "table", "execute")
+_LEADING_COMMENTS_RE = re.compile(r"^(\s*(--[^\n]*(\n|$)|/\*.*?\*/))*\s*", re.S)
+_EXPLAIN_RE = re.compile(r"^explain\s*(\([^)]*\)\s*|(analy[sz]e|verbose|buffers)\s+)*", re.I)
+_DOLLAR_TAG_RE = re.compile(r"\$([A-Za-z_][A-Za-z_0-9]*)?\$")
+
+
+def split_statements(sql: str) -> List[str]:
+    """Splits a script on `;`, skipping the ones in quotes, comments and dollar quotes."""
+    statements = []
+    start = 0
+    i = 0
+    n = len(sql)
+    while i < n:
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end < 0 else end
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+        elif sql[i] in "'\"":
+            quote = sql[i]
+            i += 1
+            while i < n and not (sql[i] == quote and not sql.startswith(quote * 2, i)):
+                i += 2 if sql.startswith(quote * 2, i) else 1
+            i += 1
+        elif sql[i] == "$" and (tag := _DOLLAR_TAG_RE.match(sql, i)):
+            end = sql.find(tag.group(0), tag.end())
+            i = n if end < 0 else end + len(tag.group(0))
+        elif sql[i] == ";":
+            statements.append(sql[start:i])
+            start = i = i + 1
+        else:
+            i += 1
+    statements.append(sql[start:])
+    return [s.strip() for s in statements if _LEADING_COMMENTS_RE.sub("", s).strip()]
+
+
+def query_body(statement: str) -> Optional[str]:
+    """The statement without comments and EXPLAIN options if it is a query, None for setup statements."""
+    body = _EXPLAIN_RE.sub("", _LEADING_COMMENTS_RE.sub("", statement))
+    return body if body.split(None, 1)[0].lower() in _QUERY_KEYWORDS else None
+
+
+class QueryFile:
+    def __init__(self, path: Path):
+        self.path = path
+        self.name = str(path.relative_to(ROOT))
+        self.statements = split_statements(path.read_text(encoding="utf-8"))
+        match = _VARIANT_RE.match(path.stem)
+        self.variant = match.group("variant") if match else None
+        # _with and _without files of the same query share a pair key
+        self.pair = str(path.parent.relative_to(ROOT) / match.group("stem")) if match else None
+
+
+def discover(patterns: Sequence[str] = QUERY_GLOBS) -> List[QueryFile]:
+    paths = sorted({path for pattern in patterns for path in ROOT.glob(pattern)})
+    return [QueryFile(path) for path in paths]
+
+
+def _buffers(node: Dict[str, Any]) -> Tuple[int, int]:
+    return node.get("Shared Hit Blocks", 0), node.get("Shared Read Blocks", 0)
+
+
+def explain(cur, query: str) -> Dict[str, Any]:
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")
+    result = cur.fetchone()[0]
+    return (json.loads(result) if isinstance(result, str) else result)[0]
+
+
+class Runner:
+    """Runs query files and collects EXPLAIN ANALYZE numbers per statement.
+
+    Every run of a file is one transaction that is rolled back, so setup in
+    a file (e.g. CREATE INDEX in a _with variant) never leaks into the next
+    file. A cold run starts from a new session, after `cold_command` (e.g. a
+    server restart and dropping the OS cache) when given, or after evicting
+    shared buffers where the server supports it (pg_buffercache_evict, PG 17+).
+    """
+
+    def __init__(self, runs: int = 10, cold_runs: int = 3, cold_command: Optional[str] = None):
+        self.runs = runs
+        self.cold_runs = cold_runs
+        self.cold_command = cold_command
+        self.conn = get_db_connection()
+        self.can_evict = self._can_evict()
+
+    @property
+    def cold_method(self) -> str:
+        if self.cold_command:
+            return f"command: {self.cold_command}"
+        return "new session, shared buffers evicted" if self.can_evict else "new session only (OS and shared buffers stay warm)"
+
+    def _can_evict(self) -> bool:
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT to_regproc('pg_buffercache_evict') IS NOT NULL;")
+            can_evict = cur.fetchone()[0]
+        self.conn.rollback()
+        return can_evict
+
+    def _reconnect(self, timeout: float = 60.0) -> None:
+        self.conn.close()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.conn = get_db_connection()
+                return
+            except psycopg2.OperationalError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+
+    def _make_cold(self) -> None:
+        if self.cold_command:
+            self.conn.close()
+            subprocess.run(self.cold_command, shell=True, check=True)
+        elif self.can_evict:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT count(pg_buffercache_evict(bufferid)) FROM pg_buffercache WHERE relfilenode IS NOT NULL;")
+            self.conn.commit()
+        self._reconnect()
+
+    def _run_once(self, query_file: QueryFile) -> List[Dict[str, Any]]:
+        plans = []
+        try:
+            with self.conn.cursor() as cur:
+                for statement in query_file.statements:
+                    body = query_body(statement)
+                    if body is None:
+                        cur.execute(statement)
+                    else:
+                        plans.append(explain(cur, body))
+        finally:
+            self.conn.rollback()
+            # PREPARE is not transactional
+            with self.conn.cursor() as cur:
+                cur.execute("DEALLOCATE ALL;")
+            self.conn.commit()
+        return plans
+
+    def run(self, query_file: QueryFile) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"file": query_file.name, "variant": query_file.variant, "pair": query_file.pair}
+        try:
+            cold = []
+            for _ in range(self.cold_runs):
+                self._make_cold()
+                cold.append(self._run_once(query_file))
+            self._run_once(query_file)  # warm-up
+            warm = [self._run_once(query_file) for _ in range(self.runs)]
+        except psycopg2.Error as e:
+            logging.error(f"{query_file.name} failed: {e}")
+            result["error"] = str(e).strip()
+            return result
+
+        queries = [body for body in map(query_body, query_file.statements) if body is not None]
+        result["statements"] = [
+            {
+                "sql": body,
+                "warm": summarize([run[i] for run in warm]),
+                "cold": summarize([run[i] for run in cold]),
+                "plan": warm[-1][i] if warm else None,
+            }
+            for i, body in enumerate(queries)
+        ]
+        result["warm"] = summarize_totals(warm)
+        result["cold"] = summarize_totals(cold)
+        logging.info(f"{query_file.name}: warm p50 {result['warm'].get('p50_ms', 0):.2f} ms, "
+                     f"cold p50 {result['cold'].get('p50_ms', 0):.2f} ms")
+        return result
+
+
+def _latencies(plans: Sequence[Dict[str, Any]]) -> List[float]:
+    return [plan.get("Planning Time", 0.0) + plan.get("Execution Time", 0.0) for plan in plans]
+
+
+def _stats(latencies: Sequence[float], hits: int, reads: int) -> Dict[str, Any]:
+    if not latencies:
+        return {"runs": 0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+    return {
+        "runs": len(latencies),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "min_ms": min(latencies),
+        "max_ms": max(latencies),
+        "mean_ms": float(np.mean(latencies)),
+        "shared_hit_blocks": hits,
+        "shared_read_blocks": reads,
+        "hit_ratio": hits / (hits + reads) if hits + reads else None,
+    }
+
+
+def _total_buffers(plans: Sequence[Dict[str, Any]]) -> Tuple[int, int]:
+    # the top plan node counts its whole subtree; planning has its own counters
+    hits = reads = 0
+    for plan in plans:
+        for node in (plan["Plan"], plan.get("Planning", {})):
+            h, r = _buffers(node)
+            hits += h
+            reads += r
+    return hits, reads
+
+
+def summarize(plans: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """One statement over all runs."""
+    return _stats(_latencies(plans), *_total_buffers(plans))
+
+
+def summarize_totals(runs: Sequence[Sequence[Dict[str, Any]]]) -> Dict[str, Any]:
+    """A whole file over all runs, the latency of a run being the sum of its statements."""
+    return _stats([sum(_latencies(run)) for run in runs], *_total_buffers([plan for run in runs for plan in run]))
+
+
+def compare(results: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    pairs: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for result in results:
+        if result.get("pair") and "error" not in result:
+            pairs.setdefault(result["pair"], {})[result["variant"]] = result
+
+    comparisons = []
+    for pair, variants in sorted(pairs.items()):
+        if "with" not in variants or "without" not in variants:
+            continue
+        entry: Dict[str, Any] = {"pair": pair, "with": variants["with"]["file"], "without": variants["without"]["file"]}
+        for cache in ("warm", "cold"):
+            with_ms = variants["with"][cache].get("p50_ms")
+            without_ms = variants["without"][cache].get("p50_ms")
+            entry[f"{cache}_p50_ms_with"] = with_ms
+            entry[f"{cache}_p50_ms_without"] = without_ms
+            entry[f"{cache}_speedup"] = without_ms / with_ms if with_ms and without_ms is not None else None
+        comparisons.append(entry)
+    return comparisons
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the etap5 queries and the etap6 _with/_without pairs")
+    parser.add_argument("--runs", type=int, default=10, help="timed warm runs per file (after one warm-up run)")
+    parser.add_argument("--cold-runs", type=int, default=3, help="runs per file each starting from a cold cache")
+    parser.add_argument("--cold-command", default=None,
+                        help="shell command run before every cold run, e.g. a server restart and dropping the OS cache")
+    parser.add_argument("--filter", default=None, help="only files whose path contains this text")
+    parser.add_argument("--output", default="benchmark_results.json", help="where the JSON results go")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = parse_args(argv)
+    files = [f for f in discover() if not args.filter or args.filter in f.name]
+    runner = Runner(runs=args.runs, cold_runs=args.cold_runs, cold_command=args.cold_command)
+    try:
+        with runner.conn.cursor() as cur:
+            cur.execute("SHOW server_version;")
+            server_version = cur.fetchone()[0]
+        runner.conn.rollback()
+
+        results = [runner.run(f) for f in files]
+        report = {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "server_version": server_version,
+            "runs": args.runs,
+            "cold_runs": args.cold_runs,
+            "cold_cache": runner.cold_method,
+            "latency": "Planning Time + Execution Time from EXPLAIN ANALYZE, per file the sum over its queries",
+            "queries": results,
+            "comparisons": compare(results),
+        }
+    finally:
+        runner.conn.close()
+
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    logging.info(f"Benchmarked {len(files)} files, results in {args.output}")
+    for entry in report["comparisons"]:
+        if entry["warm_p50_ms_without"] is None or entry["warm_p50_ms_with"] is None:
+            # compare() leaves the p50 empty for a variant without successful warm runs
+            logging.info(f"{entry['pair']}: no warm runs to compare")
+            continue
+        logging.info(f"{entry['pair']}: warm p50 {entry['warm_p50_ms_without']:.2f} ms without, "
+                     f"{entry['warm_p50_ms_with']:.2f} ms with (x{entry['warm_speedup'] or 0:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from psycopg2.extensions import quote_ident
+
+import report_cache
+from db import pooled_connection, settings
+
+# what prepare() dropped, kept until finish() has put all of it back
+STATE_DIR = Path.home() / ".cache" / "etap3" / "bulk_load"
+
+FOREIGN_KEYS_SQL = """
+    SELECT c.conrelid::regclass::text, c.conname, pg_get_constraintdef(c.oid)
+    FROM pg_constraint c
+    JOIN pg_namespace n ON n.oid = c.connamespace
+    WHERE c.contype = 'f' AND n.nspname = 'public'
+    ORDER BY 1, 2;
+"""
+
+# plain secondary indexes: unique ones and the ones backing a constraint stay,
+# they are FK targets and keep the generated data honest
+INDEXES_SQL = """
+    SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+    FROM pg_index i
+    JOIN pg_class t ON t.oid = i.indrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    WHERE n.nspname = 'public' AND NOT i.indisunique
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid AND c.contype IN ('p', 'u', 'x'))
+    ORDER BY 1;
+"""
+
+TRIGGER_TABLES_SQL = """
+    SELECT DISTINCT t.tgrelid::regclass::text
+    FROM pg_trigger t
+    JOIN pg_class r ON r.oid = t.tgrelid
+    JOIN pg_namespace n ON n.oid = r.relnamespace
+    WHERE NOT t.tgisinternal AND t.tgenabled <> 'D' AND n.nspname = 'public'
+    ORDER BY 1;
+"""
+
+PERMANENT_TABLES_SQL = """
+    SELECT c.oid::regclass::text
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'r' AND c.relpersistence = 'p' AND n.nspname = 'public'
+    ORDER BY 1;
+"""
+
+
+class BulkLoad:
+    """Loads without foreign keys, secondary indexes and user triggers.
+
+    `prepare` reads them from the catalogs (the FKs of create_tables.sql, the
+    indexes of etap6/migration/up.sql if applied) and drops/disables them;
+    `finish` rebuilds the indexes in parallel, adds the FKs back NOT VALID,
+    validates them in parallel, re-enables the triggers and runs ANALYZE.
+    Every phase is timed in `timings`.
+
+    With `unlogged` the tables are also switched to UNLOGGED for the load (no
+    WAL; a crash empties them, fine for a reproducible dataset) and back to
+    LOGGED before the indexes are built. Permanent and unlogged tables cannot
+    reference each other, which is why this only works with the FKs dropped.
+
+    The dropped definitions are written to `state_path` before anything is
+    dropped and the file is removed once `finish` has restored all of them.
+    If a load dies in between, the next `prepare` on the same database finds
+    the file and restores the schema first.
+    """
+
+    def __init__(self, workers: int = 4, unlogged: bool = False, state_path: Optional[Path] = None):
+        self.workers = max(1, workers)
+        self.unlogged = unlogged
+        self.state_path = Path(state_path) if state_path else STATE_DIR / (
+            re.sub(r"[^\w.-]", "_", f"{settings.DB_HOST}-{settings.DB_PORT}-{settings.DB_NAME}") + ".json")
+        self.unlogged_tables: List[str] = []
+        self.foreign_keys: List[Tuple[str, str, str]] = []  # (table, name, definition)
+        self.indexes: List[Tuple[str, str]] = []  # (name, definition)
+        self.trigger_tables: List[str] = []
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+            logging.info(f"Bulk load phase '{name}' took {self.timings[name]:.2f}s")
+
+    def _save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.state_path.with_name(self.state_path.name + ".partial")
+        partial.write_text(json.dumps({
+            "foreign_keys": self.foreign_keys,
+            "indexes": self.indexes,
+            "trigger_tables": self.trigger_tables,
+            "unlogged_tables": self.unlogged_tables,
+        }, indent=2), encoding="utf-8")
+        partial.replace(self.state_path)
+
+    def _load_state(self) -> None:
+        state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        self.foreign_keys = [tuple(fk) for fk in state["foreign_keys"]]
+        self.indexes = [tuple(index) for index in state["indexes"]]
+        self.trigger_tables = state["trigger_tables"]
+        self.unlogged_tables = state["unlogged_tables"]
+
+    def recover(self) -> bool:
+        """Restores what an unfinished bulk load left dropped; returns whether there was one."""
+        if not self.state_path.exists():
+            return False
+        logging.warning(f"A previous bulk load did not finish, restoring the schema saved in {self.state_path}")
+        self._load_state()
+        self.finish()
+        return True
+
+    def prepare(self) -> None:
+        self.recover()
+        with self.phase("drop"), pooled_connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(FOREIGN_KEYS_SQL)
+                    self.foreign_keys = cur.fetchall()
+                    cur.execute(INDEXES_SQL)
+                    self.indexes = cur.fetchall()
+                    cur.execute(TRIGGER_TABLES_SQL)
+                    self.trigger_tables = [row[0] for row in cur.fetchall()]
+                    if self.unlogged:
+                        cur.execute(PERMANENT_TABLES_SQL)
+                        self.unlogged_tables = [row[0] for row in cur.fetchall()]
+                    # saved before the first DROP, the DROPs are only kept together with this file
+                    self._save_state()
+
+                    for table, name, _ in self.foreign_keys:
+                        cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT {quote_ident(name, cur)};")
+                    for name, _ in self.indexes:
+                        cur.execute(f"DROP INDEX {name};")
+                    for table in self.trigger_tables:
+                        cur.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER;")
+
+                    for table in self.unlogged_tables:
+                        cur.execute(f"ALTER TABLE {table} SET UNLOGGED;")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                self.state_path.unlink(missing_ok=True)
+                logging.error("Failed to drop foreign keys and indexes for the bulk load")
+                raise
+        logging.info(f"Dropped {len(self.foreign_keys)} foreign keys and {len(self.indexes)} indexes, "
+                     f"disabled triggers on {len(self.trigger_tables)} tables"
+                     + (f", {len(self.unlogged_tables)} tables unlogged" if self.unlogged else ""))
+
+    def _parallel(self, statements: Sequence[str]) -> None:
+        # every statement on its own pooled connection
+        def run(sql: str) -> None:
+            with pooled_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                conn.commit()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk") as pool:
+            list(pool.map(run, statements))
+
+    def finish(self) -> Dict[str, float]:
+        """Puts back everything `prepare` dropped. Parts already restored are skipped, so it can be rerun."""
+        if self.unlogged_tables:
+            # SET LOGGED rewrites the table into WAL, before the indexes so they are built only once
+            with self.phase("logged"):
+                self._parallel([f"ALTER TABLE {table} SET LOGGED;" for table in self.unlogged_tables])
+
+        with self.phase("indexes"):
+            self._parallel([definition.replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1) + ";"
+                            for _, definition in self.indexes])
+
+        with self.phase("foreign keys"):
+            # adding NOT VALID only takes a short lock and skips the scan; the
+            # scans run afterwards in VALIDATE, several tables at a time
+            to_validate = []
+            with pooled_connection() as conn:
+                with conn.cursor() as cur:
+                    for table, name, definition in self.foreign_keys:
+                        valid = not definition.endswith(" NOT VALID")
+                        cur.execute("SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s;",
+                                    (table, name))
+                        if cur.fetchone() is None:
+                            cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {quote_ident(name, cur)} "
+                                        f"{definition}{' NOT VALID' if valid else ''};")
+                        if valid:
+                            to_validate.append(f"ALTER TABLE {table} VALIDATE CONSTRAINT {quote_ident(name, cur)};")
+                conn.commit()
+            self._parallel(to_validate)
+
+        with self.phase("triggers"), pooled_connection() as conn:
+            with conn.cursor() as cur:
+                for table in self.trigger_tables:
+                    cur.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER;")
+                if self.trigger_tables:
+                    # the load fired no NOTIFY triggers, tell report caches that everything changed
+                    cur.execute("SELECT pg_notify(%s, %s);", (report_cache.NOTIFY_CHANNEL, report_cache.ALL_TABLES))
+            conn.commit()
+
+        with self.phase("analyze"), pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("ANALYZE;")
+                # a synchronous commit also flushes the WAL of every earlier
+                # commit made with synchronous_commit=off
+                cur.execute("SET LOCAL synchronous_commit = on;")
+            conn.commit()
+
+        self.state_path.unlink(missing_ok=True)
+        logging.info("Bulk load phases: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.timings.items()))
+        return self.timings
+
+    def unwind(self) -> None:
+        """`finish` after a failed load: its errors are only logged, so the load's error stays the one raised."""
+        try:
+            self.finish()
+        except Exception as e:
+            logging.error(f"Failed to restore the schema after the failed load, the next bulk load restores it "
+                          f"from {self.state_path}: {e}")
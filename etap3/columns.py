@@ -0,0 +1,80 @@
+from datetime import date, datetime
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# Column generators: one vectorized NumPy call per column instead of a Python
+# loop of random.uniform/round/choice. Everything returns plain Python lists
+# (via .tolist()) so the values go straight into the loaders.
+
+
+def uniform(rng: np.random.Generator, n: int, low: float, high: float, decimals: int = 2) -> List[float]:
+    return np.round(rng.uniform(low, high, n), decimals).tolist()
+
+
+def integers(rng: np.random.Generator, n: int, low: int, high: int) -> List[int]:
+    # inclusive on both ends, like random.randint
+    return rng.integers(low, high, n, endpoint=True).tolist()
+
+
+def choice(rng: np.random.Generator, n: int, values: Sequence) -> list:
+    idx = rng.integers(0, len(values), n)
+    return [values[i] for i in idx.tolist()]
+
+
+def chance(rng: np.random.Generator, n: int, probability: float) -> np.ndarray:
+    # boolean mask, True with the given probability (random.random() < probability)
+    return rng.random(n) < probability
+
+
+def money_with_vat(rng: np.random.Generator, n: int, low: float, high: float,
+                   vat_rates: Sequence[float]) -> Tuple[List[float], List[float], List[float], List[float]]:
+    """vat_rate, net_total, vat_total, gross_total columns.
+
+    Amounts are computed in integer cents (VAT rounded half-up), so
+    vat_total and gross_total are exact to 2 decimals and gross == net + vat.
+    """
+    net_cents = np.round(rng.uniform(low, high, n) * 100).astype(np.int64)
+    rates_bp = np.round(np.asarray(vat_rates) * 10000).astype(np.int64)
+    rate_bp = rates_bp[rng.integers(0, len(rates_bp), n)]
+    vat_cents = (net_cents * rate_bp + 5000) // 10000
+    gross_cents = net_cents + vat_cents
+    return ((rate_bp / 10000).tolist(), (net_cents / 100).tolist(),
+            (vat_cents / 100).tolist(), (gross_cents / 100).tolist())
+
+
+def timestamps(rng: np.random.Generator, n: int, start: datetime, end: datetime) -> List[datetime]:
+    start_us = np.datetime64(start, "us")
+    span = int((np.datetime64(end, "us") - start_us).astype(np.int64))
+    return (start_us + rng.integers(0, max(span, 1), n).astype("timedelta64[us]")).tolist()
+
+
+def optional(values: Sequence, keep: np.ndarray) -> list:
+    # None where the mask is False, e.g. optional(values, chance(rng, n, 0.2))
+    return [value if kept else None for value, kept in zip(values, keep.tolist())]
+
+
+def timestamps_after(rng: np.random.Generator, starts: Sequence, end) -> List[datetime]:
+    """start + uniform part of (end - start), never before start; `end` may be one per start.
+
+    Dates among `starts` count as their midnight.
+    """
+    start_us = np.asarray(starts, dtype="datetime64[us]")
+    span = np.maximum((np.asarray(end, dtype="datetime64[us]") - start_us).astype(np.int64), 0)
+    return (start_us + np.floor(rng.random(len(start_us)) * span).astype("timedelta64[us]")).tolist()
+
+
+def dates_after(rng: np.random.Generator, starts: Sequence[date], max_days) -> List[date]:
+    """start + uniform 0..max_days days (inclusive); `max_days` may be an array."""
+    start_days = np.asarray(starts, dtype="datetime64[D]")
+    offsets = np.floor(rng.random(len(start_days)) * (np.asarray(max_days) + 1)).astype("timedelta64[D]")
+    return (start_days + offsets).tolist()
+
+
+def dates_between(rng: np.random.Generator, n: int, start: date, end: date) -> List[date]:
+    # inclusive on both ends, like Faker's date_between
+    return dates_after(rng, [start] * n, (end - start).days)
+
+
+def days_until(starts: Sequence[date], end: date) -> np.ndarray:
+    return (np.datetime64(end, "D") - np.asarray(starts, dtype="datetime64[D]")).astype(np.int64)
@@ -1,5 +1,10 @@
 import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
 import psycopg2
+import psycopg2.pool
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,15 +21,126 @@ class Settings(BaseSettings):
     DB_USER: str = os.getenv("DB_USER")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD")
 
+    DB_POOL_MIN: int = os.getenv("DB_POOL_MIN", 1)
+    DB_POOL_MAX: int = os.getenv("DB_POOL_MAX", 10)
+    # seconds to wait for a free pooled connection before giving up
+    DB_POOL_TIMEOUT: float = os.getenv("DB_POOL_TIMEOUT", 30)
+
+    # session GUCs applied to every connection, left at the server default when empty
+    DB_SYNCHRONOUS_COMMIT: Optional[str] = os.getenv("DB_SYNCHRONOUS_COMMIT")
+    DB_WORK_MEM: Optional[str] = os.getenv("DB_WORK_MEM")
+    DB_MAINTENANCE_WORK_MEM: Optional[str] = os.getenv("DB_MAINTENANCE_WORK_MEM")
+
 
 settings = Settings()
 
-def get_db_connection():
-    conn = psycopg2.connect(
+
+def session_settings() -> Dict[str, str]:
+    gucs = {
+        "synchronous_commit": settings.DB_SYNCHRONOUS_COMMIT,
+        "work_mem": settings.DB_WORK_MEM,
+        "maintenance_work_mem": settings.DB_MAINTENANCE_WORK_MEM,
+    }
+    return {name: value for name, value in gucs.items() if value}
+
+
+def _connect_kwargs(dbname: Optional[str] = None) -> dict:
+    return dict(
         host=settings.DB_HOST,
         port=settings.DB_PORT,
-        dbname=settings.DB_NAME,
+        dbname=dbname or settings.DB_NAME,
         user=settings.DB_USER,
         password=settings.DB_PASSWORD
     )
+
+
+def get_db_connection(dbname: Optional[str] = None):
+    options = " ".join(f"-c {name}={value}" for name, value in session_settings().items())
+    conn = psycopg2.connect(options=options or None, **_connect_kwargs(dbname))
     return conn
+
+
+class SessionPool(psycopg2.pool.ThreadedConnectionPool):
+    """Thread-safe pool that blocks while all `maxconn` connections are checked out.
+
+    On checkout every connection is health-checked and gets the session GUCs
+    (re)applied in the same round trip; a dead connection is replaced.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, gucs: Optional[Dict[str, str]] = None,
+                 timeout: Optional[float] = None, **kwargs):
+        self.gucs = dict(gucs or {})
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, **kwargs)
+
+    def _check_out(self, conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                if self.gucs:
+                    placeholders = ", ".join("set_config(%s, %s, false)" for _ in self.gucs)
+                    cur.execute(f"SELECT {placeholders};", [v for item in self.gucs.items() for v in item])
+                else:
+                    cur.execute("SELECT 1;")
+            conn.commit()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.pool.PoolError(f"no free connection after {self.timeout}s")
+        try:
+            conn = super().getconn(key)
+            if conn.closed or not self._check_out(conn):
+                super().putconn(conn, key, close=True)
+                conn = super().getconn(key)
+                if not self._check_out(conn):
+                    raise psycopg2.pool.PoolError("could not get a healthy connection")
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            # the base pool rolls back anything left open before keeping the connection
+            super().putconn(conn, key, close=close or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+
+_pool: Optional[SessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SessionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = SessionPool(
+                int(settings.DB_POOL_MIN),
+                int(settings.DB_POOL_MAX),
+                gucs=session_settings(),
+                timeout=float(settings.DB_POOL_TIMEOUT),
+                **_connect_kwargs()
+            )
+        return _pool
+
+
+@contextmanager
+def pooled_connection():
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
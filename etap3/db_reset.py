@@ -0,0 +1,192 @@
+import argparse
+import logging
+import time
+from typing import Optional, Sequence
+
+import psycopg2
+from psycopg2 import sql
+
+from db import close_pool, get_db_connection, settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='   %(levelname)s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# CREATE/DROP DATABASE run from here, they cannot target the database they are connected to
+MAINTENANCE_DB = "postgres"
+
+TABLES_SQL = "SELECT tablename FROM pg_tables WHERE schemaname = 'public' ORDER BY 1;"
+
+TERMINATE_SQL = """
+    SELECT count(pg_terminate_backend(pid))
+    FROM pg_stat_activity
+    WHERE datname = %s AND pid <> pg_backend_pid();
+"""
+
+
+def golden_name(database: Optional[str] = None) -> str:
+    return f"{database or settings.DB_NAME}_golden"
+
+
+def truncate_tables(cur, tables: Optional[Sequence[str]] = None) -> int:
+    """Empties `tables` (default: every public table) and restarts their identities in one TRUNCATE."""
+    if tables is None:
+        cur.execute(TABLES_SQL)
+        tables = [row[0] for row in cur.fetchall()]
+    if tables:
+        cur.execute(sql.SQL("TRUNCATE {} RESTART IDENTITY CASCADE;").format(
+            sql.SQL(", ").join(sql.Identifier(t) for t in tables)))
+    return len(tables)
+
+
+def _terminate(cur, database: str) -> int:
+    cur.execute(TERMINATE_SQL, (database,))
+    return cur.fetchone()[0]
+
+
+def _exists(cur, database: str) -> bool:
+    cur.execute("SELECT 1 FROM pg_database WHERE datname = %s;", (database,))
+    return cur.fetchone() is not None
+
+
+def _can_create(cur) -> bool:
+    cur.execute("SELECT rolcreatedb OR rolsuper FROM pg_roles WHERE rolname = current_user;")
+    return bool(cur.fetchone()[0])
+
+
+def _drop(cur, database: str) -> None:
+    cur.execute(sql.SQL("DROP DATABASE IF EXISTS {};").format(sql.Identifier(database)))
+
+
+def _retried(cur, attempts: int, database: str, statement) -> int:
+    # a client may reconnect between terminating and the statement, so it is retried
+    terminated = 0
+    for attempt in range(1, attempts + 1):
+        terminated += _terminate(cur, database)
+        try:
+            cur.execute(statement)
+            return terminated
+        except psycopg2.errors.ObjectInUse:
+            if attempt == attempts:
+                raise
+            time.sleep(0.2 * attempt)
+    return terminated
+
+
+def clone_database(source: str, target: str, strategy: Optional[str] = None, attempts: int = 3) -> float:
+    """Recreates `target` as a copy of `source` with CREATE DATABASE ... TEMPLATE; returns the seconds taken.
+
+    The copy is made as `<target>_new` and only renamed over `target` once it
+    exists, so a failed CREATE leaves `target` as it was. The template must be
+    free of other sessions during the copy and `target` while it is replaced,
+    so their connections (this process's pool included) are closed or
+    terminated. `strategy` is passed on as STRATEGY (PostgreSQL 15+): WAL_LOG,
+    the default, logs the copy block by block, FILE_COPY copies the files
+    after a checkpoint and is faster for large databases.
+    """
+    close_pool()
+    conn = get_db_connection(dbname=MAINTENANCE_DB)
+    conn.autocommit = True
+    staging = f"{target}_new"
+    started = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            if not _exists(cur, source):
+                raise ValueError(f"Database {source} does not exist")
+            if not _can_create(cur):
+                raise PermissionError(f"Role {settings.DB_USER} does not have the CREATEDB privilege")
+            options = sql.SQL(" STRATEGY {}").format(sql.SQL(strategy.upper())) if strategy else sql.SQL("")
+            _drop(cur, staging)
+            try:
+                terminated = _retried(cur, attempts, source, sql.SQL("CREATE DATABASE {} TEMPLATE {}{};").format(
+                    sql.Identifier(staging), sql.Identifier(source), options))
+                terminated += _retried(cur, attempts, target, sql.SQL("DROP DATABASE IF EXISTS {};").format(
+                    sql.Identifier(target)))
+            except psycopg2.Error:
+                _drop(cur, staging)
+                raise
+            rename = sql.SQL("ALTER DATABASE {} RENAME TO {};").format(sql.Identifier(staging), sql.Identifier(target))
+            try:
+                terminated += _retried(cur, attempts, staging, rename)
+            except psycopg2.Error:
+                # target is gone by now, the copy is all that is left of it
+                logging.error(f"{target} was dropped but {staging} could not be renamed to it, recover with: "
+                              f"{rename.as_string(conn)}")
+                raise
+    except psycopg2.Error:
+        logging.error(f"Failed to create {target} from {source}")
+        raise
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    logging.info(f"Created {target} from {source} in {elapsed:.2f}s"
+                 + (f", {terminated} sessions terminated" if terminated else ""))
+    return elapsed
+
+
+def save_golden(golden: Optional[str] = None, strategy: Optional[str] = None) -> float:
+    """Keeps the current state of the working database as the golden copy."""
+    return clone_database(settings.DB_NAME, golden or golden_name(), strategy)
+
+
+def truncate_database() -> int:
+    """Empties every public table of the working database; returns how many there are."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            started = time.perf_counter()
+            count = truncate_tables(cur)
+        conn.commit()
+        logging.info(f"Truncated {count} tables in {time.perf_counter() - started:.2f}s")
+        return count
+    except Exception:
+        conn.rollback()
+        logging.error("Failed to truncate the tables")
+        raise
+    finally:
+        conn.close()
+
+
+def reset(golden: Optional[str] = None, strategy: Optional[str] = None) -> str:
+    """Puts the working database back to the golden copy; returns how ("template" or "truncate").
+
+    Without a golden database, or without the CREATEDB privilege, it falls
+    back to emptying every table in one TRUNCATE, after which the data has
+    to be seeded (or restored from a snapshot) again. Other failures are
+    raised with the working database left untouched.
+    """
+    golden = golden or golden_name()
+    try:
+        clone_database(golden, settings.DB_NAME, strategy)
+        return "template"
+    except (ValueError, PermissionError, psycopg2.errors.InsufficientPrivilege) as e:
+        logging.warning(f"Cannot reset from {golden} ({str(e).strip()}), truncating every table instead")
+    truncate_database()
+    return "truncate"
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Reset the working database from a golden copy")
+    parser.add_argument("command", choices=("save", "reset", "truncate"),
+                        help="save: copy the working database to the golden one; reset: recreate the working "
+                             "database from the golden one; truncate: empty every table in one statement")
+    parser.add_argument("--golden", default=None, help=f"golden database name (default: {golden_name()})")
+    parser.add_argument("--strategy", choices=("wal_log", "file_copy"), default=None,
+                        help="CREATE DATABASE strategy (PostgreSQL 15+), file_copy is faster for large databases")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = parse_args(argv)
+    if args.command == "save":
+        save_golden(args.golden, args.strategy)
+    elif args.command == "reset":
+        reset(args.golden, args.strategy)
+    else:
+        truncate_database()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import columns as col
+import unique_values as uv
+from shards import ChunkContext
+
+# Row generators for one chunk of one table. They are plain module-level
+# functions so worker processes can run them; all randomness comes from the
+# chunk's ChunkContext, which makes the output depend only on (seed, chunk).
+
+
+# ==== TOMEK ====
+
+COURSE_COLUMNS = ("name", "description", "price", "protein_100g", "calories_100g",
+                  "carbohydrates_100g", "fat_100g", "created_at", "updated_at")
+
+
+def courses(ctx: ChunkContext, n: int) -> List[Tuple]:
+    return list(zip(
+        [f"{a.capitalize()} z {b}ami" for a, b in zip(ctx.sample(n, 'word'), ctx.sample(n, 'word'))],
+        ctx.sample(n, 'paragraph', nb_sentences=4),
+        col.uniform(ctx.rng, n, 20.0, 85.0),
+        col.uniform(ctx.rng, n, 5, 50),
+        col.integers(ctx.rng, n, 200, 1200),
+        col.uniform(ctx.rng, n, 10, 150),
+        col.uniform(ctx.rng, n, 5, 70),
+        [ctx.now] * n,
+        [ctx.now] * n
+    ))
+
+
+INGREDIENT_COLUMNS = ("name", "description", "calories_100g", "unit_of_measure",
+                      "protein_100g", "fat_100g", "carbohydrates_100g")
+
+
+def ingredients(ctx: ChunkContext, n: int) -> List[Tuple]:
+    possible_units = ['g', 'ml', 'kg', 'l', 'piece']
+    return list(zip(
+        ctx.sample(n, 'word'),
+        ctx.sample(n, 'sentence', nb_words=6),
+        col.integers(ctx.rng, n, 10, 500),
+        col.choice(ctx.rng, n, possible_units),
+        col.uniform(ctx.rng, n, 0, 30),
+        col.uniform(ctx.rng, n, 0, 60),
+        col.uniform(ctx.rng, n, 0, 100)
+    ))
+
+
+def described(ctx: ChunkContext, names: Sequence[str]) -> List[Tuple]:
+    # (name, description) rows of the small dictionary tables
+    return [(name, ctx.fake.sentence(nb_words=8)) for name in names]
+
+
+def children(ctx: ChunkContext, parent_ids: Sequence[int], child_ids: Sequence[int],
+             min_per_parent: int, max_per_parent: int, child_first: bool = False) -> List[Tuple]:
+    # random.sample draws distinct children for every parent, so the pairs are
+    # unique by construction and no set of seen pairs has to be kept
+    rows = []
+    for parent_id in parent_ids:
+        k = ctx.random.randint(min_per_parent, max_per_parent)
+        for child_id in ctx.random.sample(child_ids, k=min(k, len(child_ids))):
+            rows.append((child_id, parent_id) if child_first else (parent_id, child_id))
+    return rows
+
+
+def allergen_ingredients(ctx: ChunkContext, ingredient_ids: Sequence[int], allergen_ids: Sequence[int],
+                         probability: float) -> List[Tuple]:
+    # at most one allergen per ingredient, so pairs never repeat
+    return [(ctx.random.choice(allergen_ids), ing_id) for ing_id in ingredient_ids if ctx.random.random() < probability]
+
+
+PREFERENCE_COLUMNS = ("customer_id", "ingredient_id", "rating")
+
+
+def preferences(ctx: ChunkContext, customer_ids: Sequence[int], ingredient_ids: Sequence[int]) -> List[Tuple]:
+    pairs = []
+    for customer_id, num_prefs in zip(customer_ids, col.integers(ctx.rng, len(customer_ids), 0, 100)):
+        k = min(num_prefs, len(ingredient_ids))
+        for ingredient_id in ctx.random.sample(ingredient_ids, k=k):
+            pairs.append((customer_id, ingredient_id))
+
+    ratings = col.integers(ctx.rng, len(pairs), 1, 5)
+    return [(customer_id, ingredient_id, rating) for (customer_id, ingredient_id), rating in zip(pairs, ratings)]
+
+
+OPINION_COLUMNS = ("course_id", "customer_id", "rating", "opinion")
+
+
+def opinions(ctx: ChunkContext, pair_indices: Sequence[int], customer_ids: Sequence[int],
+             course_ids: Sequence[int]) -> List[Tuple]:
+    # every index is a distinct cell of the customer x course grid
+    n = len(pair_indices)
+    texts = ctx.sample_or_none(n, 0.75, 'sentence', nb_words=10)
+    ratings = col.integers(ctx.rng, n, 1, 5)
+    return [
+        (course_ids[idx % len(course_ids)], customer_ids[idx // len(course_ids)], rating, text)
+        for idx, rating, text in zip(pair_indices, ratings, texts)
+    ]
+
+
+# ===== BARTOSH =====
+
+ADDRESS_COLUMNS = ("country", "region", "postal_code", "city", "street_name", "street_number", "apartment",
+                   "created_at")
+
+
+def addresses(ctx: ChunkContext, n: int) -> List[Tuple]:
+    apartments = col.integers(ctx.rng, n, 1, 100)
+    return list(zip(
+        ctx.sample(n, 'country'),                                                   # country
+        ctx.sample_or_none(n, 0.7, 'region'),                                       # region
+        ctx.sample(n, 'postcode'),                                                  # postal_code
+        ctx.sample(n, 'city'),                                                      # city
+        ctx.sample(n, 'street_name'),                                               # street name
+        [str(i) for i in col.integers(ctx.rng, n, 1, 200)],                         # street number
+        [str(a) if keep else None                                                   # apartment
+         for a, keep in zip(apartments, col.chance(ctx.rng, n, 0.5))],
+        [ctx.now] * n,                                                              # created_at
+    ))
+
+
+def normalize_phone(raw: str) -> Optional[str]:
+    if not raw:
+        return None
+    digits = re.sub(r'\D', '', raw)   # wywal wszystko poza cyframi
+    if not digits:
+        return None
+    # Jeżeli zaczyna się od 48, potraktuj to jako PL z plusikiem
+    if digits.startswith('48'):
+        e164 = '+' + digits
+    else:
+        # jak chcesz mieć bardziej „smart”, dorzuć logikę krajów;
+        # na szybko: dodaj plusa i jedziemy
+        e164 = '+' + digits
+    # minimalnie 7 cyfr sensownie
+    return e164 if 7 <= len(digits) <= 15 else None
+
+
+USER_COLUMNS = ("login", "email", "password_hash", "name", "surname", "phone_number",
+                "date_created", "date_removed", "last_login")
+
+
+def users(ctx: ChunkContext, n: int, role: str) -> List[Tuple]:
+    # login/email carry the role and the global row number, so they are unique
+    # across all chunks and processes without a shared fake.unique
+    user_names = ctx.sample(n, 'user_name')
+    domains = ctx.sample(n, 'free_email_domain')
+    first_names = ctx.sample(n, 'first_name')
+    last_names = ctx.sample(n, 'last_name')
+    date_created = col.dates_between(ctx.rng, n, ctx.today - timedelta(days=5 * 365), ctx.today)
+    date_removed = col.optional(col.dates_after(ctx.rng, date_created, col.days_until(date_created, ctx.today)),
+                                col.chance(ctx.rng, n, 0.2))
+    last_login = col.optional(col.timestamps_after(ctx.rng, date_created, ctx.now), col.chance(ctx.rng, n, 0.8))
+
+    rows = []
+    for i in range(n):
+        login = uv.login(user_names[i], role, ctx.start + i)
+        phone_raw = ctx.fake.phone_number() if ctx.random.random() > 0.2 else None
+        rows.append((
+            login,                                                                  # login (unique username)
+            uv.email(login, domains[i]),                                            # email (unique)
+            ctx.fake.password(length=12, special_chars=True, digits=True, upper_case=True, lower_case=True),  # password_hash (just fake string)
+            first_names[i],                                                         # name
+            last_names[i],                                                          # lastname
+            normalize_phone(phone_raw) if phone_raw else None,                      # phone_number (optional)
+            date_created[i],                                                        # date_created
+            date_removed[i],                                                        # date_removed (optional)
+            last_login[i],                                                          # last login
+        ))
+    return rows
+
+
+ORDER_COLUMNS = ("status", "vat_rate", "vat_total", "net_total", "gross_total", "placed_at", "customer_id")
+
+
+def orders(ctx: ChunkContext, n: int, customers_ids: Sequence[int],
+           placed_from: Optional[datetime] = None) -> List[Tuple]:
+    order_statuses = ['accepted', 'in progress', 'awaiting delivery', 'in delivery', 'delivered']
+    vat_rate, net_total, vat_total, gross_total = col.money_with_vat(ctx.rng, n, 50, 500, [0.05, 0.08, 0.23])
+    return list(zip(
+        col.choice(ctx.rng, n, order_statuses),                                     # status
+        vat_rate,                                                                   # vat_rate
+        vat_total,                                                                  # vat_total
+        net_total,                                                                  # net_total
+        gross_total,                                                                # gross_total
+        col.timestamps(ctx.rng, n, placed_from or ctx.now - timedelta(days=730), ctx.now),  # placed_at
+        col.choice(ctx.rng, n, customers_ids)                                       # customer_id
+    ))
+
+
+ORDER_ITEM_COLUMNS = ("expected_delivery_at", "order_id", "delivery_address")
+
+
+def order_items(ctx: ChunkContext, orders_customers: Sequence[Tuple[int, int]],
+                customer_addresses: Dict[int, List[int]], min_items: int, max_items: int) -> List[Tuple]:
+    rows = []
+    for order_id, customer_id in orders_customers:
+        user_addresses = customer_addresses.get(customer_id)
+        if not user_addresses:
+            continue
+        for _ in range(ctx.random.randint(min_items, max_items)):
+            rows.append((
+                ctx.today + timedelta(days=ctx.random.randint(1, 30)),
+                order_id,
+                ctx.random.choice(user_addresses),
+            ))
+    return rows
+
+
+NIP_WEIGHTS = np.array([6, 5, 7, 2, 3, 4, 5, 6, 7])
+
+
+def pl_nips(rng: np.random.Generator, n: int, with_prefix: bool = False) -> List[str]:
+    """`n` Polish VAT ids: 9 random digits and their weighted checksum mod 11."""
+    digits = rng.integers(0, 10, (n, 9))
+    checksum = digits @ NIP_WEIGHTS % 11
+    # a checksum of 10 is not a valid NIP, those rows are drawn again
+    invalid = checksum == 10
+    while invalid.any():
+        digits[invalid] = rng.integers(0, 10, (int(invalid.sum()), 9))
+        checksum[invalid] = digits[invalid] @ NIP_WEIGHTS % 11
+        invalid = checksum == 10
+    numbers = digits @ (10 ** np.arange(9, 0, -1)) + checksum
+    prefix = "PL" if with_prefix else ""
+    return [f"{prefix}{number:010d}" for number in numbers.tolist()]
+
+
+INVOICE_COLUMNS = ("invoice_number", "status", "seller_name", "seller_vat_id", "buyer_name", "buyer_vat_id",
+                   "currency", "payment_method", "payment_terms", "sale_date", "payment_date", "issue_date",
+                   "vat_rate", "net_total", "vat_total", "gross_total", "order_id")
+
+
+def invoices(ctx: ChunkContext, order_ids: Sequence[int]) -> List[Tuple]:
+    n = len(order_ids)
+    vat_rate, net_total, vat_total, gross_total = col.money_with_vat(ctx.rng, n, 50, 1000, [0.05, 0.08, 0.23])
+
+    sale_date = col.dates_after(ctx.rng, [ctx.today - timedelta(days=30)] * n, 30)
+    issue_date = col.dates_after(ctx.rng, sale_date, col.days_until(sale_date, ctx.today))
+
+    status = col.choice(ctx.rng, n, ['issued', 'pending payment', 'paid', 'cancelled'])
+    # paid invoices are paid by today, the others are due within 30 days of issue
+    paid = np.array(status) == 'paid'
+    payment_date = col.dates_after(ctx.rng, issue_date, np.where(paid, col.days_until(issue_date, ctx.today), 30))
+
+    return list(zip(
+        [uv.numbered("INV-", ctx.start + i + 1, 5) for i in range(n)],              # invoice_number
+        status,                                                                     # status
+        ctx.sample(n, 'company'),                                                   # seller_name
+        pl_nips(ctx.rng, n),                                                        # seller_vat_id (NIP)
+        ctx.sample(n, 'name'),                                                      # buyer_name
+        pl_nips(ctx.rng, n),                                                        # buyer_vat_id
+        col.choice(ctx.rng, n, ['USD', 'EUR', 'PLN']),                              # currency
+        col.choice(ctx.rng, n, ['cash', 'card', 'transfer']),                       # payment_method
+        [f"{d} days" for d in col.integers(ctx.rng, n, 7, 30)],                     # payment_terms
+        sale_date,                                                                  # sale_date
+        payment_date,                                                               # payment_date
+        issue_date,                                                                 # issue_date
+        vat_rate,                                                                   # vat_rate
+        net_total,                                                                  # net_total
+        vat_total,                                                                  # vat_total
+        gross_total,                                                                # gross_total
+        order_ids                                                                   # order_id (assuming existing orders)
+    ))
+
+
+# ===== OLA =====
+
+DIETICIAN_COLUMNS = ("id", "certification")
+
+
+def dieticians(ctx: ChunkContext, user_ids: Sequence[int], certification_names: Sequence[str]) -> List[Tuple]:
+    return [
+        (uid, f"{ctx.random.choice(certification_names)} w {city}")
+        for uid, city in zip(user_ids, ctx.sample(len(user_ids), 'city'))
+    ]
+
+
+MEAL_PLAN_COLUMNS = ("name", "start_date", "end_date", "description", "dietician_id")
+
+
+def meal_plans(ctx: ChunkContext, n: int, dietician_ids: Optional[Sequence[int]], probability: float) -> List[Tuple]:
+    names = ctx.sample(n, 'word')
+    descriptions = ctx.sample(n, 'sentence', nb_words=8)
+    start = col.dates_between(ctx.rng, n, ctx.today - timedelta(days=90), ctx.today + timedelta(days=30))
+    end = col.dates_after(ctx.rng, start, 30)
+    # `probability` is the share of plans without a dietician
+    diet_ids = col.optional(col.choice(ctx.rng, n, dietician_ids), ~col.chance(ctx.rng, n, probability)) \
+        if dietician_ids else [None] * n
+    return list(zip([name.capitalize() + ' plan' for name in names], start, end, descriptions, diet_ids))
+
+
+MEAL_PLAN_DAY_COLUMNS = ("day_number", "meal_plan_id")
+
+
+def meal_plan_days(ctx: ChunkContext, meal_plan_ids: Sequence[int], min_days: int, max_days: int) -> List[Tuple]:
+    return [(i + 1, mp_id) for mp_id in meal_plan_ids for i in range(ctx.random.randint(min_days, max_days))]
+
+
+def sequenced_items(ctx: ChunkContext, parent_ids: Sequence[int], course_ids: Sequence[int],
+                    min_items: int, max_items: int, parent_first: bool = True) -> List[Tuple]:
+    # (parent, course, sequence) rows of the menu/meal plan item tables
+    rows = []
+    for parent_id in parent_ids:
+        k = ctx.random.randint(min_items, max_items)
+        chosen = ctx.random.sample(course_ids, k=min(k, len(course_ids)))
+        for seq, course_id in enumerate(chosen, start=1):
+            rows.append((parent_id, course_id, seq) if parent_first else (course_id, parent_id, seq))
+    return rows
+
+
+DAILY_MENU_COLUMNS = ("dietician_id", "menu_date")
+
+
+def daily_menus(ctx: ChunkContext, day_offsets: Sequence[int], first_day: date,
+                dietician_ids: Sequence[int]) -> List[Tuple]:
+    # offsets are distinct, so menu_date stays unique
+    return [(ctx.random.choice(dietician_ids), first_day + timedelta(days=offset)) for offset in day_offsets]
+
+
+COMPLAINT_COLUMNS = ("customer_id", "course_in_order_id", "date", "status", "description", "refund_amount",
+                     "resolution_date")
+
+
+def complaints(ctx: ChunkContext, selected: Sequence[Tuple]) -> List[Tuple]:
+    # selected: (course_in_order_item id, customer_id, order placed_at)
+    n = len(selected)
+    if not n:
+        return []
+    cio_ids, cust_ids, order_dates = zip(*selected)
+    descriptions = ctx.sample(n, 'sentence', nb_words=12)
+    placed = np.asarray(order_dates, dtype="datetime64[us]")
+    complaint_date = np.asarray(col.timestamps_after(
+        ctx.rng, placed, placed + np.asarray(col.integers(ctx.rng, n, 1, 14), dtype="timedelta64[D]")),
+        dtype="datetime64[us]")
+    status = np.asarray(col.choice(ctx.rng, n, ['submitted', 'under review', 'positively resolved',
+                                                'negatively resolved']))
+    positive = status == 'positively resolved'
+    resolved = positive | (status == 'negatively resolved')
+    resolution_start = complaint_date + np.timedelta64(1, "s")
+    resolution_date = col.optional(col.timestamps_after(
+        ctx.rng, resolution_start,
+        complaint_date + np.asarray(col.integers(ctx.rng, n, 1, 64), dtype="timedelta64[D]")), resolved)
+    refund = col.optional(col.uniform(ctx.rng, n, 0, 1000), positive)
+    return list(zip(cust_ids, cio_ids, complaint_date.tolist(), status.tolist(), descriptions, refund,
+                    resolution_date))
+
+
+# ===== MARIUSZ =====
+
+ADMINISTRATOR_COLUMNS = ("user_id", "date_granted", "date_revoked")
+
+
+def administrators(ctx: ChunkContext, user_ids: Sequence[int]) -> List[Tuple]:
+    n = len(user_ids)
+    date_granted = col.dates_between(ctx.rng, n, ctx.today - timedelta(days=5 * 365), ctx.today - timedelta(days=30))
+    date_revoked = col.optional(col.dates_after(ctx.rng, date_granted, col.days_until(date_granted, ctx.today)),
+                                col.chance(ctx.rng, n, 0.1))
+    return list(zip(user_ids, date_granted, date_revoked))
+
+
+FULFILLMENT_COLUMNS = ("cook_id", "order_item_id", "status_id", "began_at", "completed_at", "last_updated_at", "notes")
+DELIVERY_COLUMNS = ("courier_id", "order_item_id", "status_id", "began_at", "delivered_at", "last_updated", "notes")
+
+
+def fulfillment_and_delivery(ctx: ChunkContext, item_ids: Sequence[int], cook_ids: Sequence[int],
+                             courier_ids: Sequence[int]) -> Tuple[List[Tuple], List[Tuple]]:
+    status_map_fulfillment = {
+        'Pending': 1, 'In Preparation': 2, 'Ready for Delivery': 3, 'Cancelled': 4
+    }
+    status_map_delivery = {
+        'Pending Pickup': 1, 'Picked Up': 2, 'En Route': 3, 'Delivered': 4, 'Failed Delivery': 5
+    }
+    n = len(item_ids)
+    notes = ctx.sample_or_none(2 * n, 0.1, 'word')
+    # completed_at is drawn between began_at and now, so it can never end up before began_at
+    began = col.timestamps(ctx.rng, n, ctx.now - timedelta(days=7), ctx.now)
+    completed = col.timestamps_after(ctx.rng, began, ctx.now)
+    delivery_began = col.timestamps(ctx.rng, n, ctx.now - timedelta(days=7), ctx.now)
+    delivered = col.timestamps_after(ctx.rng, [b + timedelta(seconds=1) for b in delivery_began], ctx.now)
+
+    cooks = col.choice(ctx.rng, n, cook_ids) if cook_ids else [None] * n
+    f_status = np.asarray(col.integers(ctx.rng, n, 1, len(status_map_fulfillment)))
+    ready = f_status == status_map_fulfillment['Ready for Delivery']
+    completed_at = col.optional(completed, ready | (f_status == status_map_fulfillment['Cancelled']))
+    fulfillment_data = list(zip(
+        cooks, item_ids, f_status.tolist(), began, completed_at,
+        [c if c is not None else b for c, b in zip(completed_at, began)], notes[:n]
+    ))
+
+    # only items ready for delivery have a delivery record
+    delivered_items = np.flatnonzero(ready).tolist()
+    m = len(delivered_items)
+    couriers = col.choice(ctx.rng, m, courier_ids) if courier_ids else [None] * m
+    d_status = col.integers(ctx.rng, m, 1, len(status_map_delivery))
+    delivery_data = [
+        (courier_id, item_ids[i], status_id, delivery_began[i], delivered[i], delivered[i], note)
+        for i, courier_id, status_id, note in zip(delivered_items, couriers, d_status, notes[n:])
+    ]
+    return fulfillment_data, delivery_data
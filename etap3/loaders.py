@@ -0,0 +1,281 @@
+import io
+import struct
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import psycopg2
+import psycopg2.extras
+
+from metrics import record_rows
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# advisory lock class id for identity range reservations (the object id is the sequence oid)
+_RESERVE_LOCK = 0x5EED
+
+# moves the identity sequence of (table, column) forward by a block of ids and
+# returns the last one; shared with the asyncpg backend
+RESERVE_IDS_SQL = f"""
+    WITH seq AS MATERIALIZED (
+        SELECT pg_get_serial_sequence(quote_ident(%s), %s)::regclass AS id
+    ), locked AS MATERIALIZED (
+        SELECT id, pg_advisory_xact_lock({_RESERVE_LOCK}, id::oid::int) FROM seq
+    )
+    SELECT setval(id, nextval(id) + %s - 1) FROM locked;
+"""
+
+
+class Loader:
+    """Pushes generated rows into one table.
+
+    `insert` returns the generated ids (in row order) when `returning` names the
+    identity column, otherwise the number of inserted rows. Ids are never read
+    back with RETURNING: a block is reserved from the identity sequence up front
+    and written explicitly (the columns are GENERATED BY DEFAULT, so explicit
+    values are accepted).
+    """
+
+    name = "base"
+
+    def insert(self, cur: psycopg2.extensions.cursor, table: str, columns: Sequence[str],
+               rows: Sequence[Tuple], returning: Optional[str] = None):
+        if not rows:
+            return [] if returning else 0
+
+        columns = list(columns)
+        ids = None
+        if returning:
+            if returning in columns:
+                idx = columns.index(returning)
+                ids = [row[idx] for row in rows]
+            else:
+                ids = self.reserve_ids(cur, table, returning, len(rows))
+                columns = [returning] + columns
+                rows = [(i,) + tuple(row) for i, row in zip(ids, rows)]
+
+        self._write(cur, table, columns, rows)
+        record_rows(len(rows))
+        return ids if returning else len(rows)
+
+    def reserve_ids(self, cur: psycopg2.extensions.cursor, table: str, column: str, count: int) -> List[int]:
+        """`count` consecutive ids from the identity sequence, in one round trip.
+
+        The sequence is moved forward with setval(nextval() + count - 1) under
+        an advisory lock on the sequence, so two reservations for the same table
+        cannot interleave. The lock is held until the transaction ends.
+        """
+        if count <= 0:
+            return []
+        cur.execute(RESERVE_IDS_SQL, (table, column, count))
+        last = cur.fetchone()[0]
+        return list(range(last - count + 1, last + 1))
+
+    def _write(self, cur, table: str, columns: Sequence[str], rows: Sequence[Tuple]) -> None:
+        raise NotImplementedError
+
+    def insert_chunks(self, cur: psycopg2.extensions.cursor, table: str, columns: Sequence[str],
+                      chunks: Iterable[Sequence[Tuple]], returning: Optional[str] = None):
+        """`insert` for every chunk produced by a generator, so only one chunk of
+        rows is alive at a time. Returns all ids (or the total row count)."""
+        ids: List[int] = []
+        count = 0
+        for rows in chunks:
+            result = self.insert(cur, table, columns, rows, returning=returning)
+            if returning:
+                ids.extend(result)
+            else:
+                count += result
+        return ids if returning else count
+
+
+class ValuesLoader(Loader):
+    """The original transport: multi-row INSERT ... VALUES built by execute_values."""
+
+    name = "values"
+
+    def __init__(self, page_size: int = 1000):
+        self.page_size = page_size
+
+    def _write(self, cur, table, columns, rows):
+        sql = f'INSERT INTO {_quote(table)} ({", ".join(_quote(c) for c in columns)}) VALUES %s'
+        psycopg2.extras.execute_values(cur, sql, rows, page_size=self.page_size)
+
+
+class CopyLoader(Loader):
+    """COPY ... FROM STDIN in text format."""
+
+    name = "copy"
+
+    def _write(self, cur, table, columns, rows):
+        buf = io.StringIO()
+        for row in rows:
+            buf.write("\t".join(_text_value(v) for v in row))
+            buf.write("\n")
+        buf.seek(0)
+        cur.copy_expert(f'COPY {_quote(table)} ({", ".join(_quote(c) for c in columns)}) FROM STDIN', buf)
+
+
+def _text_value(value) -> str:
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, float):
+        return repr(value)
+    return (str(value)
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r"))
+
+
+_PG_EPOCH_DATE = date(2000, 1, 1)
+_PG_EPOCH = datetime(2000, 1, 1)
+_PG_EPOCH_UTC = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime(value.year, value.month, value.day)
+
+
+def _encode_timestamp(value) -> bytes:
+    delta = _as_datetime(value).replace(tzinfo=None) - _PG_EPOCH
+    return struct.pack("!q", (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+
+
+def _encode_timestamptz(value) -> bytes:
+    # naive values are taken as client local time, which is what the server
+    # does with them too as long as its TimeZone matches the client
+    delta = _as_datetime(value).astimezone(timezone.utc) - _PG_EPOCH_UTC
+    return struct.pack("!q", (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+
+
+def _encode_date(value) -> bytes:
+    if isinstance(value, datetime):
+        value = value.date()
+    return struct.pack("!i", (value - _PG_EPOCH_DATE).days)
+
+
+def _encode_numeric(value) -> bytes:
+    d = value if isinstance(value, Decimal) else Decimal(repr(value) if isinstance(value, float) else str(value))
+    sign, digits, exp = d.as_tuple()
+    dscale = max(0, -exp)
+    s = "".join(map(str, digits))
+    if exp >= 0:
+        int_part, frac_part = s + "0" * exp, ""
+    else:
+        int_part = s[:exp] if len(s) > -exp else ""
+        frac_part = s[exp:].rjust(-exp, "0")
+    int_part = int_part.lstrip("0")
+    int_part = int_part.rjust((len(int_part) + 3) // 4 * 4, "0")
+    frac_part = frac_part.ljust((len(frac_part) + 3) // 4 * 4, "0")
+    packed = int_part + frac_part
+    groups = [int(packed[i:i + 4]) for i in range(0, len(packed), 4)]
+    weight = len(int_part) // 4 - 1
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+    header = struct.pack("!hhHh", len(groups), weight, 0x4000 if sign else 0, dscale)
+    return header + struct.pack(f"!{len(groups)}H", *groups)
+
+
+def _encode_text(value) -> bytes:
+    return str(value).encode("utf-8")
+
+
+_BINARY_ENCODERS = {
+    "int2": lambda v: struct.pack("!h", v),
+    "int4": lambda v: struct.pack("!i", v),
+    "int8": lambda v: struct.pack("!q", v),
+    "float4": lambda v: struct.pack("!f", v),
+    "float8": lambda v: struct.pack("!d", v),
+    "bool": lambda v: struct.pack("!?", v),
+    "numeric": _encode_numeric,
+    "date": _encode_date,
+    "timestamp": _encode_timestamp,
+    "timestamptz": _encode_timestamptz,
+    "text": _encode_text,
+    "varchar": _encode_text,
+    "bpchar": _encode_text,
+}
+
+
+class BinaryCopyLoader(CopyLoader):
+    """COPY ... FROM STDIN (FORMAT binary).
+
+    Binary COPY needs every value encoded as the exact column type, so the
+    column types are looked up once per table from pg_attribute.
+    """
+
+    name = "copy-binary"
+
+    _HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+
+    def __init__(self):
+        self._types: Dict[str, Dict[str, Tuple[str, str]]] = {}
+
+    def _column_types(self, cur, table: str) -> Dict[str, Tuple[str, str]]:
+        if table not in self._types:
+            cur.execute("""
+                SELECT a.attname, t.typname, t.typtype
+                FROM pg_attribute a
+                JOIN pg_type t ON t.oid = a.atttypid
+                WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped;
+            """, (_quote(table),))
+            self._types[table] = {name: (typname, typtype) for name, typname, typtype in cur.fetchall()}
+        return self._types[table]
+
+    def _write(self, cur, table, columns, rows):
+        types = self._column_types(cur, table)
+        encoders = []
+        for column in columns:
+            typname, typtype = types[column]
+            encoder = _encode_text if typtype == "e" else _BINARY_ENCODERS.get(typname)
+            if encoder is None:
+                raise ValueError(f"Binary COPY does not support column {table}.{column} of type {typname}")
+            encoders.append(encoder)
+
+        field_count = struct.pack("!h", len(columns))
+        null = struct.pack("!i", -1)
+        buf = io.BytesIO()
+        buf.write(self._HEADER)
+        for row in rows:
+            buf.write(field_count)
+            for encode, value in zip(encoders, row):
+                if value is None:
+                    buf.write(null)
+                else:
+                    data = encode(value)
+                    buf.write(struct.pack("!i", len(data)))
+                    buf.write(data)
+        buf.write(struct.pack("!h", -1))
+        buf.seek(0)
+        cur.copy_expert(
+            f'COPY {_quote(table)} ({", ".join(_quote(c) for c in columns)}) FROM STDIN WITH (FORMAT binary)', buf
+        )
+
+
+LOADERS = {
+    ValuesLoader.name: ValuesLoader,
+    CopyLoader.name: CopyLoader,
+    BinaryCopyLoader.name: BinaryCopyLoader,
+}
+
+
+def make_loader(name: str) -> Loader:
+    try:
+        return LOADERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown loader '{name}', expected one of: {', '.join(LOADERS)}")
@@ -0,0 +1,287 @@
+import io
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+from db import pooled_connection
+
+TABLE_STATS_SQL = """
+    SELECT s.relname, s.n_tup_ins, s.n_tup_upd, s.n_tup_del,
+           io.heap_blks_read, io.heap_blks_hit, io.idx_blks_read, io.idx_blks_hit
+    FROM pg_stat_user_tables s
+    JOIN pg_statio_user_tables io USING (relid)
+    WHERE s.schemaname = 'public';
+"""
+
+DATABASE_STATS_SQL = """
+    SELECT xact_commit, xact_rollback, blks_read, blks_hit, tup_inserted, temp_files, temp_bytes
+    FROM pg_stat_database
+    WHERE datname = current_database();
+"""
+
+WAL_STATS_SQL = "SELECT wal_records, wal_fpi, wal_bytes FROM pg_stat_wal;"
+
+# the step whose numbers the current thread or task adds to
+_current: ContextVar[Optional["StepMetrics"]] = ContextVar("seed_step", default=None)
+
+
+class StepMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.generate_seconds = 0.0
+        self.db_seconds = 0.0
+        self.db_calls = 0
+        self.rows = 0
+        self.bytes_sent = 0
+        self.peak_traced_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def add(self, **values: float) -> None:
+        # generation may run in another thread than the writes (async backend)
+        with self._lock:
+            for key, value in values.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "seconds": self.seconds,
+            "generate_seconds": self.generate_seconds,
+            "db_seconds": self.db_seconds,
+            "db_calls": self.db_calls,
+            "rows": self.rows,
+            "rows_per_second": self.rows / self.seconds if self.seconds else None,
+            "bytes_sent": self.bytes_sent,
+            "peak_traced_bytes": self.peak_traced_bytes,
+        }
+
+
+def record_db(seconds: float, nbytes: int = 0) -> None:
+    step = _current.get()
+    if step is not None:
+        step.add(db_seconds=seconds, db_calls=1, bytes_sent=nbytes)
+
+
+def record_rows(count: int) -> None:
+    step = _current.get()
+    if step is not None:
+        step.add(rows=count)
+
+
+def timed(chunks: Iterable) -> Iterator:
+    """Yields from `chunks`, adding the time spent waiting for every item to the generation time."""
+    iterator = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            step = _current.get()
+            if step is not None:
+                step.add(generate_seconds=time.perf_counter() - started)
+        yield item
+
+
+def _payload_size(file) -> int:
+    if isinstance(file, io.BytesIO):
+        return file.getbuffer().nbytes
+    if isinstance(file, io.StringIO):
+        return len(file.getvalue().encode("utf-8"))
+    return 0
+
+
+class MeteredCursor(psycopg2.extensions.cursor):
+    """Adds the time of every round trip, and the bytes of the query or COPY payload, to the current step."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_db(time.perf_counter() - started, len(self.query or b""))
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            record_db(time.perf_counter() - started, len(sql) + _payload_size(file))
+
+
+def metered(conn: psycopg2.extensions.connection) -> psycopg2.extensions.connection:
+    conn.cursor_factory = MeteredCursor
+    return conn
+
+
+def server_stats() -> Dict[str, Any]:
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(TABLE_STATS_SQL)
+            columns = [d[0] for d in cur.description]
+            tables = {row[0]: dict(zip(columns[1:], row[1:])) for row in cur.fetchall()}
+            cur.execute(DATABASE_STATS_SQL)
+            database = dict(zip([d[0] for d in cur.description], cur.fetchone()))
+            cur.execute("SELECT to_regclass('pg_stat_wal') IS NOT NULL;")
+            if cur.fetchone()[0]:
+                cur.execute(WAL_STATS_SQL)
+                database.update(zip([d[0] for d in cur.description], cur.fetchone()))
+        conn.commit()
+    return {"tables": tables, "database": {k: int(v) for k, v in database.items()}}
+
+
+def _delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "tables": {
+            table: {k: v - before["tables"].get(table, {}).get(k, 0) for k, v in values.items()}
+            for table, values in sorted(after["tables"].items())
+        },
+        "database": {k: v - before["database"].get(k, 0) for k, v in after["database"].items()},
+    }
+
+
+class SeedMetrics:
+    """Per-step numbers of a seeding run.
+
+    Every step gets its wall time, the part of it spent generating rows (waiting
+    on the chunk generators), the time spent in database calls, rows and bytes
+    sent. With concurrent steps (or batches in flight on the async backend)
+    generation and DB time overlap, so they do not add up to the wall time.
+    Bytes are only counted where the payload is visible (`metered` psycopg2
+    connections); with `count_bytes=False` (asyncpg) they are reported as null.
+    `trace_memory` turns on tracemalloc and samples the traced memory while
+    steps run; the peak of a step is that of the whole process during it, and
+    worker processes (--processes) are not traced. Server statistics are
+    deltas of pg_stat_* over the whole run, taken by `start` and `stop`.
+    """
+
+    def __init__(self, trace_memory: bool = False, count_bytes: bool = True, sample_interval: float = 0.05):
+        self.trace_memory = trace_memory
+        self.count_bytes = count_bytes
+        self.sample_interval = sample_interval
+        self.steps: Dict[str, StepMetrics] = {}
+        self.extra: Dict[str, Any] = {}
+        self._running: List[StepMetrics] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._server_before: Optional[Dict[str, Any]] = None
+        self._server_delta: Optional[Dict[str, Any]] = None
+        self._started = 0.0
+        self.seconds = 0.0
+
+    def start(self) -> None:
+        self._server_before = server_stats()
+        if self.trace_memory:
+            tracemalloc.start()
+            self._sampler = threading.Thread(target=self._sample, name="metrics-memory", daemon=True)
+            self._sampler.start()
+        self._started = time.perf_counter()
+
+    def stop(self) -> None:
+        self.seconds = time.perf_counter() - self._started
+        if self._sampler:
+            self._stop.set()
+            self._sampler.join()
+            self.extra["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if self._server_before is not None:
+            self._server_delta = _delta(self._server_before, server_stats())
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            current = tracemalloc.get_traced_memory()[0]
+            with self._lock:
+                for step in self._running:
+                    step.peak_traced_bytes = max(step.peak_traced_bytes or 0, current)
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[StepMetrics]:
+        step = self.steps[name] = StepMetrics(name)
+        token = _current.set(step)
+        with self._lock:
+            self._running.append(step)
+        started = time.perf_counter()
+        try:
+            yield step
+        finally:
+            step.seconds = time.perf_counter() - started
+            with self._lock:
+                self._running.remove(step)
+            _current.reset(token)
+
+    def report(self) -> Dict[str, Any]:
+        steps = {name: step.as_dict() for name, step in self.steps.items()}
+        if not self.count_bytes:
+            for step in steps.values():
+                step["bytes_sent"] = None
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "seconds": self.seconds,
+            "rows": sum(step.rows for step in self.steps.values()),
+            **self.extra,
+            "steps": steps,
+            "server": self._server_delta,
+        }
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, default=str)
+
+    def write_prometheus(self, path: str) -> None:
+        """The report in the Prometheus text format (e.g. for node_exporter's textfile collector)."""
+        report = self.report()
+        lines: List[str] = []
+
+        def metric(name: str, help_text: str, samples: Iterable, label: Optional[str] = None) -> None:
+            samples = [(key, value) for key, value in samples if value is not None]
+            if not samples:
+                return
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in samples:
+                labels = f'{{{label}="{key}"}}' if label else ""
+                lines.append(f"{name}{labels} {value}")
+
+        metric("seed_run_seconds", "Wall time of the seeding run.", [(None, report["seconds"])])
+        metric("seed_run_rows", "Rows loaded by the seeding run.", [(None, report["rows"])])
+        metric("seed_peak_traced_bytes", "Peak memory traced by tracemalloc during the run.",
+               [(None, report.get("peak_traced_bytes"))])
+        for key, help_text in (
+            ("seconds", "Wall time of a seeding step."),
+            ("generate_seconds", "Time a seeding step spent generating rows."),
+            ("db_seconds", "Time a seeding step spent in database calls."),
+            ("db_calls", "Database calls made by a seeding step."),
+            ("rows", "Rows loaded by a seeding step."),
+            ("rows_per_second", "Rows per second of a seeding step."),
+            ("bytes_sent", "Query and COPY bytes sent by a seeding step."),
+            ("peak_traced_bytes", "Peak traced Python memory while a seeding step ran."),
+        ):
+            metric(f"seed_step_{key}", help_text, ((name, step[key]) for name, step in report["steps"].items()),
+                   label="step")
+        if report["server"]:
+            for key, value in report["server"]["database"].items():
+                metric(f"seed_server_{key}", f"Change of pg_stat {key} during the run.", [(None, value)])
+            for key in ("n_tup_ins", "heap_blks_read", "heap_blks_hit", "idx_blks_read", "idx_blks_hit"):
+                metric(f"seed_table_{key}", f"Change of {key} of a table during the run.",
+                       ((table, values[key]) for table, values in report["server"]["tables"].items()),
+                       label="table")
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def log_summary(self) -> None:
+        for name, step in sorted(self.steps.items(), key=lambda item: -item[1].seconds):
+            logging.info(f"Step '{name}': {step.seconds:.2f}s (generate {step.generate_seconds:.2f}s, "
+                         f"db {step.db_seconds:.2f}s), {step.rows} rows"
+                         + (f", {step.bytes_sent / 1e6:.1f} MB" if self.count_bytes else ""))
@@ -0,0 +1,333 @@
+import argparse
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Collection, Dict, FrozenSet, Hashable, List, Optional, Sequence, Tuple
+
+import psycopg2
+
+from benchmark import ROOT, query_body, split_statements
+from db import close_pool, get_db_connection, pooled_connection
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='   %(levelname)s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+NOTIFY_CHANNEL = "report_cache"
+TRIGGER_NAME = "report_cache_notify"
+# payload meaning "every table changed", e.g. after a load with triggers disabled
+ALL_TABLES = "*"
+
+# NOTIFY is only delivered on commit and sent once per transaction for the same
+# payload, so a statement-level trigger costs next to nothing even for bulk writes
+NOTIFY_FUNCTION_SQL = f"""
+    CREATE OR REPLACE FUNCTION {TRIGGER_NAME}() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify('{NOTIFY_CHANNEL}', TG_TABLE_NAME);
+        RETURN NULL;
+    END;
+    $$;
+"""
+
+TABLES_SQL = "SELECT tablename FROM pg_tables WHERE schemaname = 'public' ORDER BY 1;"
+RESERVED_WORDS_SQL = "SELECT word FROM pg_get_keywords() WHERE catcode = 'R';"
+
+WATCHED_TABLES_SQL = f"""
+    SELECT r.relname
+    FROM pg_trigger t
+    JOIN pg_class r ON r.oid = t.tgrelid
+    JOIN pg_namespace n ON n.oid = r.relnamespace
+    WHERE t.tgname = '{TRIGGER_NAME}' AND t.tgenabled <> 'D' AND n.nspname = 'public';
+"""
+
+_EXECUTE_RE = re.compile(r"^execute\s+(\w+)", re.I)
+_PREPARE_RE = re.compile(r"^prepare\s+(\w+)", re.I)
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+
+# (column names, rows) of every query in a report file
+Result = List[Tuple[List[str], List[tuple]]]
+
+
+def install_triggers(tables: Optional[Sequence[str]] = None) -> List[str]:
+    """Adds the notifying trigger to `tables` (default: every public table)."""
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                if tables is None:
+                    cur.execute(TABLES_SQL)
+                    tables = [row[0] for row in cur.fetchall()]
+                cur.execute(NOTIFY_FUNCTION_SQL)
+                for table in tables:
+                    cur.execute(f'DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON "{table}";')
+                    cur.execute(f'CREATE TRIGGER {TRIGGER_NAME} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+                                f'ON "{table}" FOR EACH STATEMENT EXECUTE FUNCTION {TRIGGER_NAME}();')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logging.error("Failed to install the report cache triggers")
+            raise
+    logging.info(f"Installed the report cache trigger on {len(tables)} tables")
+    return list(tables)
+
+
+def uninstall_triggers() -> None:
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(WATCHED_TABLES_SQL.replace("AND t.tgenabled <> 'D' ", ""))
+                tables = [row[0] for row in cur.fetchall()]
+                for table in tables:
+                    cur.execute(f'DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON "{table}";')
+                cur.execute(f"DROP FUNCTION IF EXISTS {TRIGGER_NAME}();")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logging.error("Failed to drop the report cache triggers")
+            raise
+    logging.info(f"Dropped the report cache trigger from {len(tables)} tables")
+
+
+def referenced_tables(sql: str, tables: Sequence[str], reserved: Collection[str] = ()) -> FrozenSet[str]:
+    """The tables out of `tables` named anywhere in `sql`; a false positive only costs an extra invalidation.
+
+    Tables named like a `reserved` keyword ("order", "user") only count when quoted.
+    """
+    sql = _COMMENT_RE.sub(" ", sql).lower()
+    words = set(re.findall(r"\w+", sql))
+    quoted = set(re.findall(r'"(\w+)"', sql))
+    return frozenset(table for table in tables
+                     if table.lower() in (quoted if table.lower() in reserved else words))
+
+
+class ReportFile:
+    """An etap5 report: setup statements (PREPARE, SET ...) and the queries whose results are returned."""
+
+    def __init__(self, path: Path, tables: Sequence[str], reserved: Collection[str] = ()):
+        self.path = path
+        self.name = str(path.relative_to(ROOT)) if path.is_relative_to(ROOT) else str(path)
+        self.statements = split_statements(path.read_text(encoding="utf-8"))
+        self.sources = referenced_tables(" ".join(self.statements), tables, reserved)
+        prepared = [m.group(1) for m in (_PREPARE_RE.match(_COMMENT_RE.sub("", statement).strip())
+                                         for statement in self.statements) if m]
+        self.prepared = prepared[0] if len(prepared) == 1 else None
+
+    def run(self, cur, params: Optional[Sequence[Any]] = None) -> Result:
+        """Runs the file in the current transaction.
+
+        With `params` a file that PREPAREs one statement gets it EXECUTEd with
+        them instead of the arguments written in the file; any other file gets
+        them as psycopg2 parameters of its queries.
+        """
+        results: Result = []
+        for statement in self.statements:
+            body = query_body(statement)
+            if body is None:
+                cur.execute(statement)
+                continue
+            if params is not None and self.prepared and _EXECUTE_RE.match(body):
+                body = f"EXECUTE {self.prepared}({', '.join(['%s'] * len(params))})"
+            cur.execute(body, params)
+            results.append(([d[0] for d in cur.description], cur.fetchall()))
+        return results
+
+
+class _Entry:
+    def __init__(self, result: Result, sources: FrozenSet[str]):
+        self.result = result
+        self.sources = sources
+        self.rows = sum(len(rows) for _, rows in result)
+        self.stored_at = time.monotonic()
+
+
+def _deallocate(conn) -> None:
+    # PREPARE is not transactional. A connection that cannot be cleaned up is
+    # closed (the pool then drops it) instead of raising over the report's own error
+    try:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("DEALLOCATE ALL;")
+        conn.commit()
+    except psycopg2.Error as e:
+        logging.warning(f"Failed to deallocate the report's prepared statements, closing the connection: {e}")
+        conn.close()
+
+
+class ReportCache:
+    """Results of report files, kept until one of their source tables changes.
+
+    Entries are keyed by file and parameters and evicted least recently used
+    once there are more than `max_entries` of them or more than `max_rows`
+    rows in total, or when older than `ttl` seconds (None: never). Every
+    lookup first reads the notifications the triggers of `install_triggers`
+    sent on commit and drops the entries built from the changed tables, so a
+    hit reflects everything committed before the notification reached this
+    process. A result whose tables changed while it was being computed is
+    returned but not stored. Reports reading a table without the trigger are
+    never cached. `close` must be called to release the listening connection.
+    """
+
+    def __init__(self, max_entries: int = 256, max_rows: int = 1_000_000, ttl: Optional[float] = 300.0):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "invalidations": 0, "evictions": 0}
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._rows = 0
+        self._generations: Dict[str, int] = {}
+        self._files: Dict[Path, ReportFile] = {}
+        self._lock = threading.Lock()
+        self._listener: Optional[psycopg2.extensions.connection] = None
+        self._listen()
+
+    def _listen(self) -> None:
+        listener = get_db_connection()
+        try:
+            listener.autocommit = True
+            with listener.cursor() as cur:
+                cur.execute(f"LISTEN {NOTIFY_CHANNEL};")
+                cur.execute(TABLES_SQL)
+                self.tables = [row[0] for row in cur.fetchall()]
+                cur.execute(RESERVED_WORDS_SQL)
+                self.reserved = frozenset(row[0] for row in cur.fetchall())
+                cur.execute(WATCHED_TABLES_SQL)
+                self.watched = frozenset(row[0] for row in cur.fetchall())
+        except Exception:
+            listener.close()
+            raise
+        self._listener = listener
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def _drain(self) -> bool:
+        """Applies the notifications received so far; returns False while no listener is connected.
+
+        Called with the lock held. Without a listener nothing is invalidated,
+        so the cache is empty and bypassed until a reconnect succeeds.
+        """
+        if self._listener is not None:
+            try:
+                self._listener.poll()
+            except psycopg2.Error as e:
+                # notifications may have been lost with the connection, nothing cached can be trusted
+                logging.warning(f"Report cache listener lost ({e}), clearing the cache")
+                self._invalidate(ALL_TABLES)
+                self.close()
+        if self._listener is None:
+            try:
+                self._listen()
+            except psycopg2.Error as e:
+                logging.warning(f"Report cache listener cannot reconnect ({e}), bypassing the cache")
+                return False
+            # whatever was committed while nobody was listening is unknown
+            self._invalidate(ALL_TABLES)
+        while self._listener.notifies:
+            self._invalidate(self._listener.notifies.pop(0).payload)
+        return True
+
+    def _invalidate(self, table: str) -> None:
+        if table == ALL_TABLES:
+            for name in self.tables:
+                self._generations[name] = self._generations.get(name, 0) + 1
+            stale = list(self._entries)
+        else:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, entry in self._entries.items() if table in entry.sources]
+        for key in stale:
+            self._remove(key)
+        self.stats["invalidations"] += len(stale)
+
+    def _remove(self, key: Hashable) -> None:
+        self._rows -= self._entries.pop(key).rows
+
+    def _store(self, key: Hashable, entry: _Entry) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._rows += entry.rows
+        while len(self._entries) > self.max_entries or (self._rows > self.max_rows and len(self._entries) > 1):
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def report(self, path: Path) -> ReportFile:
+        path = Path(path).resolve()
+        if path not in self._files:
+            self._files[path] = ReportFile(path, self.tables, self.reserved)
+        return self._files[path]
+
+    def fetch(self, path: Path, params: Optional[Sequence[Any]] = None) -> Result:
+        report = self.report(path)
+        key = (report.name, None if params is None else tuple(params))
+        with self._lock:
+            listening = self._drain()
+            entry = self._entries.get(key) if listening else None
+            if entry is not None and self.ttl is not None and time.monotonic() - entry.stored_at > self.ttl:
+                self._remove(key)
+                self.stats["evictions"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry.result
+            cacheable = listening and report.sources <= self.watched
+            self.stats["misses" if cacheable else "bypassed"] += 1
+            generations = {table: self._generations.get(table, 0) for table in report.sources}
+
+        with pooled_connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    result = report.run(cur, params)
+            finally:
+                _deallocate(conn)
+
+        if cacheable:
+            with self._lock:
+                if self._drain() and all(self._generations.get(table, 0) == n for table, n in generations.items()):
+                    self._store(key, _Entry(result, report.sources))
+        return result
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cache etap5 report results until their tables change")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("install", help="add the NOTIFY triggers to every public table")
+    commands.add_parser("uninstall", help="drop the NOTIFY triggers")
+    run = commands.add_parser("run", help="run report files through the cache and show the timings")
+    run.add_argument("files", nargs="+", type=Path, help="report files, e.g. 'etap5 (SELECT)/Ola/8_complaint_stats.sql'")
+    run.add_argument("--repeat", type=int, default=3, help="times each file is fetched")
+    run.add_argument("--ttl", type=float, default=300.0, help="seconds an entry stays valid at most")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = parse_args(argv)
+    try:
+        if args.command == "install":
+            install_triggers()
+        elif args.command == "uninstall":
+            uninstall_triggers()
+        else:
+            cache = ReportCache(ttl=args.ttl)
+            try:
+                for path in args.files:
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        result = cache.fetch(path)
+                        logging.info(f"{cache.report(path).name}: {sum(len(rows) for _, rows in result)} rows "
+                                     f"in {(time.perf_counter() - started) * 1000:.2f} ms")
+                logging.info(", ".join(f"{k} {v}" for k, v in cache.stats.items()))
+            finally:
+                cache.close()
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import psycopg2
+from psycopg2.extensions import quote_ident
+
+from db import close_pool, pooled_connection
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='   %(levelname)s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+SCHEMA = "reports"
+NOTIFY_CHANNEL = "report_views"
+
+# one row per view: when it was refreshed and from which state of its source tables
+REFRESH_LOG_SQL = f"""
+    CREATE SCHEMA IF NOT EXISTS {SCHEMA};
+    CREATE TABLE IF NOT EXISTS {SCHEMA}.refresh_log (
+        view_name       text PRIMARY KEY,
+        refreshed_at    timestamptz NOT NULL,
+        duration_ms     numeric NOT NULL,
+        row_count       bigint NOT NULL,
+        source_version  text NOT NULL
+    );
+"""
+
+# the source tables' write counters and relfilenodes (which TRUNCATE changes) in one
+# string; it differs from the stored one as soon as a source table was written to
+SOURCE_VERSION_SQL = """
+    SELECT md5(string_agg(concat_ws(':', c.relname, c.relfilenode, s.n_tup_ins, s.n_tup_upd, s.n_tup_del), ','
+                          ORDER BY c.relname))
+    FROM pg_class c
+    JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE s.schemaname = 'public' AND c.relname = ANY(%s);
+"""
+
+
+class ReportView:
+    """A materialized copy of one etap5 report.
+
+    `query` is the report without its ORDER BY (readers sort, helped by
+    `indexes`); `key` are the columns of the unique index REFRESH ...
+    CONCURRENTLY needs. The view is stale once one of `sources` changed since
+    the last refresh, or when it is older than `max_age` (reports relative to
+    CURRENT_DATE go stale by themselves). It is refreshed at most once per
+    `min_interval`, however often its sources change.
+    """
+
+    def __init__(self, name: str, report: str, query: str, key: Sequence[str], sources: Sequence[str],
+                 indexes: Sequence[str] = (), max_age: Optional[timedelta] = None,
+                 min_interval: timedelta = timedelta(minutes=1)):
+        self.name = name
+        self.report = report
+        self.query = query
+        self.key = tuple(key)
+        self.sources = tuple(sources)
+        self.indexes = tuple(indexes)
+        self.max_age = max_age
+        self.min_interval = min_interval
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{SCHEMA}.{self.name}"
+
+    def create_sql(self) -> List[str]:
+        statements = [
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {self.qualified_name} AS {self.query} WITH NO DATA;",
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {self.name}_key ON {self.qualified_name} ({', '.join(self.key)});",
+        ]
+        for i, columns in enumerate(self.indexes, start=1):
+            statements.append(f"CREATE INDEX IF NOT EXISTS {self.name}_idx{i} ON {self.qualified_name} ({columns});")
+        return statements
+
+
+REPORT_VIEWS = [
+    ReportView(
+        "rfm_client_analysis",
+        "etap5 (SELECT)/Mariusz/18_rfm_client_analysis.sql",
+        """
+        WITH CustomerData AS (
+            SELECT
+                c.customer_id,
+                u.name,
+                u.email,
+                CURRENT_DATE - MAX(o.placed_at)::date AS recency,
+                COUNT(DISTINCT o.order_id) AS frequency,
+                COALESCE(SUM(o.gross_total), 0) AS monetary
+            FROM customer c
+            JOIN "user" u ON c.user_id = u.user_id
+            LEFT JOIN "order" o ON c.customer_id = o.customer_id
+            GROUP BY c.customer_id, u.name, u.email
+        ),
+        RFM_Scores AS (
+            SELECT
+                *,
+                NTILE(4) OVER (ORDER BY recency DESC) AS r_score,
+                NTILE(4) OVER (ORDER BY frequency ASC) AS f_score,
+                NTILE(4) OVER (ORDER BY monetary ASC) AS m_score
+            FROM CustomerData
+            WHERE frequency > 0
+        )
+        SELECT
+            customer_id,
+            name,
+            email,
+            recency,
+            frequency,
+            monetary,
+            r_score,
+            f_score,
+            m_score,
+            r_score::text || f_score::text || m_score::text AS rfm_segment,
+            CASE
+                WHEN r_score = 1 AND f_score = 1 AND m_score = 1 THEN 'Mistrzowie'
+                WHEN r_score = 4 AND f_score = 1 AND m_score = 1 THEN 'Lojalni, zagrożeni'
+                WHEN r_score = 1 THEN 'Nowi/Niedawni'
+                WHEN r_score = 4 THEN 'Utraceni'
+                WHEN f_score = 4 THEN 'Jednorazowi'
+                ELSE 'Pozostali'
+            END AS segment_label
+        FROM RFM_Scores
+        """,
+        key=("customer_id",),
+        sources=("customer", "user", "order"),
+        indexes=("r_score, f_score, m_score",),
+        max_age=timedelta(days=1),
+    ),
+    ReportView(
+        "kitchen_load",
+        "etap5 (SELECT)/Tomek/15_kitchen_load.sql",
+        """
+        WITH daily_workload AS (
+            SELECT completed_at::date AS completion_date, COUNT(order_item_id) AS items_completed
+            FROM order_item_fulfillment
+            WHERE completed_at IS NOT NULL
+            GROUP BY completion_date
+        ),
+        workload_median AS (
+            SELECT PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY items_completed) AS median_items
+            FROM daily_workload
+        )
+        SELECT
+            dw.completion_date,
+            dw.items_completed,
+            ROUND(wm.median_items::numeric, 2) AS median_daily_items,
+            (dw.items_completed - wm.median_items) AS deviation_from_median,
+            CASE
+                WHEN wm.median_items > 0 THEN
+                    ROUND((((dw.items_completed - wm.median_items) / wm.median_items) * 100)::numeric, 2)
+            END AS deviation_percentage
+        FROM daily_workload dw, workload_median wm
+        """,
+        key=("completion_date",),
+        sources=("order_item_fulfillment",),
+        indexes=("deviation_from_median DESC",),
+    ),
+    ReportView(
+        "most_popular_courses",
+        "etap5 (SELECT)/Tomek/13_most_popular_courses.sql",
+        """
+        SELECT c.course_id, c.name AS dish_name, COUNT(*) AS times_ordered
+        FROM course c
+        JOIN course_in_order_item cioi ON c.course_id = cioi.course_id
+        GROUP BY c.course_id, c.name
+        """,
+        key=("course_id",),
+        sources=("course", "course_in_order_item"),
+        indexes=("times_ordered DESC",),
+    ),
+    ReportView(
+        "complaint_stats",
+        "etap5 (SELECT)/Ola/8_complaint_stats.sql",
+        """
+        WITH complaint_agg AS (
+            SELECT
+                cio.course_id,
+                COUNT(*) AS complaint_count,
+                COUNT(*) FILTER (WHERE com.resolution_date IS NOT NULL) AS num_of_resolved,
+                COUNT(*) FILTER (WHERE com.resolution_date IS NULL) AS num_of_unresolved,
+                COALESCE(ROUND(AVG(com.refund_amount), 2), 0) AS average_refund
+            FROM complaint com
+            JOIN course_in_order_item cio ON com.course_in_order_id = cio.id
+            GROUP BY cio.course_id
+        )
+        SELECT
+            c.course_id,
+            c.name AS course_name,
+            COALESCE(ca.complaint_count, 0) AS complaint_count,
+            COALESCE(ca.num_of_resolved, 0) AS num_of_resolved,
+            COALESCE(ca.num_of_unresolved, 0) AS num_of_unresolved,
+            COALESCE(ca.average_refund, 0) AS average_refund
+        FROM course c
+        LEFT JOIN complaint_agg ca ON c.course_id = ca.course_id
+        """,
+        key=("course_id",),
+        sources=("course", "course_in_order_item", "complaint"),
+        indexes=("complaint_count, course_name",),
+    ),
+]
+
+
+def get_views(names: Optional[Sequence[str]] = None) -> List[ReportView]:
+    if not names:
+        return list(REPORT_VIEWS)
+    by_name = {view.name: view for view in REPORT_VIEWS}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown report views: {', '.join(unknown)}, expected some of: {', '.join(by_name)}")
+    return [by_name[name] for name in names]
+
+
+def create_views(views: Sequence[ReportView] = REPORT_VIEWS) -> None:
+    """Creates the schema, the refresh log and the (unpopulated) views with their indexes."""
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(REFRESH_LOG_SQL)
+                for view in views:
+                    for sql in view.create_sql():
+                        cur.execute(sql)
+            conn.commit()
+            logging.info(f"Created {len(views)} report views in schema '{SCHEMA}'")
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Failed to create report views: {e}")
+            raise
+
+
+def drop_views(views: Sequence[ReportView] = REPORT_VIEWS) -> None:
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                for view in views:
+                    cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view.qualified_name};")
+                cur.execute(f"SELECT to_regclass('{SCHEMA}.refresh_log') IS NOT NULL;")
+                if cur.fetchone()[0]:
+                    cur.execute(f"DELETE FROM {SCHEMA}.refresh_log WHERE view_name = ANY(%s);",
+                                ([view.name for view in views],))
+            conn.commit()
+            logging.info(f"Dropped {len(views)} report views")
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Failed to drop report views: {e}")
+            raise
+
+
+def view_status(cur: psycopg2.extensions.cursor, view: ReportView) -> Dict[str, Any]:
+    """Whether `view` is stale, and why."""
+    cur.execute(f"SELECT to_regclass('{SCHEMA}.refresh_log') IS NOT NULL, to_regclass(%s) IS NOT NULL;",
+                (view.qualified_name,))
+    if not all(cur.fetchone()):
+        raise ValueError(f"Report view {view.qualified_name} does not exist, run `python report_views.py create`")
+    cur.execute(SOURCE_VERSION_SQL, (list(view.sources),))
+    version = cur.fetchone()[0]
+    cur.execute(f"""
+        SELECT m.ispopulated, l.refreshed_at, l.duration_ms, l.row_count, l.source_version, now()
+        FROM pg_matviews m
+        LEFT JOIN {SCHEMA}.refresh_log l ON l.view_name = m.matviewname
+        WHERE m.schemaname = %s AND m.matviewname = %s;
+    """, (SCHEMA, view.name))
+    populated, refreshed_at, duration_ms, row_count, source_version, now = cur.fetchone()
+
+    age = now - refreshed_at if refreshed_at else None
+    if not populated or refreshed_at is None:
+        reason = "never refreshed"
+    elif source_version != version:
+        reason = "sources changed"
+    elif view.max_age is not None and age > view.max_age:
+        reason = "older than max age"
+    else:
+        reason = None
+    return {
+        "view": view.name,
+        "populated": populated,
+        "refreshed_at": refreshed_at,
+        "age_seconds": age.total_seconds() if age is not None else None,
+        "duration_ms": float(duration_ms) if duration_ms is not None else None,
+        "row_count": row_count,
+        "stale": reason is not None,
+        "reason": reason,
+        "source_version": version,
+        # too soon for another refresh, even if stale
+        "throttled": age is not None and age < view.min_interval,
+    }
+
+
+def refresh_view(view: ReportView, force: bool = False) -> Optional[Dict[str, Any]]:
+    """Refreshes `view` if it is stale (or `force`), returns its status afterwards, None if skipped.
+
+    The refresh runs CONCURRENTLY, so readers keep seeing the previous
+    contents meanwhile; only the very first population of a view has to be
+    a plain REFRESH. An advisory lock on the view makes concurrent schedulers
+    skip a view that is already being refreshed.
+
+    Changes are detected from the pg_stat_user_tables counters, which are not
+    transactional and reach the statistics only when the writing backend
+    flushes them (up to about a second after its commit, or at its next idle
+    moment). A check right after a commit can therefore still see the old
+    version and skip the view; it is picked up by a later check or by
+    `max_age`, and `force` refreshes regardless.
+    """
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                status = view_status(cur, view)
+                cur.execute("SELECT pg_try_advisory_xact_lock(%s::regclass::oid::int);", (view.qualified_name,))
+                if not cur.fetchone()[0]:
+                    conn.rollback()
+                    return None
+                if not force and (not status["stale"] or (status["throttled"] and status["populated"])):
+                    conn.rollback()
+                    return None
+
+                started = time.perf_counter()
+                concurrently = "CONCURRENTLY " if status["populated"] else ""
+                cur.execute(f"REFRESH MATERIALIZED VIEW {concurrently}{view.qualified_name};")
+                duration_ms = (time.perf_counter() - started) * 1000
+                cur.execute(f"SELECT count(*) FROM {view.qualified_name};")
+                row_count = cur.fetchone()[0]
+                cur.execute(f"""
+                    INSERT INTO {SCHEMA}.refresh_log (view_name, refreshed_at, duration_ms, row_count, source_version)
+                    VALUES (%s, now(), %s, %s, %s)
+                    ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at,
+                        duration_ms = EXCLUDED.duration_ms, row_count = EXCLUDED.row_count,
+                        source_version = EXCLUDED.source_version;
+                """, (view.name, duration_ms, row_count, status["source_version"]))
+                # listeners (e.g. a result cache) learn about the new contents on commit
+                cur.execute(f"NOTIFY {quote_ident(NOTIFY_CHANNEL, cur)}, %s;", (view.name,))
+            conn.commit()
+            logging.info(f"Refreshed {view.qualified_name} ({status['reason'] or 'forced'}): "
+                         f"{row_count} rows in {duration_ms:.0f} ms")
+            status.update(refreshed_at=datetime.now(timezone.utc), duration_ms=duration_ms, row_count=row_count,
+                          stale=False, reason=None, populated=True)
+            return status
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Failed to refresh {view.qualified_name}: {e}")
+            raise
+
+
+class RefreshScheduler:
+    """Checks the views every `interval` seconds and refreshes the stale ones.
+
+    Each check is cheap (pg_stat counters and the refresh log), so the
+    interval bounds how stale a view can get, while `ReportView.min_interval`
+    bounds how often a busy source can trigger a refresh. A failed refresh is
+    logged and retried on the next check.
+    """
+
+    def __init__(self, views: Sequence[ReportView] = REPORT_VIEWS, interval: float = 30.0):
+        self.views = list(views)
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def run_once(self) -> List[str]:
+        refreshed = []
+        for view in self.views:
+            try:
+                if refresh_view(view):
+                    refreshed.append(view.name)
+            except psycopg2.Error:
+                # already logged; the other views still get their turn
+                pass
+        return refreshed
+
+    def run(self, iterations: Optional[int] = None) -> None:
+        done = 0
+        while not self._stop.is_set() and (iterations is None or done < iterations):
+            self.run_once()
+            done += 1
+            self._stop.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def status(views: Sequence[ReportView] = REPORT_VIEWS) -> List[Dict[str, Any]]:
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            statuses = [view_status(cur, view) for view in views]
+        conn.rollback()
+    return statuses
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Materialized views for the heavy etap5 reports")
+    parser.add_argument("command", choices=("create", "refresh", "status", "watch", "drop"),
+                        help="create the views, refresh the stale ones (or all with --force), show staleness, "
+                             "keep refreshing every --interval seconds, or drop them")
+    parser.add_argument("views", nargs="*", help=f"views to act on (default: all of {', '.join(v.name for v in REPORT_VIEWS)})")
+    parser.add_argument("--force", action="store_true", help="refresh even if not stale")
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between checks for watch")
+    return parser.parse_intermixed_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = parse_args(argv)
+    views = get_views(args.views)
+    try:
+        if args.command == "create":
+            create_views(views)
+        elif args.command == "drop":
+            drop_views(views)
+        elif args.command == "refresh":
+            for view in views:
+                refresh_view(view, force=args.force)
+        elif args.command == "status":
+            for s in status(views):
+                age = f"{s['age_seconds']:.0f}s old" if s["age_seconds"] is not None else "never refreshed"
+                logging.info(f"{s['view']}: {'stale (' + s['reason'] + ')' if s['stale'] else 'fresh'}, {age}, "
+                             f"{s['row_count'] or 0} rows")
+        else:
+            scheduler = RefreshScheduler(views, interval=args.interval)
+            try:
+                scheduler.run()
+            except KeyboardInterrupt:
+                scheduler.stop()
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from typing import Collection, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Sampling without replacement for relation tables: a pair (a, b) out of
+# len(left) x len(right) is the cell a * len(right) + b of the flattened grid,
+# so distinct cells are distinct pairs and no seen-set or retry loop is needed.
+
+# numpy's choice(replace=False) is Floyd's algorithm (memory in the sample
+# size) when k <= n // 50 or n <= 10000; otherwise it shuffles an arange of
+# the whole population, which is fine up to this many cells
+_SHUFFLE_LIMIT = 1 << 22
+
+
+class FeistelPermutation:
+    """A pseudo-random bijection of range(n), evaluated for any index in O(1).
+
+    A balanced Feistel network over the smallest even number of bits that
+    covers n; values that land at or above n are fed through it again (cycle
+    walking), which keeps it a permutation of range(n) and takes under four
+    passes on average.
+    """
+
+    def __init__(self, n: int, key: int, rounds: int = 4):
+        self.n = n
+        self.half_bits = max(1, (max(n - 1, 1).bit_length() + 1) // 2)
+        self.mask = np.uint64((1 << self.half_bits) - 1)
+        keys = np.random.default_rng(key).integers(0, 1 << 63, rounds, dtype=np.uint64)
+        self.keys = [np.uint64(k) for k in keys]
+
+    def _round(self, values: np.ndarray, key: np.uint64) -> np.ndarray:
+        # splitmix64 finalizer of the half block and the round key
+        x = (values ^ key) * np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return (x ^ (x >> np.uint64(31))) & self.mask
+
+    def _encrypt(self, values: np.ndarray) -> np.ndarray:
+        shift = np.uint64(self.half_bits)
+        left, right = values >> shift, values & self.mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << shift) | right
+
+    def __call__(self, indices: np.ndarray) -> np.ndarray:
+        values = self._encrypt(np.asarray(indices, dtype=np.uint64))
+        outside = values >= self.n
+        while outside.any():
+            values[outside] = self._encrypt(values[outside])
+            outside = values >= self.n
+        return values.astype(np.int64)
+
+
+def sample_indices(rng: np.random.Generator, n: int, k: int, exclude: Collection[int] = ()) -> np.ndarray:
+    """`k` distinct integers out of range(n) that are not in `exclude`, in random order.
+
+    Fewer are returned when range(n) minus `exclude` has fewer than `k`
+    values. Time and memory are linear in `k` + len(`exclude`) at any
+    density, n never gets materialized.
+    """
+    excluded = np.unique(np.fromiter(exclude, dtype=np.int64, count=len(exclude))) if exclude else None
+    available = n - (len(excluded) if excluded is not None else 0)
+    k = max(0, min(k, available))
+    # at most len(exclude) of the drawn values get dropped again
+    draw = min(n, k + (len(excluded) if excluded is not None else 0))
+    if draw <= n // 50 or n <= _SHUFFLE_LIMIT:
+        drawn = rng.choice(n, draw, replace=False)
+    else:
+        drawn = FeistelPermutation(n, int(rng.integers(0, 1 << 63)))(np.arange(draw, dtype=np.int64))
+    if excluded is not None:
+        drawn = drawn[~np.isin(drawn, excluded)]
+    return drawn[:k]
+
+
+def pair_cells(pairs: Iterable[Tuple[int, int]], left_ids: Sequence[int], right_ids: Sequence[int]) -> List[int]:
+    """The grid cells of (left_id, right_id) `pairs`; pairs with an id outside the grid are left out."""
+    left_index: Dict[int, int] = {id_: i for i, id_ in enumerate(left_ids)}
+    right_index: Dict[int, int] = {id_: i for i, id_ in enumerate(right_ids)}
+    return [left_index[a] * len(right_ids) + right_index[b]
+            for a, b in pairs if a in left_index and b in right_index]
+
+
+def sample_pairs(rng: np.random.Generator, left_ids: Sequence[int], right_ids: Sequence[int], k: int,
+                 exclude: Iterable[Tuple[int, int]] = ()) -> List[int]:
+    """`k` distinct cells of the `left_ids` x `right_ids` grid, none of them an `exclude` pair.
+
+    Cell c stands for (left_ids[c // len(right_ids)], right_ids[c % len(right_ids)]).
+    """
+    excluded = pair_cells(exclude, left_ids, right_ids)
+    return sample_indices(rng, len(left_ids) * len(right_ids), k, excluded).tolist()
@@ -0,0 +1,49 @@
+import argparse
+from typing import Dict
+
+# row counts of the independently sized tables at --scale 1 (the dataset the
+# seeder has always produced); the key is the seeding step that uses it
+BASE_SIZES: Dict[str, int] = {
+    "course": 60000,
+    "ingredient": 1000,
+    "customer": 5000,
+    "opinion": 10000,
+    "dietician": 20,
+    "meal_plan": 50,
+    "daily_menu": 1000,
+    "cook": 25,
+    "courier": 30,
+    "administrator": 5,
+}
+
+PROFILES: Dict[str, float] = {
+    "tiny": 0.01,
+    "dev": 0.1,
+    "prod-like": 1.0,
+    "stress": 10.0,
+}
+
+
+def parse_scale(value: str) -> float:
+    """A profile name or a positive number, for argparse."""
+    if value in PROFILES:
+        return PROFILES[value]
+    try:
+        scale = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Unknown scale '{value}', expected a number or one of: {', '.join(PROFILES)}")
+    if scale <= 0:
+        raise argparse.ArgumentTypeError(f"Scale must be positive, got {value}")
+    return scale
+
+
+def dataset_sizes(scale: float = 1.0) -> Dict[str, int]:
+    """Table cardinalities for a scale factor.
+
+    Every entry of BASE_SIZES grows linearly with `scale` (at least one row);
+    the rest follows through fan-outs that do not depend on it (items per
+    order, ingredients per course, the share of customers ordering, ...), so
+    per-row distributions and query selectivities stay the same at every
+    scale. Fixed dictionaries (allergens, categories, statuses) do not grow.
+    """
+    return {table: max(1, round(count * scale)) for table, count in BASE_SIZES.items()}
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import psycopg2
+
+
+class Step:
+    """One seeding step: `fn(seeder, results)` runs once every step named in
+    `requires` has finished; its return value is stored in results[name]."""
+
+    def __init__(self, name: str, fn: Callable[[Any, Dict[str, Any]], Any], requires: Sequence[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.requires = tuple(requires)
+
+    def __repr__(self):
+        return f"Step({self.name!r}, requires={self.requires!r})"
+
+
+def _check_steps(steps: Dict[str, Step]) -> None:
+    for step in steps.values():
+        for dep in step.requires:
+            if dep not in steps:
+                raise ValueError(f"Step '{step.name}' requires unknown step '{dep}'")
+
+    # Kahn's algorithm, only to reject cycles before anything runs
+    indegree = {name: len(step.requires) for name, step in steps.items()}
+    ready = [name for name, deg in indegree.items() if deg == 0]
+    visited = 0
+    while ready:
+        name = ready.pop()
+        visited += 1
+        for other in steps.values():
+            if name in other.requires:
+                indegree[other.name] -= 1
+                if indegree[other.name] == 0:
+                    ready.append(other.name)
+    if visited != len(steps):
+        raise ValueError("Seed steps contain a dependency cycle")
+
+
+class SeedScheduler:
+    """Runs a DAG of steps on a pool of worker threads.
+
+    Every worker thread gets its own connection (and its own seeder built by
+    `make_seeder(conn)`), so independent steps load concurrently and the total
+    time is bounded by the critical path instead of the sum of all steps.
+    Connections are handed back through `release` (closed by default).
+    """
+
+    def __init__(self, steps: Sequence[Step], connect: Callable[[], psycopg2.extensions.connection],
+                 make_seeder: Callable[[psycopg2.extensions.connection], Any], workers: int = 4,
+                 release: Optional[Callable[[psycopg2.extensions.connection], None]] = None,
+                 metrics: Optional[Any] = None):
+        self.steps = {step.name: step for step in steps}
+        self.connect = connect
+        self.release = release or (lambda conn: conn.close())
+        self.make_seeder = make_seeder
+        self.workers = max(1, workers)
+        # a metrics.SeedMetrics collecting per-step numbers, if any
+        self.metrics = metrics
+        self._local = threading.local()
+        self._connections: List[psycopg2.extensions.connection] = []
+        self._lock = threading.Lock()
+        self._validate()
+
+    def _validate(self):
+        _check_steps(self.steps)
+
+    def _seeder(self):
+        seeder = getattr(self._local, "seeder", None)
+        if seeder is None:
+            conn = self.connect()
+            with self._lock:
+                self._connections.append(conn)
+            seeder = self._local.seeder = self.make_seeder(conn)
+        return seeder
+
+    def _run_step(self, step: Step, results: Dict[str, Any]):
+        started = time.perf_counter()
+        with self.metrics.step(step.name) if self.metrics else nullcontext():
+            value = step.fn(self._seeder(), results)
+        logging.info(f"Step '{step.name}' finished in {time.perf_counter() - started:.2f}s")
+        return value
+
+    def run(self, results: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        results = {} if results is None else results
+        pending = dict(self.steps)
+        running = {}
+        started = time.perf_counter()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="seed") as pool:
+                while pending or running:
+                    ready = [step for step in pending.values() if all(dep in results for dep in step.requires)]
+                    for step in ready:
+                        del pending[step.name]
+                        running[pool.submit(self._run_step, step, results)] = step.name
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        try:
+                            results[name] = future.result()
+                        except Exception:
+                            logging.error(f"Step '{name}' failed, cancelling the remaining steps")
+                            for other in running:
+                                other.cancel()
+                            raise
+        finally:
+            for conn in self._connections:
+                self.release(conn)
+            self._connections.clear()
+
+        logging.info(f"Seeded {len(self.steps)} steps with {self.workers} workers in {time.perf_counter() - started:.2f}s")
+        return results
+
+
+class AsyncSeedScheduler:
+    """Runs the same DAG of steps as coroutines on one event loop.
+
+    The step functions return coroutines here (see async_seeders.AsyncSeeder);
+    all steps share one seeder and its connection pool, and at most `workers`
+    of them run at the same time.
+    """
+
+    def __init__(self, steps: Sequence[Step], seeder: Any, workers: int = 4, metrics: Optional[Any] = None):
+        self.steps = {step.name: step for step in steps}
+        self.seeder = seeder
+        self.workers = max(1, workers)
+        self.metrics = metrics
+        _check_steps(self.steps)
+
+    async def run(self, results: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        results = {} if results is None else results
+        slots = asyncio.Semaphore(self.workers)
+        tasks: Dict[str, asyncio.Task] = {}
+        started = time.perf_counter()
+
+        async def run_step(step: Step):
+            await asyncio.gather(*(tasks[dep] for dep in step.requires))
+            async with slots:
+                step_started = time.perf_counter()
+                with self.metrics.step(step.name) if self.metrics else nullcontext():
+                    results[step.name] = await step.fn(self.seeder, results)
+                logging.info(f"Step '{step.name}' finished in {time.perf_counter() - step_started:.2f}s")
+
+        # every task exists before any of them runs, so dependencies are looked up by name
+        for step in self.steps.values():
+            tasks[step.name] = asyncio.create_task(run_step(step), name=step.name)
+        try:
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            failed = [name for name, task in tasks.items() if task.done() and not task.cancelled() and task.exception()]
+            logging.error(f"Step '{failed[0] if failed else '?'}' failed, cancelling the remaining steps")
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        logging.info(f"Seeded {len(self.steps)} steps with {self.workers} workers in {time.perf_counter() - started:.2f}s")
+        return results
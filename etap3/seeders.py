@@ -1,68 +1,145 @@
+import argparse
+import asyncio
 import logging
-from datetime import datetime, timedelta
-import random
-import re
-from typing import List, Optional, Sequence, Tuple
+import os
+from contextlib import nullcontext
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from faker import Faker
 import psycopg2
-import psycopg2.extras
 
-from db import get_db_connection
-
-fake = Faker('pl_PL')
+import generators as gen
+import metrics
+import snapshots
+from bulk_load import BulkLoad
+from db import close_pool, get_pool, pooled_connection, settings
+from db_reset import truncate_tables
+from loaders import LOADERS, CopyLoader, Loader, make_loader
+from sampling import sample_pairs
+from scale import PROFILES, dataset_sizes, parse_scale
+from scheduler import SeedScheduler, Step
+from shards import ChunkContext, ChunkFn, ShardPool, count_parts, derive_seed, new_seed, slice_parts
+from unique_values import clamped_day, distinct_days
+from value_pools import ValuePools
 
 logging.basicConfig(
-    level=logging.INFO,         
-    format='   %(levelname)s | %(message)s', 
-    datefmt='%Y-%m-%d %H:%M:%S'        
+    level=logging.INFO,
+    format='   %(levelname)s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
 )
 
+ALLERGEN_NAMES = [
+    'Gluten', 'Skorupiaki', 'Jaja', 'Ryby', 'Orzechy arachidowe',
+    'Soja', 'Mleko (lakxtoza)', 'Orzechy', 'Seler', 'Gorczyca',
+    'Nasiona sezamu', 'Dwutlenek siarki i siarczyny', 'Łubin', 'Mięczaki'
+]
+CATEGORY_NAMES = [
+    'Śniadanie', 'Drugie Śniadanie', 'Lunch', 'Obiad', 'Podwieczorek', 'Kolacja',
+    'Deser', 'Na słodko', 'Na słono', 'Wegetariańskie', 'Wegańskie', 'Wysokoproteinowe',
+    'Bez laktozy', 'Bez glutenu', 'Insulinooporność', 'FIT', 'Włoskie', 'Azjatyckie',
+    'Tajskie', 'Tradycyjne'
+]
+CERTIFICATION_NAMES = [
+    'Certyfikat', 'Studia wyższe', 'Ukonczony kurs', 'Praktyka własna', 'Certyfikacja kliniczna',
+    'Holistyczny coach', 'Zarejstrowany dietetyk', 'Dietetyk dzieci'
+]
+COURIER_TYPE_NAMES = ['Rower', 'Hulajnoga', 'Motor', 'Samochód', 'Pieszo']
+SPECIALTY_NAMES = ['Włoska', 'Azjatycka', 'Meksykańska', 'Polska', 'Wege', 'Desery']
+FULFILLMENT_STATUS_NAMES = ['Pending', 'In Preparation', 'Ready for Delivery', 'Cancelled']
+DELIVERY_STATUS_NAMES = ['Pending Pickup', 'Picked Up', 'En Route', 'Delivered', 'Failed Delivery']
+
+# Zapytanie SQL może zwracać mniej wierszy niż jest w `selected_ids`, jeśli dane są niespójne
+COMPLAINT_SOURCES_SQL = '''
+    SELECT cioi.id, C.customer_id, o.placed_at
+    FROM "course_in_order_item" AS cioi
+    JOIN "order_item" oi ON cioi.order_item_id = oi.order_item_id
+    JOIN "order" o ON oi.order_id = o.order_id
+    JOIN "customer" c ON o.customer_id = c.customer_id
+    WHERE cioi.id = ANY(%s::int[]);
+'''
+
+# ids append mode draws from, in a stable order
+APPEND_IDS_SQL = {
+    "customer": 'SELECT DISTINCT customer_id FROM "customer_address" ORDER BY 1;',
+    "course": 'SELECT course_id FROM "course" ORDER BY 1;',
+    "cook": 'SELECT cook_id FROM "cook" ORDER BY 1;',
+    "courier": 'SELECT courier_id FROM "courier" ORDER BY 1;',
+    "fulfillment_status": 'SELECT id FROM "order_item_fulfillment_status" ORDER BY 1;',
+    "delivery_status": 'SELECT id FROM "order_item_delivery_status" ORDER BY 1;',
+}
+
 
 class Seeder:
-    def __init__(self, conn: psycopg2.extensions.connection):
+    def __init__(self, conn: psycopg2.extensions.connection, loader: Optional[Loader] = None, reset_tables: bool = True,
+                 pools: Optional[ValuePools] = None, chunk_size: int = 10000, seed: Optional[int] = None,
+                 shards: Optional[ShardPool] = None, now: Optional[datetime] = None):
         self.conn = conn
+        self.loader = loader or CopyLoader()
+        # text columns are sampled from pre-generated Faker pools
+        self.pools = pools or ValuePools()
+        # seeders truncate their target table first; disable when the db was already
+        # reset (parallel runs would otherwise lock each other through the CASCADEs)
+        self.reset_tables = reset_tables
+        # customer_id -> address ids, kept from seed_customers_with_addresses for seed_orders
+        self.customer_addresses: Dict[int, List[int]] = {}
+        # rows are generated and loaded chunk_size at a time, so memory does not
+        # grow with the number of rows requested
+        self.chunk_size = max(1, chunk_size)
+        # every chunk draws from its own streams derived from (seed, table, chunk),
+        # so the data only depends on the seed, not on who generated which chunk
+        self.seed = new_seed() if seed is None else seed
+        self.shards = shards or ShardPool()
+        # "now" is fixed per run, all generated dates are relative to it
+        self.now = now or datetime.now()
 
     def truncate(self, tables: Sequence[str]) -> None:
         if not self.conn:
             return
         with self.conn.cursor() as cur:
-            for t in tables:
-                cur.execute(f'TRUNCATE TABLE "{t}" RESTART IDENTITY CASCADE;')
+            truncate_tables(cur, tables)
         self.conn.commit()
 
     def truncate_all(self):
         with self.conn.cursor() as cur:
             logging.info("Truncating ALL tables with CASCADE (full reset)...")
-            cur.execute("""
-                DO $$
-                DECLARE
-                    t text;
-                BEGIN
-                    -- Loop through all user tables
-                    FOR t IN
-                        SELECT tablename
-                        FROM pg_tables
-                        WHERE schemaname = 'public'
-                    LOOP
-                        EXECUTE format('TRUNCATE TABLE %I RESTART IDENTITY CASCADE;', t);
-                    END LOOP;
-                END $$;
-            """)
+            # one statement for all tables: a single lock acquisition and catalog pass
+            count = truncate_tables(cur)
             self.conn.commit()
-        logging.info("All tables truncated successfully (CASCADE mode)")
-
-
-    def _ids_from_result_or_select(self, cur: psycopg2.extensions.cursor, result, table: str, expected_count: Optional[int] = None) -> List[int]:
-        if result:
-            return [row[0] for row in result]
-        if expected_count:
-            cur.execute(f'SELECT id FROM "{table}" ORDER BY id DESC LIMIT %s;', (expected_count,))
-            rows = cur.fetchall()
-            return [row[0] for row in reversed(rows)]
-        cur.execute(f'SELECT id FROM "{table}";')
-        rows = cur.fetchall()
-        return [row[0] for row in rows]
+        logging.info(f"All {count} tables truncated successfully (CASCADE mode)")
+
+    def _context(self, stream: str) -> ChunkContext:
+        # streams for decisions made once per table, outside the chunk generators
+        return ChunkContext(self.seed, stream, 0, 0, self.pools, self.now)
+
+    def _generate(self, stream: str, fn: ChunkFn, parts: Iterable[Tuple[int, Any]], *args) -> Iterator:
+        return metrics.timed(self.shards.map(fn, self.seed, stream, parts, self.pools, self.now, args))
+
+    def _rows(self, stream: str, fn: ChunkFn, num: int, *args) -> Iterator:
+        # chunks of a table generated from a row count
+        return self._generate(stream, fn, count_parts(num, self.chunk_size), *args)
+
+    def _rows_per_parent(self, stream: str, fn: ChunkFn, parent_ids: Sequence, max_per_parent: int, *args) -> Iterator:
+        # chunks of a table generated from its parents; a chunk covers as many
+        # parents as keep it within chunk_size rows
+        per_chunk = max(1, self.chunk_size // max(1, max_per_parent))
+        return self._generate(stream, fn, slice_parts(parent_ids, per_chunk), *args)
+
+    def _rechunk(self, rows: Iterable[Tuple], size: Optional[int] = None) -> Iterator[List[Tuple]]:
+        # groups a row generator into lists of chunk_size rows
+        size = size or self.chunk_size
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _reset_table(self, cur: psycopg2.extensions.cursor, table: str) -> None:
+        if self.reset_tables:
+            cur.execute(f'TRUNCATE TABLE "{table}" RESTART IDENTITY CASCADE;')
 
     # ==== TOMEK ====
 
@@ -70,34 +147,11 @@ class Seeder:
         if not self.conn:
             return []
 
-        courses_data: List[Tuple] = []
-        now = datetime.now()
-        for _ in range(num):
-            courses_data.append((
-                f"{fake.word().capitalize()} z {fake.word()}ami",
-                fake.paragraph(nb_sentences=4),
-                round(random.uniform(20.0, 85.0), 2),
-                round(random.uniform(5, 50), 2),
-                random.randint(200, 1200),
-                round(random.uniform(10, 150), 2),
-                round(random.uniform(5, 70), 2),
-                now,
-                now
-            ))
-
-        sql = """
-            INSERT INTO "course"
-                (name, description, price, protein_100g, calories_100g,
-                 carbohydrates_100g, fat_100g, created_at, updated_at)
-            VALUES %s
-            RETURNING course_id;
-        """
-
         try:
             with self.conn.cursor() as cur:
-                cur.execute('TRUNCATE TABLE "course" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cur, sql, courses_data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, "course", expected_count=num)
+                self._reset_table(cur, "course")
+                ids = self.loader.insert_chunks(cur, "course", gen.COURSE_COLUMNS, self._rows("course", gen.courses, num),
+                                                returning="course_id")
                 self.conn.commit()
                 logging.info(f"Added {str(num)} courses")
                 return ids
@@ -110,31 +164,11 @@ class Seeder:
         if not self.conn:
             return []
 
-        possible_units = ['g', 'ml', 'kg', 'l', 'piece']
-        ingredients_data: List[Tuple] = []
-        for _ in range(num):
-            ingredients_data.append((
-                fake.word(),
-                fake.sentence(nb_words=6),
-                random.randint(10, 500),
-                random.choice(possible_units),
-                round(random.uniform(0, 30), 2),
-                round(random.uniform(0, 60), 2),
-                round(random.uniform(0, 100), 2)
-            ))
-
-        sql = """
-            INSERT INTO "ingredient"
-                (name, description, calories_100g, unit_of_measure, protein_100g, fat_100g, carbohydrates_100g)
-            VALUES %s
-            RETURNING ingredient_id;
-        """
-
         try:
             with self.conn.cursor() as cur:
-                cur.execute('TRUNCATE TABLE "ingredient" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cur, sql, ingredients_data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, "ingredient", expected_count=num)
+                self._reset_table(cur, "ingredient")
+                ids = self.loader.insert_chunks(cur, "ingredient", gen.INGREDIENT_COLUMNS, self._rows("ingredient", gen.ingredients, num),
+                                                returning="ingredient_id")
                 self.conn.commit()
                 logging.info(f"Added {str(num)} ingredients")
                 return ids
@@ -148,22 +182,14 @@ class Seeder:
         if not self.conn or not course_ids or not ingredient_ids:
             return 0
 
-        relations = set()
-        for course_id in course_ids:
-            k = random.randint(min_per_course, max_per_course)
-            chosen = random.sample(ingredient_ids, k=min(k, len(ingredient_ids)))
-            for ing_id in chosen:
-                relations.add((course_id, ing_id))
+        relations = self._rows_per_parent("course_ingredient", gen.children, course_ids, max_per_course,
+                                          ingredient_ids, min_per_course, max_per_course)
 
-        sql = 'INSERT INTO "course_ingredient" (course_id, ingredient_id) VALUES %s'
         try:
             with self.conn.cursor() as cur:
-                inserted = 0
-                if relations:
-                    psycopg2.extras.execute_values(cur, sql, list(relations))
-                    inserted = cur.rowcount
+                inserted = self.loader.insert_chunks(cur, "course_ingredient", ("course_id", "ingredient_id"), relations)
                 self.conn.commit()
-                logging.info(f"Added {str(len(relations))} coures ingredient relations")
+                logging.info(f"Added {str(inserted)} coures ingredient relations")
                 return inserted
         except Exception:
             self.conn.rollback()
@@ -175,24 +201,18 @@ class Seeder:
             return []
 
         if allergen_names is None:
-            allergen_names = [
-                'Gluten', 'Skorupiaki', 'Jaja', 'Ryby', 'Orzechy arachidowe',
-                'Soja', 'Mleko (lakxtoza)', 'Orzechy', 'Seler', 'Gorczyca',
-                'Nasiona sezamu', 'Dwutlenek siarki i siarczyny', 'Łubin', 'Mięczaki'
-            ]
+            allergen_names = ALLERGEN_NAMES
 
-        data = [(name, fake.sentence(nb_words=8)) for name in allergen_names]
-        sql = 'INSERT INTO "allergen" (name, description) VALUES %s RETURNING allergen_id;'
+        data = gen.described(self._context("allergen"), allergen_names)
 
         try:
             with self.conn.cursor() as cur:
-                cur.execute('TRUNCATE TABLE "allergen" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cur, sql, data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, "allergen", expected_count=len(allergen_names))
+                self._reset_table(cur, "allergen")
+                ids = self.loader.insert(cur, "allergen", ("name", "description"), data, returning="allergen_id")
                 self.conn.commit()
                 logging.info(f"Added {str(len(data))} allergens")
                 return ids
-                
+
         except Exception:
             self.conn.rollback()
             logging.error("Failed to add allergens")
@@ -203,20 +223,14 @@ class Seeder:
         if not self.conn or not ingredient_ids or not allergen_ids:
             return 0
 
-        relations = set()
-        for ing_id in ingredient_ids:
-            if random.random() < probability:
-                relations.add((random.choice(allergen_ids), ing_id))
+        relations = self._rows_per_parent("allergen_ingredient", gen.allergen_ingredients, ingredient_ids, 1,
+                                          allergen_ids, probability)
 
-        sql = 'INSERT INTO "allergen_ingredient" (allergen_id, ingredient_id) VALUES %s'
         try:
             with self.conn.cursor() as cur:
-                inserted = 0
-                if relations:
-                    psycopg2.extras.execute_values(cur, sql, list(relations))
-                    inserted = cur.rowcount
+                inserted = self.loader.insert_chunks(cur, "allergen_ingredient", ("allergen_id", "ingredient_id"), relations)
                 self.conn.commit()
-                logging.info(f"Added {str(len(relations))} allergen ingredient relations")
+                logging.info(f"Added {str(inserted)} allergen ingredient relations")
                 return inserted
         except Exception:
             self.conn.rollback()
@@ -227,21 +241,13 @@ class Seeder:
         if not self.conn or not customer_ids or not ingredient_ids:
             return 0
 
-        preferences_data = []
-        for customer_id in customer_ids:
-            num_prefs = random.randint(0, 100)
-            k = min(num_prefs, len(ingredient_ids))
-            chosen_ingredient_ids = random.sample(ingredient_ids, k=k)
-            
-            for ingredient_id in chosen_ingredient_ids:
-                rating = random.randint(1, 5)
-                preferences_data.append((customer_id, ingredient_id, rating))
-
-        sql = 'INSERT INTO "preference" (customer_id, ingredient_id, rating) VALUES %s'
+        # up to 100 preferences per customer
+        preferences_data = self._rows_per_parent("preference", gen.preferences, customer_ids, 100, ingredient_ids)
+
         try:
             with self.conn.cursor() as cur:
-                psycopg2.extras.execute_values(cur, sql, preferences_data)
-                inserted_count = cur.rowcount
+                inserted_count = self.loader.insert_chunks(cur, "preference", gen.PREFERENCE_COLUMNS,
+                                                           preferences_data)
                 self.conn.commit()
                 logging.info(f"Added {inserted_count} preferences")
                 return inserted_count
@@ -250,35 +256,26 @@ class Seeder:
             logging.error(f"Failed to add preferences: {e}")
             raise
 
-    def seed_opinions(self, customer_ids: Sequence[int], course_ids: Sequence[int], num: int = 1500) -> int:
+    def _opinion_pairs(self, customer_ids: Sequence[int], course_ids: Sequence[int], num: int,
+                       existing: Collection[Tuple[int, int]] = ()) -> List[int]:
+        # distinct cells of the customer x course grid are drawn up front, so
+        # every chunk gets its own pairs and none of them repeats across chunks
+        return sample_pairs(self._context("opinion").rng, customer_ids, course_ids, num, existing)
+
+    def seed_opinions(self, customer_ids: Sequence[int], course_ids: Sequence[int], num: int = 1500,
+                      existing: Collection[Tuple[int, int]] = ()) -> int:
+        """`existing` are (customer_id, course_id) pairs that already have an opinion."""
         if not self.conn or not customer_ids or not course_ids:
             return 0
 
-        opinions_data = []
-        used_combinations = set()
-        
-        max_possible_opinions = len(customer_ids) * len(course_ids)
-        num_to_generate = min(num, max_possible_opinions)
-
-        while len(opinions_data) < num_to_generate:
-            customer_id = random.choice(customer_ids)
-            course_id = random.choice(course_ids)
-
-            if (customer_id, course_id) in used_combinations:
-                continue
+        pairs = self._opinion_pairs(customer_ids, course_ids, num, existing)
+        opinions_data = self._generate("opinion", gen.opinions, slice_parts(pairs, self.chunk_size),
+                                       customer_ids, course_ids)
 
-            used_combinations.add((customer_id, course_id))
-            
-            rating = random.randint(1, 5) 
-            opinion_text = fake.sentence(nb_words=10) if random.random() < 0.75 else None
-            
-            opinions_data.append((course_id, customer_id, rating, opinion_text))
-
-        sql = 'INSERT INTO "opinion" (course_id, customer_id, rating, opinion) VALUES %s'
         try:
             with self.conn.cursor() as cur:
-                psycopg2.extras.execute_values(cur, sql, opinions_data)
-                inserted_count = cur.rowcount
+                inserted_count = self.loader.insert_chunks(cur, "opinion", gen.OPINION_COLUMNS,
+                                                           opinions_data)
                 self.conn.commit()
                 logging.info(f"Added {inserted_count} opinions")
                 return inserted_count
@@ -291,31 +288,11 @@ class Seeder:
     def _seed_addresses(self, num = 1000):
         if not self.conn:
             return []
-        
-        addresses_data: List[Tuple] = []
-
-        for _ in range(num):
-            addresses_data.append((
-                fake.country(),                                                             # country
-                fake.region() if random.random() > 0.3 else None,                           # region
-                fake.postcode(),                                                            # postal_code
-                fake.city(),                                                                # city
-                fake.street_name(),                                                         # street name
-                str(random.randint(1, 200)),                                                # street number
-                str(random.randint(1, 100)) if random.random() > 0.5 else None,             # apartment
-            ))
-        
-        sql_query = """
-            INSERT INTO "address"
-                (country, region, postal_code, city, street_name, street_number, apartment)
-            VALUES %s
-            RETURNING address_id;
-        """
 
         try:
             with self.conn.cursor() as cursor:
-                inserted = psycopg2.extras.execute_values(cursor, sql_query, addresses_data, fetch=True)
-                ids = self._ids_from_result_or_select(cursor, inserted, "address", expected_count=num)
+                ids = self.loader.insert_chunks(cursor, "address", gen.ADDRESS_COLUMNS, self._rows("address", gen.addresses, num),
+                                                returning="address_id")
                 self.conn.commit()
                 logging.info(f"Added {num} addresses")
                 return ids
@@ -325,69 +302,15 @@ class Seeder:
             self.conn.rollback()
             raise
 
-    def _normalize_phone(self, raw: str) -> Optional[str]:
-        if not raw:
-            return None
-        digits = re.sub(r'\D', '', raw)   # wywal wszystko poza cyframi
-        if not digits:
-            return None
-        # Jeżeli zaczyna się od 48, potraktuj to jako PL z plusikiem
-        if digits.startswith('48'):
-            e164 = '+' + digits
-        else:
-            # jak chcesz mieć bardziej „smart”, dorzuć logikę krajów;
-            # na szybko: dodaj plusa i jedziemy
-            e164 = '+' + digits
-        # minimalnie 7 cyfr sensownie
-        return e164 if 7 <= len(digits) <= 15 else None
-
-    def _seed_users(self, num = 1000):
+    def _seed_users(self, num = 1000, role: str = "customer"):
         if not self.conn:
             return []
-        
-        users_data: List[Tuple] = []
-        logins = set()
-        emails = set()
-
-        while len(users_data) < num:
-            login = fake.unique.user_name()
-            email = fake.unique.email()
-            if login in logins or email in emails:
-                continue
-
-            logins.add(login)
-            emails.add(email)
-            phone_raw = fake.phone_number() if random.random() > 0.2 else None
-            phone = self._normalize_phone(phone_raw) if phone_raw else None
-
-            date_created = fake.date_between(start_date='-5y', end_date='today')
-            
-            users_data.append((
-                login,                                                       # login (unique username)
-                email,                                                           # email (unique)
-                fake.password(length=12, special_chars=True, digits=True, upper_case=True, lower_case=True),  # password_hash (just fake string)
-                fake.first_name(),                                                      # name
-                fake.last_name(),                                                       # lastname
-                phone,                                                                  # phone_number (optional)
-                date_created,                                                           # date_created
-                fake.date_between(start_date=date_created, end_date='today') if random.random() < 0.2 else None,
-                    # date_removed (optional)
-                fake.date_time_between(start_date=date_created, end_date='now') if random.random() < 0.8 else None
-                    # last login
-            ))
-
-        sql_query = """
-            INSERT INTO "user"
-                (login, email, password_hash, name, surname, phone_number, date_created, date_removed, last_login)
-            VALUES %s
-            RETURNING user_id;
-        """
 
         try:
             with self.conn.cursor() as cursor:
                 # cursor.execute('TRUNCATE TABLE "user" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cursor, sql_query, users_data, fetch=True)
-                ids = self._ids_from_result_or_select(cursor, inserted, "user", expected_count=num)
+                ids = self.loader.insert_chunks(cursor, "user", gen.USER_COLUMNS, self._rows(f"user:{role}", gen.users, num, role),
+                                                returning="user_id")
                 self.conn.commit()
                 logging.info(f"Added {num} users")
                 return ids
@@ -397,27 +320,20 @@ class Seeder:
             self.conn.rollback()
             raise
 
-    def _seed_customers(self, users_ids):
+    def _seed_customers(self, users_ids, default_addresses_ids = None):
         if not self.conn:
             return []
-        
-        sql_query = """
-            INSERT INTO "customer"
-                (user_id)
-            VALUES %s
-            RETURNING customer_id;
-        """
-        
-        customers_data: List[Tuple] = []
 
-        for user_id in users_ids:
-            customers_data.append((user_id,))
+        if default_addresses_ids is None:
+            default_addresses_ids = [None] * len(users_ids)
+
+        customers_data = self._rechunk(zip(users_ids, default_addresses_ids))
 
         try:
             with self.conn.cursor() as cursor:
                 # cursor.execute('TRUNCATE TABLE "customer" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cursor, sql_query, customers_data, fetch=True)
-                ids = self._ids_from_result_or_select(cursor, inserted, "customer")
+                ids = self.loader.insert_chunks(cursor, "customer", ("user_id", "default_address_id"), customers_data,
+                                                returning="customer_id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} customers")
                 return ids
@@ -427,254 +343,160 @@ class Seeder:
             self.conn.rollback()
             raise
 
-    def _seed_customer_addresses(self, customer_addresses_data):
-        if not self.conn or not customer_addresses_data:
+    def _seed_customer_addresses(self, customer_addresses_data: Iterable[Tuple]):
+        if not self.conn:
             return 0
 
-        sql_query = 'INSERT INTO "customer_address" (customer_id, address_id) VALUES %s'
-
         try:
             with self.conn.cursor() as cursor:
-                psycopg2.extras.execute_values(cursor, sql_query, customer_addresses_data)
+                inserted = self.loader.insert_chunks(cursor, "customer_address", ("customer_id", "address_id"),
+                                                     self._rechunk(customer_addresses_data))
                 self.conn.commit()
-                logging.info(f"Added {len(customer_addresses_data)} customer addresses")
+                logging.info(f"Added {inserted} customer addresses")
+                return inserted
 
         except Exception as e:
             logging.error(f"Failed to add customer addresses due to: {e}")
             self.conn.rollback()
             raise
 
-    def _assing_default_address_to_customer(self, customer_id, default_address_id, should_log = False):
-        if not self.conn:
-            return
-        
-        sql_query = """
-            UPDATE "customer" c
-            SET default_address_id = %s
-            WHERE c.customer_id = %s
-        """
-
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute(sql_query, (default_address_id, customer_id))
-            self.conn.commit()
-            if should_log: 
-                logging.info(f"Set default address {default_address_id} for customer {customer_id}")
-        except Exception as e:
-            self.conn.rollback()
-            logging.error(f"Failed to set default address for customer {customer_id}: {e}")
-            raise
+    def _pick_addresses(self, users_count: int, addresses_ids: Sequence[int]) -> Tuple[List[List[int]], List[Optional[int]]]:
+        # addresses (and the default one) are picked before the customers exist,
+        # so default_address_id goes in with the customer row instead of a later UPDATE
+        rnd = self._context("customer_address").random
+        users_addresses_ids = []
+        default_addresses_ids = []
+        for _ in range(users_count):
+            unique_addresses_ids = []
+            default_address_id = None
+            if rnd.random() > 0.2:
+                addresses_count = rnd.randint(1, 5)
+                unique_addresses_ids = rnd.sample(addresses_ids, addresses_count)
+
+                if len(unique_addresses_ids) > 0 and rnd.random() > 0.2:
+                    default_address_id = rnd.choice(unique_addresses_ids)
+
+            users_addresses_ids.append(unique_addresses_ids)
+            default_addresses_ids.append(default_address_id)
+        return users_addresses_ids, default_addresses_ids
+
+    def _keep_addresses(self, customers_ids: Sequence[int], users_addresses_ids: Sequence[List[int]]) -> List[int]:
+        customers_with_addresses_ids = []
+        for customer_id, unique_addresses_ids in zip(customers_ids, users_addresses_ids):
+            if unique_addresses_ids:
+                customers_with_addresses_ids.append(customer_id)
+                self.customer_addresses[customer_id] = unique_addresses_ids
+        return customers_with_addresses_ids
 
     def seed_customers_with_addresses(self, num = 1000):
         if not self.conn:
             return []
-        
+
         users_ids = self._seed_users(num)
         addresses_ids = self._seed_addresses(int(num * 3))
-        customers_ids = self._seed_customers(users_ids)
-        
-        customer_addresses_data = []
-        customers_with_addresses_ids = []
-        for customer_id in customers_ids:
-            if random.random() > 0.2:
-                customers_with_addresses_ids.append(customer_id)
-
-                addresses_count = random.randint(1, 5) 
-                unique_addresses_ids = random.sample(addresses_ids, addresses_count)
 
-                for address_id in unique_addresses_ids:
-                    customer_addresses_data.append((
-                        customer_id,
-                        address_id
-                    ))
+        users_addresses_ids, default_addresses_ids = self._pick_addresses(len(users_ids), addresses_ids)
+        customers_ids = self._seed_customers(users_ids, default_addresses_ids)
+        customers_with_addresses_ids = self._keep_addresses(customers_ids, users_addresses_ids)
 
-                if len(unique_addresses_ids) > 0 and random.random() > 0.2:
-                    default_address_id = random.choice(unique_addresses_ids)
-                    self._assing_default_address_to_customer(customer_id=customer_id, default_address_id=default_address_id)
-
-        self._seed_customer_addresses(customer_addresses_data)
+        self._seed_customer_addresses(
+            (customer_id, address_id)
+            for customer_id in customers_with_addresses_ids
+            for address_id in self.customer_addresses[customer_id]
+        )
 
         return customers_with_addresses_ids
-    
-    def _seed_orders_without_items(self, num, customers_ids):
+
+    def _get_customer_addresses(self, customers_ids) -> Dict[int, List[int]]:
         if not self.conn or not customers_ids:
-            return []
+            return {}
 
-        order_statuses = ['accepted', 'in progress', 'awaiting delivery', 'in delivery', 'delivered']
-        orders_data: List[Tuple] = []
-
-        for _ in range(num):
-            vat_rate = round(random.choice([0.05, 0.08, 0.23]), 2)
-            net_total = round(random.uniform(50, 500), 2)
-            vat_total = round(net_total * vat_rate, 2)
-            gross_total = round(net_total + vat_total, 2)
-
-            orders_data.append((
-                random.choice(order_statuses),                               # status
-                vat_rate,                                                    # vat_rate
-                vat_total,                                                   # vat_total
-                net_total,                                                   # net_total
-                gross_total,                                                 # gross_total
-                fake.date_time_between(start_date='-2y', end_date='now'),    # placed_at
-                random.choice(customers_ids)                                 # customer_id
-            ))
+        missing = [cid for cid in set(customers_ids) if cid not in self.customer_addresses]
+        if not missing:
+            return self.customer_addresses
 
+        # same order as the rows were inserted in, so random.choice picks the same address
         sql_query = """
-            INSERT INTO "order"
-                (status, vat_rate, vat_total, net_total, gross_total, placed_at, customer_id)
-            VALUES %s
-            RETURNING order_id, customer_id;
+            SELECT customer_id, address_id
+            FROM "customer_address"
+            WHERE customer_id = ANY(%s)
+            ORDER BY customer_address_id;
         """
 
         try:
             with self.conn.cursor() as cur:
-                cur.execute('TRUNCATE TABLE "order" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cur, sql_query, orders_data, fetch=True)
-                orders_ids = [row[0] for row in inserted]
-                customers_ids = [row[1] for row in inserted]
-                self.conn.commit()
-                logging.info(f"Added {len(orders_ids)} orders")
-                return orders_ids, customers_ids
+                cur.execute(sql_query, (missing,))
+                for customer_id, address_id in cur.fetchall():
+                    self.customer_addresses.setdefault(customer_id, []).append(address_id)
+                return self.customer_addresses
         except Exception as e:
+            logging.error(f"Failed to fetch customer addresses: {e}")
             self.conn.rollback()
-            logging.error(f"Failed to add orders: {e}")
-            raise
+            return self.customer_addresses
 
-    def _get_customer_addresses(self, customer_id):
-        if not self.conn:
-            return []
+    def _ordering_customers(self, customers_with_addresses_ids: Sequence[int], how_much_with_order: float) -> List[int]:
+        num = int(how_much_with_order * len(customers_with_addresses_ids))
+        return self._context("order:customers").random.sample(customers_with_addresses_ids, num)
 
-        sql_query = """
-            SELECT address_id
-            FROM "customer_address"
-            WHERE customer_id = %s;
-        """
+    def seed_orders(self, customers_with_addresses_ids, how_much_with_order = 0.8, min_items = 1, max_items = 15, chunk_size = None,
+                    num: Optional[int] = None, placed_from: Optional[datetime] = None):
+        if not self.conn or not customers_with_addresses_ids:
+            return [], []
 
+        if num is None:
+            customers_with_orders_ids = self._ordering_customers(customers_with_addresses_ids, how_much_with_order)
+            num = len(customers_with_orders_ids)
+        else:
+            # a given number of orders (append mode), placed by any of the customers
+            customers_with_orders_ids = list(customers_with_addresses_ids)
+        customer_addresses = self._get_customer_addresses(customers_with_orders_ids)
+        # only the addresses of the ordering customers go to the generators
+        addresses = {cid: customer_addresses[cid] for cid in set(customers_with_orders_ids) if cid in customer_addresses}
+
+        orders_ids = []
+        order_items_ids = []
         try:
             with self.conn.cursor() as cur:
-                cur.execute(sql_query, (customer_id,))
-                rows = cur.fetchall()
-                return [row[0] for row in rows]
-        except Exception as e:
-            logging.error(f"Failed to fetch addresses for customer {customer_id}: {e}")
-            self.conn.rollback()
-            return []
-
-    def __seed_order_items(self, order_id, items_count, user_addresses, should_log = False):
-        if not self.conn or not order_id or not user_addresses or len(user_addresses) <= 0 or items_count <= 0:
-            return []
+                self._reset_table(cur, "order")
+                for index, orders in enumerate(self._rows("order", gen.orders, num, customers_with_orders_ids, placed_from)):
+                    # the order ids are reserved before the orders are loaded, so the
+                    # items of the chunk are generated while the orders go in
+                    ids = self.loader.reserve_ids(cur, "order", "order_id", len(orders))
+                    items = self._rows_per_parent(f"order_item:{index}", gen.order_items,
+                                                  [(oid, row[6]) for oid, row in zip(ids, orders)], max_items,
+                                                  addresses, min_items, max_items)
+                    # an explicit chunk_size also commits after every chunk
+                    if chunk_size:
+                        items = self._rechunk((row for rows in items for row in rows), chunk_size)
+
+                    self.loader.insert(cur, "order", ("order_id",) + gen.ORDER_COLUMNS, [(oid,) + row for oid, row in zip(ids, orders)])
+                    orders_ids.extend(ids)
+                    order_items_ids.extend(self.loader.insert_chunks(cur, "order_item", gen.ORDER_ITEM_COLUMNS, items,
+                                                                     returning="order_item_id"))
+                    if chunk_size:
+                        self.conn.commit()
 
-        sql_query = """
-            INSERT INTO order_item 
-                (expected_delivery_at, order_id, delivery_address)
-            VALUES %s
-            RETURNING order_item_id;
-        """
-
-        order_items_data = []
-        for _ in range(items_count):
-            order_items_data.append((
-                fake.date_between(start_date="+1d", end_date="+30d"),
-                order_id,
-                random.choice(user_addresses),
-            ))
-      
-        try:
-            with self.conn.cursor() as cursor:
-                inserted = psycopg2.extras.execute_values(cursor, sql_query, order_items_data, fetch = True)
-                order_items_ids =  [row[0] for row in inserted]
                 self.conn.commit()
-                if should_log:
-                    logging.info(f"Added {len(order_items_data)} order items")
-                return order_items_ids
-
+                logging.info(f"Added {len(orders_ids)} orders and {len(order_items_ids)} order items")
+                return orders_ids, order_items_ids
         except Exception as e:
-            logging.error(f"Failed to add  order items due to: {e}")
             self.conn.rollback()
+            logging.error(f"Failed to add orders: {e}")
             raise
 
-    def seed_orders(self, customers_with_addresses_ids, how_much_with_order = 0.8, min_items = 1, max_items = 15):
-        num = int(how_much_with_order * len(customers_with_addresses_ids))
-        customers_with_orders_ids = random.sample(customers_with_addresses_ids, num)
-        orders_ids, customers_ids = self._seed_orders_without_items(num, customers_with_orders_ids)
-
-        order_items_ids = []
-        for order_id, customer_id in zip(orders_ids, customers_ids):
-            items_count = random.randint(min_items, max_items)
-
-            user_addresses = self._get_customer_addresses(customer_id)
-
-            order_items_ids.extend(self.__seed_order_items(order_id, items_count, user_addresses))
-
-        return orders_ids, order_items_ids
- 
-    def _generate_pl_nip(self, with_prefix: bool = False) -> str:
-        weights = [6, 5, 7, 2, 3, 4, 5, 6, 7]
-        while True:
-            digits = [random.randint(0, 9) for _ in range(9)]
-            checksum = sum(w * d for w, d in zip(weights, digits)) % 11
-            if checksum == 10:
-                continue 
-            nip_digits = digits + [checksum]
-            nip_str = ''.join(str(d) for d in nip_digits)
-            return f"PL{nip_str}" if with_prefix else nip_str
-
     def seed_invoices(self, orders_ids, invoice_rate = 0.5):
         if not self.conn or not orders_ids or len(orders_ids) <= 0:
             return []
-        
-        invoices_count = int(len(orders_ids) * invoice_rate)
-        orders_with_invoices_ids = random.sample(orders_ids, invoices_count)
-
-        sql_query = """
-        INSERT INTO invoice 
-            (invoice_number, status, seller_name, seller_vat_id, buyer_name, buyer_vat_id, currency, payment_method, payment_terms,
-            sale_date, payment_date, issue_date, vat_rate, net_total, vat_total, gross_total, order_id)
-        VALUES %s
-        """
-
-        invoices_data = []
-        for order_id in orders_with_invoices_ids:
-            net_total = round(random.uniform(50, 1000), 2)
-            vat_rate = round(random.choice([0.05, 0.08, 0.23]), 4)
-            vat_total = round(net_total * vat_rate, 2)
-            gross_total = round(net_total + vat_total, 2)
-            
-            sale_date = fake.date_between(start_date='-30d', end_date='today')
-            issue_date = fake.date_between(start_date=sale_date, end_date='today')
 
-            status = random.choice(['issued', 'pending payment', 'paid', 'cancelled'])
+        orders_with_invoices_ids = self._context("invoice:orders").random.sample(orders_ids, int(len(orders_ids) * invoice_rate))
 
-            if status == 'paid':
-                payment_date = fake.date_between(start_date=issue_date, end_date='today')
-            else:
-                payment_date = fake.date_between(start_date=issue_date, end_date=issue_date + timedelta(days=30))
-            
-            invoices_data.append((
-                fake.unique.bothify(text='INV-#####'),          # invoice_number
-                status,                                         # status
-                fake.company(),                                 # seller_name
-                self._generate_pl_nip(),                        # seller_vat_id (NIP)
-                fake.name(),                                    # buyer_name
-                self._generate_pl_nip(),                        # buyer_vat_id
-                random.choice(['USD', 'EUR', 'PLN']),           # currency
-                random.choice(['cash', 'card', 'transfer']),    # payment_method
-                f"{random.randint(7, 30)} days",                # payment_terms
-                sale_date,                                      # sale_date
-                payment_date,                                   # payment_date
-                issue_date,                                     # issue_date
-                vat_rate,                                       # vat_rate
-                net_total,                                      # net_total
-                vat_total,                                      # vat_total
-                gross_total,                                    # gross_total
-                order_id                                        # order_id (assuming existing orders)
-            ))
+        invoices_data = self._generate("invoice", gen.invoices, slice_parts(orders_with_invoices_ids, self.chunk_size))
 
         try:
             with self.conn.cursor() as cursor:
-                psycopg2.extras.execute_values(cursor, sql_query, invoices_data)
+                inserted = self.loader.insert_chunks(cursor, "invoice", gen.INVOICE_COLUMNS, invoices_data)
                 self.conn.commit()
-                logging.info(f"Added {len(invoices_data)} invoices")
+                logging.info(f"Added {inserted} invoices")
 
         except Exception as e:
             logging.error(f"Failed to add invoices due to: {e}")
@@ -688,21 +510,14 @@ class Seeder:
             return []
 
         if category_names is None:
-            category_names = [
-                'Śniadanie', 'Drugie Śniadanie', 'Lunch', 'Obiad', 'Podwieczorek', 'Kolacja',
-                'Deser', 'Na słodko', 'Na słono', 'Wegetariańskie', 'Wegańskie', 'Wysokoproteinowe',
-                'Bez laktozy', 'Bez glutenu', 'Insulinooporność', 'FIT', 'Włoskie', 'Azjatyckie', 
-                'Tajskie', 'Tradycyjne'
-            ]
-
-        category_data = [(name, fake.sentence(nb_words=8)) for name in category_names]
-        
-        sql = 'INSERT INTO "category" (name, description) VALUES %s RETURNING id;'
+            category_names = CATEGORY_NAMES
+
+        category_data = gen.described(self._context("category"), category_names)
+
         try:
             with self.conn.cursor() as cur:
-                cur.execute('TRUNCATE TABLE "category" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cur, sql, category_data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'category', expected_count=len(category_names))
+                self._reset_table(cur, "category")
+                ids = self.loader.insert(cur, "category", ("name", "description"), category_data, returning="id")
                 self.conn.commit()
                 logging.info(f"Added {str(len(category_data))} categories")
                 return ids
@@ -714,22 +529,14 @@ class Seeder:
     def seed_course_category_relations(self, course_ids: Sequence[int], category_ids: Sequence[int], min_per_course: int = 0, max_per_course: int = 8) -> int:
         if not self.conn or not course_ids or not category_ids:
             return 0
-        
-        relations = set()
-        for course in course_ids:
-            k = random.randint(min_per_course, max_per_course)
-            chosen = random.sample(category_ids, k=min(k, len(category_ids)))
-            for category in chosen:
-                relations.add((course, category))
-        sql = 'INSERT INTO "course_category" (course_id, category_id) VALUES %s'
+
+        relations = self._rows_per_parent("course_category", gen.children, course_ids, max_per_course,
+                                          category_ids, min_per_course, max_per_course)
         try:
             with self.conn.cursor() as cur:
-                inserted = 0
-                if relations:
-                    psycopg2.extras.execute_values(cur, sql, list(relations))
-                    inserted = cur.rowcount
+                inserted = self.loader.insert_chunks(cur, "course_category", ("course_id", "category_id"), relations)
                 self.conn.commit()
-                logging.info(f"Added {str(len(relations))} course-category relations")
+                logging.info(f"Added {str(inserted)} course-category relations")
                 return inserted
         except Exception as e:
             self.conn.rollback()
@@ -740,26 +547,18 @@ class Seeder:
         if not self.conn:
             return []
 
-        user_ids = self._seed_users(num)
+        user_ids = self._seed_users(num, role="dietician")
         if not user_ids:
             return []
-        
+
         if not certification_names:
-            certification_names = [
-                'Certyfikat', 'Studia wyższe', 'Ukonczony kurs', 'Praktyka własna', 'Certyfikacja kliniczna', 
-                'Holistyczny coach', 'Zarejstrowany dietetyk', 'Dietetyk dzieci'
-            ]
-        
+            certification_names = CERTIFICATION_NAMES
+
+        data = self._generate("dietician", gen.dieticians, slice_parts(user_ids, self.chunk_size), certification_names)
+
         try:
             with self.conn.cursor() as cur:
-                data = [
-                    (uid,  f"{random.choice(certification_names)} w {fake.city()}") 
-                    for uid in user_ids
-                ]
-                
-                sql = 'INSERT INTO "dietician" (id, certification) VALUES %s RETURNING id;'
-                inserted = psycopg2.extras.execute_values(cur, sql, data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'dietician', expected_count=len(user_ids))
+                ids = self.loader.insert_chunks(cur, "dietician", gen.DIETICIAN_COLUMNS, data, returning="id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} dieticians")
                 return ids
@@ -771,19 +570,12 @@ class Seeder:
     def seed_meal_plans(self, num: int = 50, dietician_ids: Optional[Sequence[int]] = None, probability: float = 0.2) -> List[int]:
         if not self.conn:
             return []
-        
-        meal_plan_data = []
-        for _ in range(num):
-            start = fake.date_between(start_date='-90d', end_date='+30d')
-            end = fake.date_between(start_date=start, end_date=start + timedelta(days=30))
-            diet_id = random.choice(dietician_ids) if dietician_ids and random.random() > probability else None
-            meal_plan_data.append((fake.word().capitalize() + ' plan', start, end, fake.sentence(nb_words=8), diet_id))
-
-        sql = 'INSERT INTO "meal_plan" (name, start_date, end_date, description, dietician_id) VALUES %s RETURNING id;'
+
         try:
             with self.conn.cursor() as cur:
-                inserted = psycopg2.extras.execute_values(cur, sql, meal_plan_data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'meal_plan', expected_count=num)
+                ids = self.loader.insert_chunks(cur, "meal_plan", gen.MEAL_PLAN_COLUMNS,
+                                                self._rows("meal_plan", gen.meal_plans, num, dietician_ids, probability),
+                                                returning="id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} meal plans")
                 return ids
@@ -800,26 +592,19 @@ class Seeder:
             total_days = 0
             total_items = 0
             with self.conn.cursor() as cur:
-                for mp_id in meal_plan_ids:
-                    days = random.randint(min_days, max_days)
-                    days_data = [(i + 1, mp_id) for i in range(days)]
-                    if days_data:
-                        sql_days = 'INSERT INTO "meal_plan_day" (day_number, meal_plan_id) VALUES %s RETURNING meal_plan_day_id;'
-                        inserted_days = psycopg2.extras.execute_values(cur, sql_days, days_data, fetch=True)
-                        day_ids = self._ids_from_result_or_select(cur, inserted_days, 'meal_plan_day', expected_count=days)
-                        total_days += len(day_ids)
-
-                        items_data = []
-                        for day_id in day_ids:
-                            k = random.randint(min_items, max_items)
-                            chosen = random.sample(course_ids, k=min(k, len(course_ids)))
-                            for seq, course_id in enumerate(chosen, start=1):
-                                items_data.append((course_id, day_id, seq))
-
-                        if items_data:
-                            sql_items = 'INSERT INTO "meal_plan_item" (course_id, meal_plan_day_id, sequence) VALUES %s'
-                            psycopg2.extras.execute_values(cur, sql_items, items_data)
-                            total_items += len(items_data)
+                # day ids are reserved up front, so the items of a chunk are
+                # generated from them while the days themselves are loaded
+                days_chunks = self._rows_per_parent("meal_plan_day", gen.meal_plan_days, meal_plan_ids, max_days,
+                                                    min_days, max_days)
+                for index, days in enumerate(days_chunks):
+                    day_ids = self.loader.reserve_ids(cur, "meal_plan_day", "meal_plan_day_id", len(days))
+                    items = self._rows_per_parent(f"meal_plan_item:{index}", gen.sequenced_items, day_ids, max_items,
+                                                  course_ids, min_items, max_items, False)
+                    self.loader.insert(cur, "meal_plan_day", ("meal_plan_day_id",) + gen.MEAL_PLAN_DAY_COLUMNS,
+                                       [(day_id,) + row for day_id, row in zip(day_ids, days)])
+                    total_days += len(day_ids)
+                    total_items += self.loader.insert_chunks(cur, "meal_plan_item", ("course_id", "meal_plan_day_id", "sequence"),
+                                                             items)
 
                 self.conn.commit()
             logging.info(f"Added {total_days} meal plan days and {total_items} items")
@@ -830,36 +615,36 @@ class Seeder:
             raise
 
 
+    def _menu_days(self, num_menus: int) -> Tuple[date, List[int]]:
+        # a bit over half of the menus lie in the past; the window slides forward when it would start before year 1
+        first_day = clamped_day(self.now.date(), -int(num_menus / 1.2))
+        last_day = clamped_day(first_day, int(num_menus / 1.2) + int(num_menus / 1.4))
+        # menu_date is unique, so distinct days are drawn before the menus are split into chunks
+        return first_day, distinct_days(self._context("daily_menu:dates").rng, first_day, last_day, num_menus)
+
     def seed_daily_menus_and_items(self,  course_ids: Sequence[int], dietician_ids: Sequence[int], min_items: int = 3, max_items: int = 6, num_menus: int = 1000) -> List[int]:
         if not self.conn or not course_ids or not dietician_ids:
             return []
+
+        first_day, day_offsets = self._menu_days(num_menus)
+
         try:
             with self.conn.cursor() as cur:
-                start_date = datetime.now() - timedelta(days=num_menus/1.2)
-                end_date = datetime.now() + timedelta(days=num_menus/1.4)
-                menu_dates = [fake.unique.date_between(start_date=start_date, end_date=end_date) for _ in range(num_menus)]
-                
-                menus_data = []
-                for d in menu_dates:
-                    diet_id = random.choice(dietician_ids)
-                    menus_data.append((diet_id, d))
-                sql = 'INSERT INTO "daily_menu" (dietician_id, menu_date) VALUES %s RETURNING daily_menu_id;'
-                inserted = psycopg2.extras.execute_values(cur, sql, menus_data, fetch=True)
-                menu_ids = self._ids_from_result_or_select(cur, inserted, 'daily_menu', expected_count=num_menus)
-
-                items_data = []
-                for m_id in menu_ids:
-                    k = random.randint(min_items, max_items)
-                    chosen = random.sample(course_ids, k=min(k, len(course_ids)))
-                    for seq, course_id in enumerate(chosen, start=1):
-                        items_data.append((m_id, course_id, seq))
-
-                if items_data:
-                    sql_items = 'INSERT INTO "daily_menu_item" (menu_id, course_id, sequence) VALUES %s'
-                    psycopg2.extras.execute_values(cur, sql_items, items_data)
+                menu_ids = []
+                items_count = 0
+                menus_chunks = self._generate("daily_menu", gen.daily_menus, slice_parts(day_offsets, self.chunk_size),
+                                              first_day, dietician_ids)
+                for index, menus in enumerate(menus_chunks):
+                    chunk_ids = self.loader.reserve_ids(cur, "daily_menu", "daily_menu_id", len(menus))
+                    items = self._rows_per_parent(f"daily_menu_item:{index}", gen.sequenced_items, chunk_ids, max_items,
+                                                  course_ids, min_items, max_items)
+                    self.loader.insert(cur, "daily_menu", ("daily_menu_id",) + gen.DAILY_MENU_COLUMNS,
+                                       [(menu_id,) + row for menu_id, row in zip(chunk_ids, menus)])
+                    menu_ids.extend(chunk_ids)
+                    items_count += self.loader.insert_chunks(cur, "daily_menu_item", ("menu_id", "course_id", "sequence"), items)
 
                 self.conn.commit()
-                logging.info(f"Added {len(menu_ids)} daily menus and {len(items_data)} items")
+                logging.info(f"Added {len(menu_ids)} daily menus and {items_count} items")
                 return menu_ids
         except Exception as e:
             self.conn.rollback()
@@ -869,20 +654,13 @@ class Seeder:
     def seed_course_in_order_item(self, order_item_ids: Sequence[int], course_item_ids: Sequence[int], min_per_item: int = 1, max_per_item: int = 8) -> List[int]:
         if not self.conn or not order_item_ids or not course_item_ids:
             return []
-        
-        relations = set()
-        for order in order_item_ids:
-            k = random.randint(min_per_item, max_per_item)
-            chosen = random.sample(course_item_ids, k=min(k, len(course_item_ids)))
-            for dish in chosen:
-                relations.add((dish, order))
-        sql = 'INSERT INTO "course_in_order_item" (course_id, order_item_id) VALUES %s RETURNING id'
+
+        relations = self._rows_per_parent("course_in_order_item", gen.children, order_item_ids, max_per_item,
+                                          course_item_ids, min_per_item, max_per_item, True)
         try:
             with self.conn.cursor() as cur:
-                course_in_order_ids = []
-                if relations:
-                    inserted = psycopg2.extras.execute_values(cur, sql, list(relations), fetch=True)
-                    course_in_order_ids = self._ids_from_result_or_select(cur, inserted, 'course_in_order_item')
+                course_in_order_ids = self.loader.insert_chunks(cur, "course_in_order_item", ("course_id", "order_item_id"),
+                                                                relations, returning="id")
                 self.conn.commit()
                 logging.info(f"Added {str(len(course_in_order_ids))} course in order relations")
                 return course_in_order_ids
@@ -892,77 +670,33 @@ class Seeder:
             raise
 
 
+    def _complained_items(self, course_in_order_items_ids: Sequence[int], probability: float) -> List[int]:
+        # POPRAWIONA LINIA: zmieniono '>' na '<', aby generować skargi z małym prawdopodobieństwem
+        chosen = self._context("complaint:selected").rng.random(len(course_in_order_items_ids)) < probability
+        return [cid for cid, keep in zip(course_in_order_items_ids, chosen.tolist()) if keep]
+
     def seed_complaints(self, course_in_order_items_ids: Sequence[int], probability: float = 0.01) -> int:
         if not self.conn or not course_in_order_items_ids:
             return 0
+
+        selected_ids = self._complained_items(course_in_order_items_ids, probability)
+        if not selected_ids:
+            logging.info("No complaints were generated based on the probability.")
+            return 0
+
+        sql = COMPLAINT_SOURCES_SQL
+
         try:
-            complaints_inserted = 0
             with self.conn.cursor() as cur:
-                complaints = []
-                
-                # POPRAWIONA LINIA: zmieniono '>' na '<', aby generować skargi z małym prawdopodobieństwem
-                selected_ids = [cid for cid in course_in_order_items_ids if random.random() < probability]
-                if not selected_ids:
-                    logging.info("No complaints were generated based on the probability.")
-                    return 0
-
-                # Zapytanie SQL może zwracać mniej wierszy niż jest w `selected_ids`, jeśli dane są niespójne
-                sql = '''
-                    SELECT cioi.id, C.customer_id, o.placed_at
-                    FROM "course_in_order_item" AS cioi
-                    JOIN "order_item" oi ON cioi.order_item_id = oi.order_item_id
-                    JOIN "order" o ON oi.order_id = o.order_id
-                    JOIN "customer" c ON o.customer_id = c.customer_id
-                    WHERE cioi.id = ANY(%s);
-                '''
-                cur.execute(sql, (selected_ids,))
-                mapping = {row[0]: (row[1], row[2]) for row in cur.fetchall()}              
-                
-                for cio_id in selected_ids:
-                    if cio_id not in mapping:
-                        continue # Pomiń, jeśli nie znaleziono dopasowania w bazie danych
-                    
-                    cust_id, order_date = mapping[cio_id]
-                    
-                    date = fake.date_time_between(
-                        start_date=order_date,
-                        end_date=order_date + timedelta(days=random.randint(1, 14))
-                    )
-                    status = random.choice([
-                        'submitted',
-                        'under review',
-                        'positively resolved',
-                        'negatively resolved'
-                    ])
-                    desc = fake.sentence(nb_words=12)
-                    refund = None
-                    
-                    resolution_date = None
-                    if status in ('positively resolved', 'negatively resolved'):
-                        resolution_date = fake.date_time_between(
-                            start_date=date + timedelta(seconds=1), 
-                            end_date=date + timedelta(days=random.randint(1, 64))
-                        )
-                        if status == 'positively resolved':
-                            refund = round(random.uniform(0, 1000), 2)
-
-                    complaints.append((
-                        cust_id,
-                        cio_id,
-                        date, 
-                        status,
-                        desc,
-                        refund,
-                        resolution_date
-                    ))
-
-                if complaints:
-                    sql_complaint = '''
-                        INSERT INTO "complaint" (customer_id, course_in_order_id, date, status, description, refund_amount, resolution_date)
-                        VALUES %s;
-                    '''
-                    psycopg2.extras.execute_values(cur, sql_complaint, complaints)
-                    complaints_inserted = len(complaints)
+                def parts() -> Iterator[Tuple[int, List[Tuple]]]:
+                    for start, ids in slice_parts(selected_ids, self.chunk_size):
+                        cur.execute(sql, (list(ids),))
+                        mapping = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+                        # Pomiń, jeśli nie znaleziono dopasowania w bazie danych
+                        yield start, [(cio_id,) + mapping[cio_id] for cio_id in ids if cio_id in mapping]
+
+                complaints_inserted = self.loader.insert_chunks(cur, "complaint", gen.COMPLAINT_COLUMNS,
+                                                                self._generate("complaint", gen.complaints, parts()))
 
                 self.conn.commit()
                 logging.info(f"Added {complaints_inserted} complaints")
@@ -972,22 +706,20 @@ class Seeder:
             self.conn.rollback()
             logging.error(f"Failed to add complaints: {e}")
             raise
-  
+
     # ===== MARIUSZ =====
     def seed_cooks(self, num: int = 50) -> List[int]:
         if not self.conn:
             return []
-        
-        user_ids = self._seed_users(num)
+
+        user_ids = self._seed_users(num, role="cook")
         if not user_ids:
             return []
-        cook_data = [(uid,) for uid in user_ids]
-        sql = 'INSERT INTO "cook" (cook_id) VALUES %s RETURNING cook_id;'
-        
+        cook_data = self._rechunk((uid,) for uid in user_ids)
+
         try:
             with self.conn.cursor() as cur:
-                inserted = psycopg2.extras.execute_values(cur, sql, cook_data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'cook', expected_count=len(user_ids))
+                ids = self.loader.insert_chunks(cur, "cook", ("cook_id",), cook_data, returning="cook_id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} cooks")
                 return ids
@@ -999,15 +731,13 @@ class Seeder:
     def seed_couriers(self, num: int = 50) -> List[int]:
         if not self.conn:
             return []
-        user_ids = self._seed_users(num)
+        user_ids = self._seed_users(num, role="courier")
         if not user_ids:
             return []
-        courier_data = [(uid,) for uid in user_ids]
-        sql = 'INSERT INTO "courier" (courier_id) VALUES %s RETURNING courier_id;'
+        courier_data = self._rechunk((uid,) for uid in user_ids)
         try:
             with self.conn.cursor() as cur:
-                inserted = psycopg2.extras.execute_values(cur, sql, courier_data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'courier', expected_count=len(user_ids))
+                ids = self.loader.insert_chunks(cur, "courier", ("courier_id",), courier_data, returning="courier_id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} couriers")
                 return ids
@@ -1019,18 +749,16 @@ class Seeder:
     def seed_courier_types(self, type_names: Optional[Sequence[str]] = None) -> List[int]:
         if not self.conn:
             return []
-        
+
         if type_names is None:
-            type_names = ['Rower', 'Hulajnoga', 'Motor', 'Samochód', 'Pieszo']
+            type_names = COURIER_TYPE_NAMES
 
         data = [(name,) for name in type_names]
-        sql = 'INSERT INTO "courier_type" (name) VALUES %s RETURNING courier_type_id;'
-        
+
         try:
             with self.conn.cursor() as cur:
-                cur.execute('TRUNCATE TABLE "courier_type" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cur, sql, data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'courier_type', expected_count=len(type_names))
+                self._reset_table(cur, "courier_type")
+                ids = self.loader.insert(cur, "courier_type", ("name",), data, returning="courier_type_id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} courier types")
                 return ids
@@ -1044,16 +772,14 @@ class Seeder:
             return []
 
         if specialty_names is None:
-            specialty_names = ['Włoska', 'Azjatycka', 'Meksykańska', 'Polska', 'Wege', 'Desery']
-        
+            specialty_names = SPECIALTY_NAMES
+
         data = [(name,) for name in specialty_names]
-        sql = 'INSERT INTO "specialty" (name) VALUES %s RETURNING id;'
-        
+
         try:
             with self.conn.cursor() as cur:
-                cur.execute('TRUNCATE TABLE "specialty" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cur, sql, data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'specialty', expected_count=len(specialty_names))
+                self._reset_table(cur, "specialty")
+                ids = self.loader.insert(cur, "specialty", ("name",), data, returning="id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} specialties")
                 return ids
@@ -1066,20 +792,12 @@ class Seeder:
         if not self.conn or not courier_ids or not type_ids:
             return 0
 
-        relations = set()
-        for courier_id in courier_ids:
-            k = random.randint(min_types, max_types)
-            chosen_types = random.sample(type_ids, k=min(k, len(type_ids)))
-            for type_id in chosen_types:
-                relations.add((courier_id, type_id))
+        relations = self._rows_per_parent("courier_types", gen.children, courier_ids, max_types,
+                                          type_ids, min_types, max_types)
 
-        sql = 'INSERT INTO "courier_types" (courier_id, courier_type_id) VALUES %s'
         try:
             with self.conn.cursor() as cur:
-                inserted_count = 0
-                if relations:
-                    psycopg2.extras.execute_values(cur, sql, list(relations))
-                    inserted_count = cur.rowcount
+                inserted_count = self.loader.insert_chunks(cur, "courier_types", ("courier_id", "courier_type_id"), relations)
                 self.conn.commit()
                 logging.info(f"Added {inserted_count} courier-type relations")
                 return inserted_count
@@ -1092,20 +810,12 @@ class Seeder:
         if not self.conn or not cook_ids or not specialty_ids:
             return 0
 
-        relations = set()
-        for cook_id in cook_ids:
-            k = random.randint(min_specialties, max_specialties)
-            chosen_specialties = random.sample(specialty_ids, k=min(k, len(specialty_ids)))
-            for specialty_id in chosen_specialties:
-                relations.add((specialty_id, cook_id))
+        relations = self._rows_per_parent("cook_speciality", gen.children, cook_ids, max_specialties,
+                                          specialty_ids, min_specialties, max_specialties, True)
 
-        sql = 'INSERT INTO "cook_speciality" (specialty_id, cook_id) VALUES %s'
         try:
             with self.conn.cursor() as cur:
-                inserted_count = 0
-                if relations:
-                    psycopg2.extras.execute_values(cur, sql, list(relations))
-                    inserted_count = cur.rowcount
+                inserted_count = self.loader.insert_chunks(cur, "cook_speciality", ("specialty_id", "cook_id"), relations)
                 self.conn.commit()
                 logging.info(f"Added {inserted_count} cook-specialty relations")
                 return inserted_count
@@ -1117,19 +827,14 @@ class Seeder:
     def seed_administrators(self, num: int = 5) -> List[int]:
         if not self.conn:
             return []
-        user_ids = self._seed_users(num)
+        user_ids = self._seed_users(num, role="admin")
         if not user_ids:
             return []
-        admin_data = []
-        for uid in user_ids:
-            date_granted = fake.date_between(start_date='-5y', end_date='-30d')
-            date_revoked = fake.date_between(start_date=date_granted, end_date='today') if random.random() < 0.1 else None
-            admin_data.append((uid, date_granted, date_revoked))
-        sql = 'INSERT INTO "administrator" (user_id, date_granted, date_revoked) VALUES %s RETURNING user_id;'
+        admin_data = self._generate("administrator", gen.administrators, slice_parts(user_ids, self.chunk_size))
         try:
             with self.conn.cursor() as cur:
-                inserted = psycopg2.extras.execute_values(cur, sql, admin_data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'administrator', expected_count=len(user_ids))
+                ids = self.loader.insert_chunks(cur, "administrator", gen.ADMINISTRATOR_COLUMNS,
+                                                admin_data, returning="user_id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} administrators")
                 return ids
@@ -1141,14 +846,11 @@ class Seeder:
     def seed_fulfillment_statuses(self) -> List[int]:
         if not self.conn:
             return []
-        status_names = ['Pending', 'In Preparation', 'Ready for Delivery', 'Cancelled']
-        data = [(name,) for name in status_names]
-        sql = 'INSERT INTO "order_item_fulfillment_status" (name) VALUES %s RETURNING id;'
+        data = [(name,) for name in FULFILLMENT_STATUS_NAMES]
         try:
             with self.conn.cursor() as cur:
-                cur.execute('TRUNCATE TABLE "order_item_fulfillment_status" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cur, sql, data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'order_item_fulfillment_status', expected_count=len(status_names))
+                self._reset_table(cur, "order_item_fulfillment_status")
+                ids = self.loader.insert(cur, "order_item_fulfillment_status", ("name",), data, returning="id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} fulfillment statuses")
                 return ids
@@ -1160,14 +862,11 @@ class Seeder:
     def seed_delivery_statuses(self) -> List[int]:
         if not self.conn:
             return []
-        status_names = ['Pending Pickup', 'Picked Up', 'En Route', 'Delivered', 'Failed Delivery']
-        data = [(name,) for name in status_names]
-        sql = 'INSERT INTO "order_item_delivery_status" (name) VALUES %s RETURNING id;'
+        data = [(name,) for name in DELIVERY_STATUS_NAMES]
         try:
             with self.conn.cursor() as cur:
-                cur.execute('TRUNCATE TABLE "order_item_delivery_status" RESTART IDENTITY CASCADE;')
-                inserted = psycopg2.extras.execute_values(cur, sql, data, fetch=True)
-                ids = self._ids_from_result_or_select(cur, inserted, 'order_item_delivery_status', expected_count=len(status_names))
+                self._reset_table(cur, "order_item_delivery_status")
+                ids = self.loader.insert(cur, "order_item_delivery_status", ("name",), data, returning="id")
                 self.conn.commit()
                 logging.info(f"Added {len(ids)} delivery statuses")
                 return ids
@@ -1179,62 +878,15 @@ class Seeder:
     def seed_order_item_fulfillment_and_delivery(self, order_item_ids: Sequence[int], cook_ids: Sequence[int], courier_ids: Sequence[int], fulfillment_status_ids: Sequence[int], delivery_status_ids: Sequence[int]) -> Tuple[int, int]:
         if not self.conn or not order_item_ids:
             return 0, 0
-        fulfillment_data = []
-        delivery_data = []
-        status_map_fulfillment = {
-            'Pending': 1, 'In Preparation': 2, 'Ready for Delivery': 3, 'Cancelled': 4
-        }
-        status_map_delivery = {
-            'Pending Pickup': 1, 'Picked Up': 2, 'En Route': 3, 'Delivered': 4, 'Failed Delivery': 5
-        }
-        for item_id in order_item_ids:
-            cook_id = random.choice(cook_ids) if cook_ids else None
-            current_fulfillment_status = random.choice(list(status_map_fulfillment.keys()))
-            f_status_id = status_map_fulfillment[current_fulfillment_status]
-            began_at = fake.date_time_between(start_date='-7d', end_date='now')
-            completed_at = None
-            if current_fulfillment_status in ['Ready for Delivery', 'Cancelled']:
-                completed_at = fake.date_time_between(start_date=began_at, end_date='now')
-
-            last_updated_at = completed_at if completed_at else began_at
-            fulfillment_data.append((
-                cook_id, item_id, f_status_id, began_at, completed_at, last_updated_at, fake.word() if random.random() < 0.1 else None
-            ))
-            if current_fulfillment_status == 'Ready for Delivery':
-                courier_id = random.choice(courier_ids) if courier_ids else None
-                current_delivery_status = random.choice(list(status_map_delivery.keys()))
-                d_status_id = status_map_delivery[current_delivery_status]
-
-                began_at = fake.date_time_between(start_date='-7d', end_date='now')
-                completed_at = None
-                if current_fulfillment_status in ['Ready for Delivery', 'Cancelled']:
-                    # Ensure completed_at is after began_at, if it's generated
-                    completed_at = fake.date_time_between(start_date=began_at + timedelta(seconds=1), end_date='now')
-
-                last_updated_at = completed_at if completed_at else began_at
-
-
-                delivery_data.append((
-                    courier_id, item_id, d_status_id, began_at, completed_at, last_updated_at, fake.word() if random.random() < 0.1 else None
-                ))
-        sql_fulfillment = """
-            INSERT INTO "order_item_fulfillment" (cook_id, order_item_id, status_id, began_at, completed_at, last_updated_at, notes)
-            VALUES %s
-        """
-        sql_delivery = """
-            INSERT INTO "order_item_delivery" (courier_id, order_item_id, status_id, began_at, delivered_at, last_updated, notes)
-            VALUES %s
-        """
         try:
+            f_count = 0
+            d_count = 0
             with self.conn.cursor() as cur:
-                f_count = 0
-                if fulfillment_data:
-                    psycopg2.extras.execute_values(cur, sql_fulfillment, fulfillment_data)
-                    f_count = cur.rowcount
-                d_count = 0
-                if delivery_data:
-                    psycopg2.extras.execute_values(cur, sql_delivery, delivery_data)
-                    d_count = cur.rowcount
+                chunks = self._generate("order_item_fulfillment", gen.fulfillment_and_delivery,
+                                        slice_parts(order_item_ids, self.chunk_size), cook_ids, courier_ids)
+                for fulfillment_data, delivery_data in chunks:
+                    f_count += self.loader.insert(cur, "order_item_fulfillment", gen.FULFILLMENT_COLUMNS, fulfillment_data)
+                    d_count += self.loader.insert(cur, "order_item_delivery", gen.DELIVERY_COLUMNS, delivery_data)
                 self.conn.commit()
                 logging.info(f"Added {f_count} fulfillment records and {d_count} delivery records")
                 return f_count, d_count
@@ -1242,7 +894,7 @@ class Seeder:
             self.conn.rollback()
             logging.error(f"Failed to seed fulfillment/delivery: {e}")
             raise
-            
+
     def get_order_item_ids(self) -> List[int]:
         if not self.conn:
             return []
@@ -1261,75 +913,328 @@ class Seeder:
 
 
 
-def main():
-    conn = get_db_connection()
-    if not conn:
-        print("Brak połączenia z bazą danych.")
-        return
+def build_seed_steps(sizes: Optional[Dict[str, int]] = None) -> List[Step]:
+    sizes = sizes or dataset_sizes()
+    # user ids come from one shared sequence, so the steps that add users run one
+    # after another (customer -> dietician -> cook -> courier -> administrator);
+    # that keeps the ids, and with them the whole dataset, the same for a given seed
+    return [
+        # Tomek
+        Step("course", lambda s, r: s.seed_courses(sizes["course"])),
+        Step("ingredient", lambda s, r: s.seed_ingredients(sizes["ingredient"])),
+        Step("course_ingredient", lambda s, r: s.seed_course_ingredient_relations(r["course"], r["ingredient"]),
+             requires=("course", "ingredient")),
+        Step("allergen", lambda s, r: s.seed_allergens()),
+        Step("allergen_ingredient", lambda s, r: s.seed_allergen_ingredient_relations(r["ingredient"], r["allergen"]),
+             requires=("ingredient", "allergen")),
 
-    seeder = Seeder(conn)
+        # Bartosh
+        Step("customer", lambda s, r: s.seed_customers_with_addresses(sizes["customer"])),
+        Step("order", lambda s, r: s.seed_orders(customers_with_addresses_ids=r["customer"]), requires=("customer",)),
+        Step("invoice", lambda s, r: s.seed_invoices(orders_ids=r["order"][0]), requires=("order",)),
+        Step("preference", lambda s, r: s.seed_preferences(r["customer"], r["ingredient"]),
+             requires=("customer", "ingredient")),
+        Step("opinion", lambda s, r: s.seed_opinions(r["customer"], r["course"], num=sizes["opinion"]),
+             requires=("customer", "course")),
 
-    #coment it if script doesn't work
-    seeder.truncate_all() # it doesn't work for me
+        # Ola
+        Step("course_in_order_item", lambda s, r: s.seed_course_in_order_item(r["order"][1], r["course"]),
+             requires=("order", "course")),
+        Step("category", lambda s, r: s.seed_category()),
+        Step("course_category", lambda s, r: s.seed_course_category_relations(r["course"], r["category"]),
+             requires=("course", "category")),
+        Step("dietician", lambda s, r: s.seed_dieticians(sizes["dietician"]), requires=("customer",)),
+        Step("meal_plan", lambda s, r: s.seed_meal_plans(sizes["meal_plan"], dietician_ids=r["dietician"]), requires=("dietician",)),
+        Step("meal_plan_day", lambda s, r: s.seed_meal_plan_days_and_items(r["meal_plan"], r["course"]),
+             requires=("meal_plan", "course")),
+        Step("daily_menu", lambda s, r: s.seed_daily_menus_and_items(r["course"], r["dietician"], num_menus=sizes["daily_menu"]),
+             requires=("course", "dietician")),
+        Step("complaint", lambda s, r: s.seed_complaints(r["course_in_order_item"]), requires=("course_in_order_item",)),
 
+        # Mariusz
+        Step("cook", lambda s, r: s.seed_cooks(sizes["cook"]), requires=("dietician",)),
+        Step("courier", lambda s, r: s.seed_couriers(sizes["courier"]), requires=("cook",)),
+        Step("administrator", lambda s, r: s.seed_administrators(sizes["administrator"]), requires=("courier",)),
+        Step("fulfillment_status", lambda s, r: s.seed_fulfillment_statuses()),
+        Step("delivery_status", lambda s, r: s.seed_delivery_statuses()),
+        Step("courier_type", lambda s, r: s.seed_courier_types()),
+        Step("specialty", lambda s, r: s.seed_specialties()),
+        Step("courier_types", lambda s, r: s.seed_courier_types_relations(r["courier"], r["courier_type"]),
+             requires=("courier", "courier_type")),
+        Step("cook_speciality", lambda s, r: s.seed_cook_specialty_relations(r["cook"], r["specialty"]),
+             requires=("cook", "specialty")),
+        Step("order_item_fulfillment", lambda s, r: s.seed_order_item_fulfillment_and_delivery(
+                 r["order"][1], r["cook"], r["courier"], r["fulfillment_status"], r["delivery_status"]),
+             requires=("order", "cook", "courier", "fulfillment_status", "delivery_status")),
+    ]
+
+
+def plan_append(conn: psycopg2.extensions.connection, days: float, now: datetime,
+                orders_per_day: Optional[float] = None, opinions_per_day: Optional[float] = None) -> Dict[str, Any]:
+    """What append mode adds on top of the existing data.
+
+    New orders are placed after the newest existing one and up to `now`
+    (`placed_at <= now()` is a CHECK, so they cannot go past the server's
+    clock). `days` sets the volume: that many days of orders and opinions at
+    the rate the existing data grew (orders over the span of placed_at),
+    unless given per day.
+    """
+    plan: Dict[str, Any] = {}
+    with conn.cursor() as cur:
+        for key, sql in APPEND_IDS_SQL.items():
+            cur.execute(sql)
+            plan[key] = [row[0] for row in cur.fetchall()]
+        cur.execute('SELECT customer_id, course_id FROM "opinion";')
+        plan["opinion"] = cur.fetchall()
+        cur.execute('SELECT count(*), min(placed_at), max(placed_at) FROM "order";')
+        order_count, first_order, last_order = cur.fetchone()
+    conn.commit()
+
+    if not order_count or not plan["customer"] or not plan["course"]:
+        raise ValueError("Append mode needs a seeded database with customers, courses and orders")
+    # placed_at comes back tz-aware, the generators work in naive local time
+    first_order, last_order = (t.astimezone().replace(tzinfo=None) for t in (first_order, last_order))
+    if last_order >= now:
+        raise ValueError(f"The newest order was placed at {last_order.isoformat()}, --now has to be later than that")
+
+    span_days = max((last_order - first_order).total_seconds() / 86400, 1.0)
+    if orders_per_day is None:
+        orders_per_day = order_count / span_days
+    if opinions_per_day is None:
+        opinions_per_day = len(plan["opinion"]) / span_days
+
+    plan["placed_from"] = max(last_order, now - timedelta(days=days))
+    plan["orders"] = round(days * orders_per_day)
+    plan["opinions"] = round(days * opinions_per_day)
+    window_days = (now - plan["placed_from"]).total_seconds() / 86400
+    logging.info(f"Appending {plan['orders']} orders and {plan['opinions']} opinions "
+                 f"({days:g} days at {orders_per_day:.1f} orders/day), placed between "
+                 f"{plan['placed_from'].isoformat()} and {now.isoformat()} ({window_days:.2f} days)")
+    return plan
+
+
+def build_append_steps(plan: Dict[str, Any]) -> List[Step]:
+    # ids of the existing data come from the plan, the new rows only reference them
+    return [
+        Step("order", lambda s, r: s.seed_orders(plan["customer"], num=plan["orders"], placed_from=plan["placed_from"])),
+        Step("course_in_order_item", lambda s, r: s.seed_course_in_order_item(r["order"][1], plan["course"]),
+             requires=("order",)),
+        Step("complaint", lambda s, r: s.seed_complaints(r["course_in_order_item"]), requires=("course_in_order_item",)),
+        Step("order_item_fulfillment", lambda s, r: s.seed_order_item_fulfillment_and_delivery(
+                 r["order"][1], plan["cook"], plan["courier"], plan["fulfillment_status"], plan["delivery_status"]),
+             requires=("order",)),
+        Step("opinion", lambda s, r: s.seed_opinions(plan["customer"], plan["course"], num=plan["opinions"],
+                                                     existing=plan["opinion"])),
+    ]
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Seed the database with fake data")
+    parser.add_argument("--scale", type=parse_scale, default=1.0,
+                        help="scale factor for all table sizes (1 is the default dataset), "
+                             f"or a profile: {', '.join(f'{name}={scale:g}' for name, scale in PROFILES.items())}")
+    parser.add_argument("--loader", choices=sorted(LOADERS), default=CopyLoader.name,
+                        help="bulk load transport: multi-row INSERT ... VALUES or COPY FROM STDIN (text/binary)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="number of seeding steps run at the same time, each on its own connection")
+    parser.add_argument("--pool-size", type=int, default=5000,
+                        help="distinct Faker values pre-generated (and cached on disk) per text provider")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="rows generated and loaded at a time; bounds the memory used by each seeder")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed; the same seed (and --now) always produces the same dataset")
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None,
+                        help="reference time all generated dates are relative to (default: today's midnight); "
+                             "order ETAs are checked against now(), so it cannot be more than a day in the past")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="worker processes generating chunks in parallel (0: generate in the seeding threads)")
+    parser.add_argument("--backend", choices=("sync", "async"), default="sync",
+                        help="sync: psycopg2 seeders on worker threads (--loader applies); "
+                             "async: asyncpg binary COPY with several batches in flight per step")
+    parser.add_argument("--in-flight", type=int, default=4,
+                        help="async backend: batches of one step written at the same time")
+    parser.add_argument("--server-side", action="store_true",
+                        help="fill order items, their courses, fulfillment/delivery and complaints with INSERT ... SELECT "
+                             "from generate_series inside the database (sync backend; different data than without it)")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="drop foreign keys and secondary indexes (and disable user triggers) while loading, "
+                             "then rebuild them in parallel, validate the FKs and ANALYZE")
+    parser.add_argument("--append-days", type=float, default=None, metavar="N",
+                        help="append N days of orders (with items, fulfillment, deliveries, complaints) and opinions "
+                             "after the newest existing order instead of reseeding; --now defaults to the current time")
+    parser.add_argument("--orders-per-day", type=float, default=None,
+                        help="append mode: orders per day (default: the rate of the existing orders)")
+    parser.add_argument("--opinions-per-day", type=float, default=None,
+                        help="append mode: opinions per day (default: the rate of the existing opinions)")
+    parser.add_argument("--snapshot-dir", metavar="DIR", default=None,
+                        help="restore the dataset from a snapshot in DIR keyed by --scale, --seed, --now and the schema "
+                             "when there is one, otherwise seed and save one there")
+    parser.add_argument("--refresh-snapshot", action="store_true",
+                        help="with --snapshot-dir, seed and overwrite the snapshot even if it exists")
+    parser.add_argument("--metrics", metavar="DIR", default=None,
+                        help="write per-step timings, rows, bytes and pg_stat deltas to DIR/seed_metrics.json "
+                             "and DIR/seed_metrics.prom (Prometheus text format)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="with --metrics, also trace peak Python memory with tracemalloc (slows generation down)")
+    parser.add_argument("--unlogged", action="store_true",
+                        help="implies --bulk-load; load into UNLOGGED tables with synchronous_commit=off, "
+                             "switch them back to LOGGED at the end")
+    args = parser.parse_args(argv)
+    if args.append_days is not None and (args.backend != "sync" or args.bulk_load or args.unlogged):
+        parser.error("--append-days works with the sync backend only, without --bulk-load or --unlogged")
+    if args.snapshot_dir and args.append_days is not None:
+        parser.error("--snapshot-dir cannot be combined with --append-days")
+    if args.server_side and args.backend != "sync":
+        parser.error("--server-side works with the sync backend only")
+    return args
+
+
+def count_rows(conn: psycopg2.extensions.connection) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public';")
+        tables = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT " + " + ".join(f'(SELECT count(*) FROM "{t}")' for t in tables) + ";")
+        rows = cur.fetchone()[0]
+    conn.commit()
+    return rows
+
+
+async def run_async(args: argparse.Namespace, seed: int, now: datetime, shards: ShardPool, value_pools: ValuePools,
+                    steps: Sequence[Step], seed_metrics: Optional[metrics.SeedMetrics] = None):
+    from async_seeders import AsyncSeeder, create_pool
+    from scheduler import AsyncSeedScheduler
+
+    pool = await create_pool(max_size=max(int(settings.DB_POOL_MAX), args.workers * args.in_flight + 1))
     try:
-        # Tomek
-        course_ids = seeder.seed_courses(60000)
-        ingredient_ids = seeder.seed_ingredients(1000)
+        seeder = AsyncSeeder(pool, in_flight=args.in_flight, reset_tables=False, pools=value_pools,
+                             chunk_size=args.chunk_size, seed=seed, shards=shards, now=now)
+        await AsyncSeedScheduler(steps, seeder, workers=args.workers,
+                                 metrics=seed_metrics).run()
+    finally:
+        await pool.close()
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = parse_args(argv)
+    if args.unlogged:
+        # the dataset is reproducible from --seed, so the seeding sessions skip waiting for WAL flushes
+        settings.DB_SYNCHRONOUS_COMMIT = "off"
+    # every worker keeps a pooled connection until the run ends, as does main (or the coordinating
+    # connection of a snapshot export), so a smaller pool would leave workers waiting for DB_POOL_TIMEOUT
+    settings.DB_POOL_MAX = max(int(settings.DB_POOL_MAX), args.workers + 1)
+    pool = get_pool()
+    conn = pool.getconn()
+    if not conn:
+        print("Brak połączenia z bazą danych.")
+        return
 
-        seeder.seed_course_ingredient_relations(course_ids, ingredient_ids)
-        allergen_ids = seeder.seed_allergens()
-        seeder.seed_allergen_ingredient_relations(ingredient_ids, allergen_ids)
+    seed = new_seed() if args.seed is None else args.seed
+    appending = args.append_days is not None
+    if appending:
+        now = args.now or datetime.now().replace(microsecond=0)
+        logging.info(f"Appending with --seed {seed} --now {now.isoformat()}")
+    else:
+        now = args.now or datetime.combine(date.today(), time())
+        logging.info(f"Seeding with --seed {seed} --now {now.isoformat()} --scale {args.scale:g}")
+
+    key = None
+    if args.snapshot_dir:
+        schema = snapshots.schema_hash()
+        key = snapshots.snapshot_key(args.scale, seed, now, schema, args.chunk_size, args.pool_size,
+                                     "server-side" if args.server_side else None)
+        if not args.refresh_snapshot and snapshots.load_manifest(args.snapshot_dir, key):
+            pool.putconn(conn)
+            try:
+                started = perf_counter()
+                rows = snapshots.restore_snapshot(args.snapshot_dir, key, workers=args.workers)
+                elapsed = perf_counter() - started
+                logging.info(f"Loaded {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s, snapshot {key})")
+            finally:
+                close_pool()
+            return
+    shards = ShardPool(args.processes, pool_size=args.pool_size)
+    try:
+        try:
+            if appending:
+                plan = plan_append(conn, args.append_days, now, args.orders_per_day, args.opinions_per_day)
+                rows_before = count_rows(conn)
+            else:
+                Seeder(conn).truncate_all()
+                rows_before = 0
+        finally:
+            pool.putconn(conn)
+
+        if appending:
+            steps = build_append_steps(plan)
+            # the appended rows get streams of their own, so they do not repeat the ones seeded before
+            run_seed = derive_seed(seed, f"append:{now.isoformat()}")
+        else:
+            steps = build_seed_steps(dataset_sizes(args.scale))
+            run_seed = seed
 
-        # Bartosh
-        customers_with_addresses_ids = seeder.seed_customers_with_addresses(5000)
-        orders_ids, order_items_ids = seeder.seed_orders(customers_with_addresses_ids=customers_with_addresses_ids)
-        seeder.seed_invoices(orders_ids=orders_ids)
+        value_pools = ValuePools(size=args.pool_size)
+        bulk = BulkLoad(workers=args.workers, unlogged=args.unlogged) if args.bulk_load or args.unlogged else None
+        if bulk:
+            bulk.prepare()
 
-        if customers_with_addresses_ids and ingredient_ids:
-            seeder.seed_preferences(customers_with_addresses_ids, ingredient_ids)
-        if customers_with_addresses_ids and course_ids:
-            seeder.seed_opinions(customers_with_addresses_ids, course_ids, num=10000)
+        seed_metrics = metrics.SeedMetrics(trace_memory=args.trace_memory, count_bytes=args.backend == "sync") \
+            if args.metrics else None
+        if seed_metrics:
+            seed_metrics.start()
 
-        # Ola
-        course_in_order_item_ids = seeder.seed_course_in_order_item(order_items_ids, course_ids)
-        category_ids = seeder.seed_category()
-        seeder.seed_course_category_relations(course_ids, category_ids)
-        
-        dietician_ids = seeder.seed_dieticians()
-        
-        meal_plan_ids = seeder.seed_meal_plans(dietician_ids=dietician_ids)
-        seeder.seed_meal_plan_days_and_items(meal_plan_ids, course_ids)
-        
-        seeder.seed_daily_menus_and_items(course_ids, dietician_ids)
-        
-        seeder.seed_complaints(course_in_order_item_ids) 
-        
-        # Mariusz
-        cook_ids = seeder.seed_cooks(25)
-        courier_ids = seeder.seed_couriers(30)
-        seeder.seed_administrators(5)
-        
-        fulfillment_status_ids = seeder.seed_fulfillment_statuses()
-        delivery_status_ids = seeder.seed_delivery_statuses()
-
-        courier_type_ids = seeder.seed_courier_types()
-        specialty_ids = seeder.seed_specialties()
-
-        seeder.seed_courier_types_relations(courier_ids, courier_type_ids)
-        seeder.seed_cook_specialty_relations(cook_ids, specialty_ids)
-        
-        seeder.seed_order_item_fulfillment_and_delivery(
-            seeder.get_order_item_ids(), 
-            cook_ids, 
-            courier_ids, 
-            fulfillment_status_ids, 
-            delivery_status_ids
-        )
-    
+        started = perf_counter()
+        try:
+            with bulk.phase("load") if bulk else nullcontext():
+                if args.backend == "async":
+                    asyncio.run(run_async(args, run_seed, now, shards, value_pools, steps, seed_metrics))
+                else:
+                    seeder_class = Seeder
+                    if args.server_side:
+                        from server_seeders import ServerSideSeeder
+                        seeder_class = ServerSideSeeder
+                    scheduler = SeedScheduler(
+                        steps,
+                        connect=pool.getconn,
+                        release=pool.putconn,
+                        make_seeder=lambda c: seeder_class(metrics.metered(c) if seed_metrics else c, loader=make_loader(args.loader), reset_tables=False,
+                                                           pools=value_pools, chunk_size=args.chunk_size, seed=run_seed,
+                                                           shards=shards, now=now),
+                        workers=args.workers,
+                        metrics=seed_metrics,
+                    )
+                    scheduler.run()
+        except BaseException:
+            # the schema is put back even when the load failed, without hiding why it failed
+            if bulk:
+                bulk.unwind()
+            raise
+        if bulk:
+            bulk.finish()
+        elapsed = perf_counter() - started
+
+        with pooled_connection() as conn:
+            rows = count_rows(conn) - rows_before
+        logging.info(f"Loaded {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s, {args.backend} backend)"
+                     + (f", {rows + rows_before} rows in total" if appending else ""))
+        if key:
+            snapshots.export_snapshot(args.snapshot_dir, key, {"scale": args.scale, "seed": seed, "now": now.isoformat(),
+                                                               "chunk_size": args.chunk_size, "pool_size": args.pool_size,
+                                                               "server_side": args.server_side, "schema_hash": schema},
+                                      workers=args.workers)
+
+        if seed_metrics:
+            seed_metrics.stop()
+            seed_metrics.extra.update(backend=args.backend, loader=args.loader, workers=args.workers, server_side=args.server_side,
+                                      scale=args.scale, seed=seed, append_days=args.append_days, bulk_load=bulk.timings if bulk else None)
+            seed_metrics.log_summary()
+            os.makedirs(args.metrics, exist_ok=True)
+            seed_metrics.write_json(os.path.join(args.metrics, "seed_metrics.json"))
+            seed_metrics.write_prometheus(os.path.join(args.metrics, "seed_metrics.prom"))
+            logging.info(f"Metrics written to {args.metrics}")
     finally:
-        conn.close()
+        shards.close()
+        close_pool()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
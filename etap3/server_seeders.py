@@ -0,0 +1,255 @@
+import logging
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+import generators as gen
+import metrics
+from seeders import Seeder
+from shards import derive_seed
+
+# The largest tables, filled by INSERT ... SELECT from the parents already in
+# the database. Every statement covers a contiguous id range of its parents
+# (%(lo)s..%(hi)s) and only row counts come back. The distributions follow the
+# chunk generators in generators.py; random picks of texts go through a
+# pre-generated pool sent as an array.
+
+ORDER_ITEMS_SQL = """
+    WITH addresses AS (
+        SELECT customer_id, array_agg(address_id ORDER BY address_id) AS ids
+        FROM "customer_address"
+        GROUP BY customer_id
+    ), ordered AS (
+        SELECT o.order_id, a.ids, %(min)s + floor(random() * (%(max)s - %(min)s + 1))::int AS items
+        FROM "order" o
+        JOIN addresses a ON a.customer_id = o.customer_id
+        WHERE o.order_id BETWEEN %(lo)s AND %(hi)s
+        ORDER BY o.order_id
+    ), inserted AS (
+        INSERT INTO "order_item" (expected_delivery_at, order_id, delivery_address)
+        SELECT %(today)s::date + (1 + floor(random() * 30))::int,
+               o.order_id,
+               o.ids[1 + floor(random() * cardinality(o.ids))::int]
+        FROM ordered o
+        CROSS JOIN LATERAL generate_series(1, o.items)
+        RETURNING order_item_id
+    )
+    SELECT min(order_item_id), max(order_item_id), count(*) FROM inserted;
+"""
+
+# courses are drawn with replacement and the duplicates of an item dropped,
+# which with thousands of courses only rarely leaves an item a course short
+COURSE_IN_ORDER_ITEM_SQL = """
+    WITH items AS (
+        SELECT order_item_id, %(min)s + floor(random() * (%(max)s - %(min)s + 1))::int AS courses
+        FROM "order_item"
+        WHERE order_item_id BETWEEN %(lo)s AND %(hi)s
+        ORDER BY order_item_id
+    ), picked AS (
+        SELECT DISTINCT i.order_item_id, (%(course_ids)s::int[])[1 + floor(random() * %(n_courses)s)::int] AS course_id
+        FROM items i
+        CROSS JOIN LATERAL generate_series(1, i.courses)
+    ), inserted AS (
+        INSERT INTO "course_in_order_item" (course_id, order_item_id)
+        SELECT course_id, order_item_id FROM picked ORDER BY order_item_id, course_id
+        RETURNING id
+    )
+    SELECT min(id), max(id), count(*) FROM inserted;
+"""
+
+COMPLAINTS_SQL = """
+    WITH selected AS (
+        SELECT cioi.id, o.customer_id,
+               o.placed_at + random() * make_interval(days => 1 + floor(random() * 14)::int) AS date,
+               (ARRAY['submitted', 'under review', 'positively resolved', 'negatively resolved']::complaint_status[])
+                   [1 + floor(random() * 4)::int] AS status
+        FROM "course_in_order_item" cioi
+        JOIN "order_item" oi ON oi.order_item_id = cioi.order_item_id
+        JOIN "order" o ON o.order_id = oi.order_id
+        WHERE cioi.id BETWEEN %(lo)s AND %(hi)s AND random() < %(probability)s
+        ORDER BY cioi.id
+    )
+    INSERT INTO "complaint" (customer_id, course_in_order_id, date, status, description, refund_amount, resolution_date)
+    SELECT customer_id, id, date, status,
+           (%(descriptions)s::text[])[1 + floor(random() * %(n_descriptions)s)::int],
+           CASE WHEN status = 'positively resolved' THEN round((random() * 1000)::numeric, 2) END,
+           CASE WHEN status IN ('positively resolved', 'negatively resolved')
+                THEN date + interval '1 second' + random() * make_interval(days => 1 + floor(random() * 64)::int) END
+    FROM selected;
+"""
+
+# the delivery of an item exists only when its fulfillment is 'Ready for Delivery' (3)
+FULFILLMENT_AND_DELIVERY_SQL = """
+    WITH items AS (
+        SELECT order_item_id,
+               1 + floor(random() * 4)::int AS status_id,
+               %(now)s::timestamp - random() * interval '7 days' AS began_at,
+               random() AS completed_share
+        FROM "order_item"
+        WHERE order_item_id BETWEEN %(lo)s AND %(hi)s
+        ORDER BY order_item_id
+    ), fulfillment AS (
+        INSERT INTO "order_item_fulfillment" (cook_id, order_item_id, status_id, began_at, completed_at,
+                                              last_updated_at, notes)
+        SELECT (%(cook_ids)s::int[])[1 + floor(random() * %(n_cooks)s)::int], order_item_id, status_id, began_at,
+               completed_at, coalesce(completed_at, began_at),
+               CASE WHEN random() < 0.1 THEN (%(words)s::text[])[1 + floor(random() * %(n_words)s)::int] END
+        FROM (SELECT *, CASE WHEN status_id IN (3, 4)
+                             THEN began_at + completed_share * (%(now)s::timestamp - began_at) END AS completed_at
+              FROM items) i
+        RETURNING order_item_id, status_id
+    ), deliveries AS (
+        SELECT order_item_id, %(now)s::timestamp - random() * interval '7 days' AS began_at
+        FROM fulfillment
+        WHERE status_id = 3
+        ORDER BY order_item_id
+    ), delivery AS (
+        INSERT INTO "order_item_delivery" (courier_id, order_item_id, status_id, began_at, delivered_at,
+                                           last_updated, notes)
+        SELECT (%(courier_ids)s::int[])[1 + floor(random() * %(n_couriers)s)::int], order_item_id,
+               1 + floor(random() * 5)::int, began_at, delivered_at, delivered_at,
+               CASE WHEN random() < 0.1 THEN (%(words)s::text[])[1 + floor(random() * %(n_words)s)::int] END
+        FROM (SELECT *, least(began_at + interval '1 second', %(now)s::timestamp)
+                        + random() * greatest(%(now)s::timestamp - began_at - interval '1 second', interval '0')
+                        AS delivered_at
+              FROM deliveries) d
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM fulfillment), (SELECT count(*) FROM delivery);
+"""
+
+
+def _bounds(ids: Sequence[int]) -> Tuple[int, int]:
+    # the id ranges returned below are range objects, everything else a list
+    if isinstance(ids, range):
+        return ids[0], ids[-1]
+    return min(ids), max(ids)
+
+
+class ServerSideSeeder(Seeder):
+    """Seeder that fills the largest tables inside the database.
+
+    Orders are generated and loaded as with Seeder (so they are the same for
+    a given seed); their items, the courses of the items, fulfillment and
+    delivery records and complaints are built by one INSERT ... SELECT each
+    with generate_series and random(). Nothing but counts and id bounds comes
+    back, and the seed_* methods return id ranges instead of id lists. Every
+    statement calls setseed() with a seed derived from the run's seed and
+    runs without parallel workers, so a given seed gives the same data, which
+    differs from what the chunk generators produce. The parent ids of a
+    statement must be contiguous, which they are within one seeding run.
+    """
+
+    def _prepare(self, cur, stream: str) -> None:
+        # random() is a per-session generator; parallel workers would each have their own
+        cur.execute("SET LOCAL max_parallel_workers_per_gather = 0;")
+        cur.execute("SELECT setseed(%s);", (derive_seed(self.seed, stream) / 2 ** 31 - 1,))
+
+    def _words(self, provider: str, **kwargs) -> List[str]:
+        return self.pools.pool(provider, **kwargs).tolist()
+
+    def _inserted_range(self, cur, table: str) -> range:
+        lo, hi, count = cur.fetchone()
+        metrics.record_rows(count)
+        if count and hi - lo + 1 != count:
+            raise RuntimeError(f"Ids of the new {table} rows are not contiguous ({count} rows in {lo}..{hi})")
+        return range(lo, hi + 1) if count else range(0)
+
+    def seed_orders(self, customers_with_addresses_ids, how_much_with_order = 0.8, min_items = 1, max_items = 15, chunk_size = None,
+                    num: Optional[int] = None, placed_from: Optional[datetime] = None):
+        if not self.conn or not customers_with_addresses_ids:
+            return [], []
+
+        if num is None:
+            customers_with_orders_ids = self._ordering_customers(customers_with_addresses_ids, how_much_with_order)
+            num = len(customers_with_orders_ids)
+        else:
+            customers_with_orders_ids = list(customers_with_addresses_ids)
+
+        orders_ids = []
+        try:
+            with self.conn.cursor() as cur:
+                self._reset_table(cur, "order")
+                for orders in self._rows("order", gen.orders, num, customers_with_orders_ids, placed_from):
+                    ids = self.loader.reserve_ids(cur, "order", "order_id", len(orders))
+                    self.loader.insert(cur, "order", ("order_id",) + gen.ORDER_COLUMNS, [(oid,) + row for oid, row in zip(ids, orders)])
+                    orders_ids.extend(ids)
+                if orders_ids:
+                    self._prepare(cur, "order_item")
+                    cur.execute(ORDER_ITEMS_SQL, {"lo": orders_ids[0], "hi": orders_ids[-1], "min": min_items,
+                                                  "max": max_items, "today": self.now.date()})
+                    order_items_ids = self._inserted_range(cur, "order_item")
+                else:
+                    order_items_ids = range(0)
+                self.conn.commit()
+                logging.info(f"Added {len(orders_ids)} orders and {len(order_items_ids)} order items")
+                return orders_ids, order_items_ids
+        except Exception as e:
+            self.conn.rollback()
+            logging.error(f"Failed to add orders: {e}")
+            raise
+
+    def seed_course_in_order_item(self, order_item_ids: Sequence[int], course_item_ids: Sequence[int], min_per_item: int = 1, max_per_item: int = 8) -> range:
+        if not self.conn or not order_item_ids or not course_item_ids:
+            return range(0)
+
+        lo, hi = _bounds(order_item_ids)
+        try:
+            with self.conn.cursor() as cur:
+                self._prepare(cur, "course_in_order_item")
+                cur.execute(COURSE_IN_ORDER_ITEM_SQL, {"lo": lo, "hi": hi, "min": min_per_item, "max": max_per_item,
+                                                       "course_ids": list(course_item_ids),
+                                                       "n_courses": len(course_item_ids)})
+                course_in_order_ids = self._inserted_range(cur, "course_in_order_item")
+                self.conn.commit()
+                logging.info(f"Added {len(course_in_order_ids)} course in order relations")
+                return course_in_order_ids
+        except Exception as e:
+            self.conn.rollback()
+            logging.error(f"Failed to add course in order relations: {e}")
+            raise
+
+    def seed_complaints(self, course_in_order_items_ids: Sequence[int], probability: float = 0.01) -> int:
+        if not self.conn or not course_in_order_items_ids:
+            return 0
+
+        lo, hi = _bounds(course_in_order_items_ids)
+        descriptions = self._words('sentence', nb_words=12)
+        try:
+            with self.conn.cursor() as cur:
+                self._prepare(cur, "complaint")
+                cur.execute(COMPLAINTS_SQL, {"lo": lo, "hi": hi, "probability": probability,
+                                             "descriptions": descriptions, "n_descriptions": len(descriptions)})
+                complaints_inserted = cur.rowcount
+                metrics.record_rows(complaints_inserted)
+                self.conn.commit()
+                logging.info(f"Added {complaints_inserted} complaints")
+                return complaints_inserted
+        except Exception as e:
+            self.conn.rollback()
+            logging.error(f"Failed to add complaints: {e}")
+            raise
+
+    def seed_order_item_fulfillment_and_delivery(self, order_item_ids: Sequence[int], cook_ids: Sequence[int], courier_ids: Sequence[int], fulfillment_status_ids: Sequence[int], delivery_status_ids: Sequence[int]) -> Tuple[int, int]:
+        if not self.conn or not order_item_ids:
+            return 0, 0
+
+        lo, hi = _bounds(order_item_ids)
+        words = self._words('word')
+        try:
+            with self.conn.cursor() as cur:
+                self._prepare(cur, "order_item_fulfillment")
+                cur.execute(FULFILLMENT_AND_DELIVERY_SQL, {
+                    "lo": lo, "hi": hi, "now": self.now,
+                    "cook_ids": list(cook_ids), "n_cooks": len(cook_ids),
+                    "courier_ids": list(courier_ids), "n_couriers": len(courier_ids),
+                    "words": words, "n_words": len(words),
+                })
+                f_count, d_count = cur.fetchone()
+                metrics.record_rows(f_count + d_count)
+                self.conn.commit()
+                logging.info(f"Added {f_count} fulfillment records and {d_count} delivery records")
+                return f_count, d_count
+        except Exception as e:
+            self.conn.rollback()
+            logging.error(f"Failed to seed fulfillment/delivery: {e}")
+            raise
@@ -0,0 +1,141 @@
+import random
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from faker import Faker
+
+from value_pools import DEFAULT_CACHE_DIR, ValuePools
+
+# A chunk generator is a module-level function `fn(ctx, part, *args) -> rows`,
+# where `part` is a row count or a slice of parent ids. It may only draw from
+# ctx.random / ctx.fake / ctx.rng, so the same (seed, stream, chunk index)
+# always gives the same rows, in whichever process the chunk is generated.
+ChunkFn = Callable[..., List[Tuple]]
+
+_local = threading.local()
+_worker_pools: Optional[ValuePools] = None
+
+
+def _faker(locale: str) -> Faker:
+    # building a Faker is slow, so every thread keeps one per locale and reseeds it per chunk
+    fakers = getattr(_local, "fakers", None)
+    if fakers is None:
+        fakers = _local.fakers = {}
+    if locale not in fakers:
+        fakers[locale] = Faker(locale)
+    return fakers[locale]
+
+
+def stream_key(seed: int, stream: str, index: int) -> List[int]:
+    return [seed, zlib.crc32(stream.encode("utf-8")), index]
+
+
+def derive_seed(seed: int, label: str) -> int:
+    """A seed for a run on top of a dataset seeded with `seed` (e.g. an append), independent of it."""
+    return int(np.random.SeedSequence(stream_key(seed, label, 0)).generate_state(1)[0])
+
+
+class ChunkContext:
+    """Independent random, Faker and NumPy streams for one chunk of one stream.
+
+    `start` is the global position of the chunk's first element, so
+    generators can build values that are unique across all chunks.
+    """
+
+    def __init__(self, seed: int, stream: str, index: int, start: int, pools: ValuePools, now: datetime):
+        sequence = np.random.SeedSequence(stream_key(seed, stream, index))
+        state = sequence.generate_state(4)
+        self.stream = stream
+        self.index = index
+        self.start = start
+        self.now = now
+        self.today: date = now.date()
+        self.pools = pools
+        self.rng = np.random.default_rng(sequence)
+        self.random = random.Random(int(state[0]) << 32 | int(state[1]))
+        self.fake = _faker(pools.locale)
+        self.fake.seed_instance(int(state[2]) << 32 | int(state[3]))
+
+    def sample(self, n: int, provider: str, **kwargs) -> list:
+        return self.pools.sample(self.rng, n, provider, **kwargs)
+
+    def sample_or_none(self, n: int, probability: float, provider: str, **kwargs) -> list:
+        # value with the given probability, None otherwise
+        keep = self.rng.random(n) < probability
+        return [v if k else None for v, k in zip(self.sample(n, provider, **kwargs), keep)]
+
+
+def _init_worker(locale: str, size: int, cache_dir: Optional[str]) -> None:
+    global _worker_pools
+    _worker_pools = ValuePools(locale=locale, size=size, cache_dir=cache_dir)
+
+
+def _run_chunk(fn: ChunkFn, seed: int, stream: str, index: int, start: int, part: Any,
+               now: datetime, args: tuple) -> List[Tuple]:
+    ctx = ChunkContext(seed, stream, index, start, _worker_pools, now)
+    return fn(ctx, part, *args)
+
+
+class ShardPool:
+    """Runs chunk generators inline or on `processes` worker processes.
+
+    Chunks come back in order and at most `processes * 2` are in flight, so
+    memory stays bounded while the workers generate ahead of the loader.
+    """
+
+    def __init__(self, processes: int = 0, locale: str = 'pl_PL', pool_size: int = 5000,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR):
+        self.processes = processes
+        self._executor = None
+        if processes > 1:
+            self._executor = ProcessPoolExecutor(processes, initializer=_init_worker,
+                                                 initargs=(locale, pool_size, cache_dir))
+
+    def map(self, fn: ChunkFn, seed: int, stream: str, parts: Iterable[Tuple[int, Any]], pools: ValuePools,
+            now: datetime, args: tuple = ()) -> Iterator[List[Tuple]]:
+        if self._executor is None:
+            return (fn(ChunkContext(seed, stream, index, start, pools, now), part, *args)
+                    for index, (start, part) in enumerate(parts))
+
+        # the first window is submitted right away, so the workers already
+        # generate while the caller is still loading something else (e.g. the parents)
+        parts = enumerate(parts)
+
+        def submit(index: int, start: int, part: Any):
+            return self._executor.submit(_run_chunk, fn, seed, stream, index, start, part, now, args)
+
+        pending = deque(submit(index, start, part) for index, (start, part) in islice(parts, self.processes * 2))
+        return self._drain(pending, parts, submit)
+
+    @staticmethod
+    def _drain(pending: deque, parts: Iterator, submit: Callable) -> Iterator[List[Tuple]]:
+        for index, (start, part) in parts:
+            pending.append(submit(index, start, part))
+            yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def count_parts(num: int, chunk_size: int) -> List[Tuple[int, int]]:
+    # (start, rows) for every chunk of a table with `num` generated rows
+    return [(start, min(chunk_size, num - start)) for start in range(0, num, chunk_size)]
+
+
+def slice_parts(items: Sequence, chunk_size: int) -> List[Tuple[int, Sequence]]:
+    # (start, items) for every chunk of the parent ids a table is generated from
+    return [(start, items[start:start + chunk_size]) for start in range(0, len(items), chunk_size)]
+
+
+def new_seed() -> int:
+    return random.SystemRandom().randrange(2 ** 32)
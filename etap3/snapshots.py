@@ -0,0 +1,196 @@
+import gzip
+import json
+import logging
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from bulk_load import BulkLoad
+from db import pooled_connection
+
+DEFAULT_DIR = Path.home() / ".cache" / "etap3" / "snapshots"
+MANIFEST = "manifest.json"
+
+# binary COPY depends on the exact column layout, so that is what the hash covers
+SCHEMA_HASH_SQL = """
+    SELECT md5(string_agg(concat_ws(':', c.relname, a.attname, format_type(a.atttypid, a.atttypmod), a.attnotnull),
+                          ',' ORDER BY c.relname, a.attnum))
+    FROM pg_attribute a
+    JOIN pg_class c ON c.oid = a.attrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relkind = 'r' AND a.attnum > 0 AND NOT a.attisdropped;
+"""
+
+TABLES_SQL = "SELECT tablename FROM pg_tables WHERE schemaname = 'public' ORDER BY 1;"
+
+SEQUENCES_SQL = "SELECT sequencename, last_value FROM pg_sequences WHERE schemaname = 'public' ORDER BY 1;"
+
+
+def schema_hash() -> str:
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA_HASH_SQL)
+            digest = cur.fetchone()[0]
+        conn.commit()
+    return digest
+
+
+def snapshot_key(scale: float, seed: int, now: datetime, schema: str, chunk_size: int, pool_size: int,
+                 variant: Optional[str] = None) -> str:
+    # every generated date is relative to --now, the random streams are derived per chunk
+    # and text columns are drawn from pools of --pool-size values, so all of them change the data
+    parts = [f"scale{scale:g}", f"seed{seed}", now.strftime("%Y%m%dT%H%M%S"), f"chunk{chunk_size}",
+             f"pool{pool_size}"] + ([variant] if variant else [])
+    return "-".join(parts + [schema[:12]])
+
+
+def _table_file(table: str) -> str:
+    return f"{table}.copy.gz"
+
+
+def load_manifest(directory: Path, key: str) -> Optional[Dict[str, Any]]:
+    path = Path(directory) / key / MANIFEST
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def export_snapshot(directory: Path, key: str, info: Dict[str, Any], workers: int = 4) -> Path:
+    """Writes every public table as gzipped binary COPY plus a manifest to `directory/key`.
+
+    All tables are read in parallel from one exported transaction snapshot,
+    so they are consistent with each other. The files are written to a
+    temporary directory that is renamed into place at the end, so a failed
+    export never leaves a snapshot that looks complete.
+    """
+    target = Path(directory) / key
+    partial = target.with_name(f".{key}.partial")
+    shutil.rmtree(partial, ignore_errors=True)
+    partial.mkdir(parents=True)
+    started = time.perf_counter()
+
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;")
+                cur.execute("SELECT pg_export_snapshot();")
+                snapshot_id = cur.fetchone()[0]
+                cur.execute(TABLES_SQL)
+                tables = [row[0] for row in cur.fetchall()]
+                cur.execute(SEQUENCES_SQL)
+                sequences = dict(cur.fetchall())
+                cur.execute("SHOW server_version_num;")
+                server_version = int(cur.fetchone()[0])
+
+            def dump(table: str) -> int:
+                with pooled_connection() as worker:
+                    try:
+                        with worker.cursor() as wcur, gzip.open(partial / _table_file(table), "wb", compresslevel=1) as f:
+                            wcur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;")
+                            wcur.execute("SET TRANSACTION SNAPSHOT %s;", (snapshot_id,))
+                            wcur.copy_expert(f'COPY "{table}" TO STDOUT (FORMAT binary)', f)
+                            return wcur.rowcount
+                    finally:
+                        worker.rollback()
+
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="snapshot") as pool:
+                rows = dict(zip(tables, pool.map(dump, tables)))
+        except Exception:
+            shutil.rmtree(partial, ignore_errors=True)
+            logging.error(f"Failed to export snapshot {key}")
+            raise
+        finally:
+            conn.rollback()
+
+    manifest = {
+        **info,
+        "key": key,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "server_version_num": server_version,
+        "tables": {table: {"file": _table_file(table), "rows": rows[table]} for table in tables},
+        "sequences": sequences,
+    }
+    (partial / MANIFEST).write_text(json.dumps(manifest, indent=2, default=str), encoding="utf-8")
+    shutil.rmtree(target, ignore_errors=True)
+    partial.rename(target)
+    size = sum(f.stat().st_size for f in target.iterdir())
+    logging.info(f"Exported snapshot {key}: {sum(rows.values())} rows, {size / 1e6:.1f} MB "
+                 f"in {time.perf_counter() - started:.2f}s")
+    return target
+
+
+def restore_snapshot(directory: Path, key: str, workers: int = 4) -> int:
+    """Replaces the contents of every table with the snapshot `directory/key`; returns the rows restored.
+
+    The tables are emptied by one TRUNCATE and loaded with parallel binary
+    COPY FROM, with foreign keys, secondary indexes and triggers deferred as
+    in --bulk-load. CHECK constraints stay on, so (like --now) a snapshot
+    with order ETAs more than a day behind the server clock no longer loads.
+    """
+    manifest = load_manifest(directory, key)
+    if manifest is None:
+        raise FileNotFoundError(f"No snapshot {key} in {directory}")
+    source = Path(directory) / key
+    tables: Dict[str, Dict[str, Any]] = manifest["tables"]
+    started = time.perf_counter()
+
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(TABLES_SQL)
+                missing = set(tables) - {row[0] for row in cur.fetchall()}
+                if missing:
+                    raise ValueError(f"Snapshot {key} has tables the database does not: {', '.join(sorted(missing))}")
+                cur.execute("TRUNCATE " + ", ".join(f'"{t}"' for t in tables) + " RESTART IDENTITY CASCADE;")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logging.error(f"Failed to empty the tables for snapshot {key}")
+            raise
+
+    bulk = BulkLoad(workers=workers)
+    bulk.prepare()
+
+    def load(table: str) -> int:
+        with pooled_connection() as conn:
+            try:
+                with conn.cursor() as cur, gzip.open(source / tables[table]["file"], "rb") as f:
+                    cur.copy_expert(f'COPY "{table}" FROM STDIN (FORMAT binary)', f)
+                    count = cur.rowcount
+                conn.commit()
+                return count
+            except Exception:
+                conn.rollback()
+                logging.error(f"Failed to restore {table} from snapshot {key}")
+                raise
+
+    try:
+        with bulk.phase("load"):
+            # biggest files first, so the slowest COPY does not start last
+            order = sorted(tables, key=lambda t: -(source / tables[t]["file"]).stat().st_size)
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="restore") as pool:
+                restored = sum(pool.map(load, order))
+            with pooled_connection() as conn:
+                with conn.cursor() as cur:
+                    for sequence, last_value in manifest["sequences"].items():
+                        if last_value is not None:
+                            cur.execute("SELECT setval(%s, %s);", (f'public."{sequence}"', last_value))
+                conn.commit()
+    except BaseException:
+        bulk.unwind()
+        raise
+    bulk.finish()
+
+    logging.info(f"Restored snapshot {key}: {restored} rows in {time.perf_counter() - started:.2f}s")
+    return restored
+
+
+def list_snapshots(directory: Path = DEFAULT_DIR) -> List[Dict[str, Any]]:
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    manifests = [load_manifest(directory, path.name) for path in sorted(directory.iterdir()) if path.is_dir()]
+    return [manifest for manifest in manifests if manifest]
@@ -0,0 +1,44 @@
+from datetime import date
+from typing import List
+
+import numpy as np
+
+from sampling import sample_indices
+
+# Values of UNIQUE columns, built from a number that is already unique (the
+# global row number of a chunk stream, a distinct sampled offset) instead of
+# drawing random values and retrying on collisions, so every value costs the
+# same at any volume and chunks need no shared state.
+
+LOGIN_MAX_LENGTH = 50  # "user".login VARCHAR(50)
+
+
+def login(user_name: str, tag: str, index: int, max_length: int = LOGIN_MAX_LENGTH) -> str:
+    """`user_name.tag<index>`; the suffix alone is unique per tag, so the name is cut to fit `max_length`."""
+    suffix = f".{tag}{index}"
+    if len(suffix) >= max_length:
+        raise ValueError(f"Login suffix '{suffix}' does not fit in {max_length} characters")
+    return user_name[:max_length - len(suffix)] + suffix
+
+
+def email(login_: str, domain: str) -> str:
+    # the local part is a unique login, so the address is unique whatever the domain
+    return f"{login_}@{domain}"
+
+
+def numbered(prefix: str, number: int, width: int) -> str:
+    """`prefix` and a zero-padded sequence number, e.g. INV-00042; wider numbers keep all their digits."""
+    return f"{prefix}{number:0{width}d}"
+
+
+def distinct_days(rng: np.random.Generator, first_day: date, last_day: date, k: int) -> List[int]:
+    """`k` distinct day offsets from `first_day`, none after `last_day`, for a UNIQUE date column."""
+    span = (last_day - first_day).days + 1
+    if k > span:
+        raise ValueError(f"{k} distinct days do not fit between {first_day} and {last_day}")
+    return sample_indices(rng, span, k).tolist()
+
+
+def clamped_day(day: date, days: int) -> date:
+    """`day` moved by `days`, stopping at the ends of the calendar (years 1 and 9999)."""
+    return date.fromordinal(min(max(day.toordinal() + days, 1), date.max.toordinal()))
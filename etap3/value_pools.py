@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Optional
+
+import numpy as np
+from faker import Faker
+
+POOL_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "value_pools")
+
+
+class ValuePools:
+    """Pre-generated pools of Faker values.
+
+    The first time a provider (with given kwargs) is needed, `size` distinct
+    values are generated once and stored under cache_dir/<locale>/; later runs
+    load them from disk. Rows then sample from the pool with NumPy indexing
+    instead of running the Faker provider per row.
+    """
+
+    def __init__(self, locale: str = 'pl_PL', size: int = 5000, cache_dir: Optional[str] = DEFAULT_CACHE_DIR):
+        self.locale = locale
+        self.size = size
+        self.cache_dir = os.path.join(cache_dir, locale) if cache_dir else None
+        self._pools: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._fake: Optional[Faker] = None
+
+    @staticmethod
+    def _key(provider: str, kwargs: dict) -> str:
+        return provider + "".join(f"-{k}={v}" for k, v in sorted(kwargs.items()))
+
+    def _path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, re.sub(r"[^\w=.-]", "_", key) + ".json")
+
+    def _load(self, key: str) -> Optional[list]:
+        path = self._path(key)
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            stored = json.load(f)
+        # a pool built for a smaller size (or by an unseeded Faker) is regenerated,
+        # a bigger one is truncated
+        if stored["size"] < self.size or stored.get("version") != POOL_VERSION:
+            return None
+        return stored["values"][:self.size]
+
+    def _save(self, key: str, values: list) -> None:
+        path = self._path(key)
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": POOL_VERSION, "size": self.size, "values": values}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _generate(self, key: str, provider: str, kwargs: dict) -> list:
+        if self._fake is None:
+            self._fake = Faker(self.locale)
+        # seeded per pool, so every machine (and every worker process) builds the same pool
+        self._fake.seed_instance(zlib.crc32(key.encode("utf-8")))
+        method = getattr(self._fake, provider)
+        values = {}
+        # providers with a small domain (country, region, ...) never reach `size`,
+        # so stop after a bounded number of attempts
+        for _ in range(self.size * 10):
+            values[method(**kwargs)] = None
+            if len(values) >= self.size:
+                break
+        return list(values)
+
+    def pool(self, provider: str, **kwargs) -> np.ndarray:
+        key = self._key(provider, kwargs)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    values = self._load(key)
+                    if values is None:
+                        values = self._generate(key, provider, kwargs)
+                        self._save(key, values)
+                        logging.info(f"Generated value pool '{key}' ({len(values)} values)")
+                    pool = np.empty(len(values), dtype=object)
+                    pool[:] = values
+                    self._pools[key] = pool
+        return pool
+
+    def sample(self, rng: np.random.Generator, n: int, provider: str, **kwargs) -> list:
+        pool = self.pool(provider, **kwargs)
+        return pool[rng.integers(0, len(pool), n)].tolist()
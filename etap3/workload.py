@@ -0,0 +1,326 @@
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import psycopg2
+import psycopg2.extras
+
+from db import get_db_connection
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='   %(levelname)s | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# ids the transactions pick from; all of them come from the seeded data
+WORKLOAD_IDS_SQL = {
+    "course": 'SELECT course_id FROM "course";',
+    "fulfillment_item": 'SELECT order_item_id FROM "order_item_fulfillment";',
+    "delivery_item": 'SELECT order_item_id FROM "order_item_delivery";',
+    "course_in_order_item": 'SELECT id FROM "course_in_order_item";',
+}
+
+COMPLAINT_SQL = """
+    INSERT INTO "complaint" (customer_id, course_in_order_id, date, status, description)
+    SELECT o.customer_id, cioi.id, now(), 'submitted', %s
+    FROM "course_in_order_item" cioi
+    JOIN "order_item" oi ON oi.order_item_id = cioi.order_item_id
+    JOIN "order" o ON o.order_id = oi.order_id
+    WHERE cioi.id = %s;
+"""
+
+ADDRESSES_SQL = """
+    SELECT a.address_id, a.country, a.postal_code, a.city, a.street_name, a.street_number, a.apartment
+    FROM "customer_address" ca
+    JOIN "address" a ON a.address_id = ca.address_id
+    WHERE ca.customer_id = %s AND a.deleted_at IS NULL;
+"""
+
+DEFAULT_MIX = {
+    "place_order": 10,
+    "update_fulfillment": 30,
+    "update_delivery": 20,
+    "file_complaint": 5,
+    "read_addresses": 35,
+}
+
+
+class WorkloadData:
+    """Seeded ids the transactions work on, loaded once before the run."""
+
+    def __init__(self, conn: psycopg2.extensions.connection):
+        with conn.cursor() as cur:
+            self.ids: Dict[str, List[int]] = {}
+            for key, sql in WORKLOAD_IDS_SQL.items():
+                cur.execute(sql)
+                self.ids[key] = [row[0] for row in cur.fetchall()]
+            cur.execute('SELECT customer_id, address_id FROM "customer_address" ORDER BY customer_address_id;')
+            self.addresses: Dict[int, List[int]] = {}
+            for customer_id, address_id in cur.fetchall():
+                self.addresses.setdefault(customer_id, []).append(address_id)
+            self.customers = sorted(self.addresses)
+            cur.execute('SELECT name, id FROM "order_item_fulfillment_status";')
+            self.fulfillment_status = dict(cur.fetchall())
+            cur.execute('SELECT name, id FROM "order_item_delivery_status";')
+            self.delivery_status = dict(cur.fetchall())
+        conn.commit()
+        if not self.customers or not self.ids["course"]:
+            raise ValueError("The workload needs a seeded database, run seeders.py first")
+
+
+def place_order(cur, data: WorkloadData, rng: random.Random) -> Callable[[], None]:
+    customer_id = rng.choice(data.customers)
+    vat_rate = Decimal(rng.choice(["0.05", "0.08", "0.23"]))
+    net_total = Decimal(rng.randint(5000, 50000)) / 100
+    vat_total = (net_total * vat_rate).quantize(Decimal("0.01"))
+    cur.execute("""
+        INSERT INTO "order" (status, vat_rate, vat_total, net_total, gross_total, placed_at, customer_id)
+        VALUES ('accepted', %s, %s, %s, %s, now(), %s) RETURNING order_id;
+    """, (vat_rate, vat_total, net_total, net_total + vat_total, customer_id))
+    order_id = cur.fetchone()[0]
+
+    items = [(rng.randint(1, 3), order_id, rng.choice(data.addresses[customer_id])) for _ in range(rng.randint(1, 5))]
+    item_ids = [row[0] for row in psycopg2.extras.execute_values(cur, """
+        INSERT INTO "order_item" (expected_delivery_at, order_id, delivery_address)
+        VALUES %s RETURNING order_item_id;
+    """, items, template="(now() + make_interval(days => %s), %s, %s)", fetch=True)]
+
+    courses = [(course_id, item_id) for item_id in item_ids
+               for course_id in rng.sample(data.ids["course"], rng.randint(1, 3))]
+    cioi_ids = psycopg2.extras.execute_values(cur, """
+        INSERT INTO "course_in_order_item" (course_id, order_item_id) VALUES %s RETURNING id;
+    """, courses, fetch=True)
+    # new order lines can be complained about later in the run, once they are committed
+    return lambda: data.ids["course_in_order_item"].extend(row[0] for row in cioi_ids)
+
+
+def update_fulfillment(cur, data: WorkloadData, rng: random.Random) -> None:
+    status = rng.choice(["In Preparation", "Ready for Delivery", "Cancelled"])
+    cur.execute("""
+        UPDATE "order_item_fulfillment"
+        SET status_id = %s,
+            completed_at = CASE WHEN %s THEN LOCALTIMESTAMP ELSE completed_at END,
+            last_updated_at = LOCALTIMESTAMP
+        WHERE order_item_id = %s;
+    """, (data.fulfillment_status[status], status != "In Preparation", rng.choice(data.ids["fulfillment_item"])))
+
+
+def update_delivery(cur, data: WorkloadData, rng: random.Random) -> None:
+    status = rng.choice(["Picked Up", "En Route", "Delivered", "Failed Delivery"])
+    cur.execute("""
+        UPDATE "order_item_delivery"
+        SET status_id = %s,
+            delivered_at = CASE WHEN %s THEN LOCALTIMESTAMP ELSE delivered_at END,
+            last_updated = LOCALTIMESTAMP
+        WHERE order_item_id = %s;
+    """, (data.delivery_status[status], status == "Delivered", rng.choice(data.ids["delivery_item"])))
+
+
+def file_complaint(cur, data: WorkloadData, rng: random.Random) -> None:
+    cioi_id = rng.choice(data.ids["course_in_order_item"])
+    cur.execute(COMPLAINT_SQL, ("Workload complaint", cioi_id))
+    if cur.rowcount != 1:
+        raise LookupError(f"No course_in_order_item {cioi_id} to complain about")
+
+
+def read_addresses(cur, data: WorkloadData, rng: random.Random) -> None:
+    cur.execute(ADDRESSES_SQL, (rng.choice(data.customers),))
+    cur.fetchall()
+
+
+# a transaction may return a callback that is run only after its commit
+TRANSACTIONS: Dict[str, Callable[[Any, WorkloadData, random.Random], Optional[Callable[[], None]]]] = {
+    "place_order": place_order,
+    "update_fulfillment": update_fulfillment,
+    "update_delivery": update_delivery,
+    "file_complaint": file_complaint,
+    "read_addresses": read_addresses,
+}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """`name=weight,...`, e.g. `place_order=10,read_addresses=90`; unnamed transactions are not run."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in TRANSACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown transaction '{name}', expected some of: {', '.join(TRANSACTIONS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Weight of '{name}' is not a number: '{weight}'")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("The mix needs at least one transaction with a positive weight")
+    return mix
+
+
+class Workload:
+    """Runs a weighted mix of transactions from `clients` threads, each on its own connection.
+
+    Without `rate` every client runs closed-loop: a transaction, then an
+    exponentially distributed think time (mean `think_time` seconds), and so
+    on. With `rate` (transactions per second over all clients) clients
+    follow a fixed schedule instead, and latency is measured from the
+    scheduled start, so a server falling behind shows up as latency rather
+    than as fewer transactions (coordinated omission). Transactions started
+    during `warmup` seconds are not counted.
+    """
+
+    def __init__(self, data: WorkloadData, mix: Optional[Dict[str, float]] = None, clients: int = 4,
+                 duration: float = 60.0, warmup: float = 5.0, rate: Optional[float] = None,
+                 think_time: float = 0.0, seed: Optional[int] = None):
+        self.data = data
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+        self.clients = max(1, clients)
+        self.duration = duration
+        self.warmup = warmup
+        self.rate = rate
+        self.think_time = think_time
+        self.seed = seed
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self.mix}
+        self.errors: Dict[str, int] = {name: 0 for name in self.mix}
+        self._lock = threading.Lock()
+
+    def _client(self, index: int, started: float) -> None:
+        rng = random.Random(None if self.seed is None else self.seed * 1000 + index)
+        names, weights = list(self.mix), list(self.mix.values())
+        measure_from = started + self.warmup
+        stop_at = measure_from + self.duration
+        interval = self.clients / self.rate if self.rate else None
+        # clients start spread over one interval, not all at once
+        scheduled = started + (interval * index / self.clients if interval else 0.0)
+        latencies: Dict[str, List[float]] = {name: [] for name in names}
+        errors: Dict[str, int] = {name: 0 for name in names}
+
+        conn = get_db_connection()
+        try:
+            while True:
+                now = time.perf_counter()
+                if interval:
+                    if scheduled > now:
+                        time.sleep(scheduled - now)
+                    begin = scheduled
+                    scheduled += interval
+                else:
+                    begin = now
+                if begin >= stop_at:
+                    break
+
+                name = rng.choices(names, weights)[0]
+                try:
+                    with conn.cursor() as cur:
+                        on_commit = TRANSACTIONS[name](cur, self.data, rng)
+                    conn.commit()
+                    if on_commit:
+                        on_commit()
+                    ok = True
+                except (psycopg2.Error, LookupError) as e:
+                    conn.rollback()
+                    logging.debug(f"{name} failed: {e}")
+                    ok = False
+                finished = time.perf_counter()
+
+                if begin >= measure_from:
+                    if ok:
+                        latencies[name].append(finished - begin)
+                    else:
+                        errors[name] += 1
+                if not interval and self.think_time > 0:
+                    time.sleep(rng.expovariate(1 / self.think_time))
+        finally:
+            conn.close()
+
+        with self._lock:
+            for name in names:
+                self.latencies[name].extend(latencies[name])
+                self.errors[name] += errors[name]
+
+    def run(self) -> Dict[str, Any]:
+        logging.info(f"Running {', '.join(f'{n}={w:g}' for n, w in self.mix.items())} on {self.clients} clients for "
+                     f"{self.duration:g}s after {self.warmup:g}s of warm-up"
+                     + (f", {self.rate:g} tx/s" if self.rate else f", {self.think_time:g}s think time"))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.clients, thread_name_prefix="workload") as pool:
+            list(pool.map(lambda i: self._client(i, started), range(self.clients)))
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        transactions = {name: _summary(self.latencies[name], self.errors[name], self.duration) for name in self.mix}
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "clients": self.clients,
+            "duration_seconds": self.duration,
+            "warmup_seconds": self.warmup,
+            "target_rate": self.rate,
+            "think_time_seconds": self.think_time,
+            "mix": self.mix,
+            "latency": "from the scheduled start" if self.rate else "from the start of the transaction",
+            "total": _summary([v for values in self.latencies.values() for v in values],
+                              sum(self.errors.values()), self.duration),
+            "transactions": transactions,
+        }
+
+
+def _summary(latencies: Sequence[float], errors: int, seconds: float) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"count": len(latencies), "errors": errors,
+                               "throughput": len(latencies) / seconds if seconds else None}
+    if latencies:
+        p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000).tolist()
+        summary.update(p50_ms=p50, p95_ms=p95, p99_ms=p99, mean_ms=float(np.mean(latencies)) * 1000,
+                       max_ms=max(latencies) * 1000)
+    return summary
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Drive an OLTP transaction mix against the seeded database")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="transaction weights, e.g. place_order=10,update_fulfillment=30 (default: "
+                             + ",".join(f"{n}={w}" for n, w in DEFAULT_MIX.items()) + ")")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients, each on its own connection")
+    parser.add_argument("--duration", type=float, default=60.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds run before measuring")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="target transactions per second over all clients (default: as fast as possible)")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="mean think time in seconds between the transactions of a client, without --rate")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for the transaction choices")
+    parser.add_argument("--output", default=None, help="also write the report as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = parse_args(argv)
+    conn = get_db_connection()
+    try:
+        data = WorkloadData(conn)
+    finally:
+        conn.close()
+
+    report = Workload(data, mix=args.mix, clients=args.clients, duration=args.duration, warmup=args.warmup,
+                      rate=args.rate, think_time=args.think_time, seed=args.seed).run()
+
+    for name, summary in list(report["transactions"].items()) + [("total", report["total"])]:
+        if summary["count"]:
+            logging.info(f"{name:>20}: {summary['count']:7d} ok, {summary['errors']:5d} errors, "
+                         f"{summary['throughput']:8.1f} tx/s, p50 {summary['p50_ms']:7.2f} ms, "
+                         f"p95 {summary['p95_ms']:7.2f} ms, p99 {summary['p99_ms']:7.2f} ms")
+        else:
+            logging.info(f"{name:>20}: no successful transactions, {summary['errors']} errors")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()